@@ -0,0 +1,7 @@
+"""Performance benchmarks."""
+
+import sys
+
+if __name__ == "__main__":
+    print("This script is not meant to be run directly.\n")
+    sys.exit(-1)
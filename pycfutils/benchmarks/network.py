@@ -0,0 +1,752 @@
+#!/usr/bin/env python
+"""Network benchmarks (loopback)."""
+
+import argparse
+import contextlib
+import datetime
+import errno
+import json
+import math
+import os
+import platform
+import selectors
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pycfutils.exceptions import NetworkException
+from pycfutils.network import (
+    SOCKET_FAMILIES,
+    SOCKET_FAMILY_IPV4,
+    SOCKET_FAMILY_IPV6,
+    SOCKET_FAMILY_UNIX,
+    SOCKET_TYPE_TCP,
+    LatencyHistogram,
+    TCPServer,
+    backlog_max,
+    connect_many,
+    connect_to_server,
+    parse_address,
+)
+from pycfutils.system import cpu_count
+from pycfutils.version import __version__
+
+_ADDRESSES = {
+    "ipv4": "127.0.0.1",
+    "ipv6": "::1",
+}
+_PORT_DEFAULT = 27184
+_SERVER_OPTIONS = {socket.SOL_SOCKET: {socket.SO_REUSEADDR: 1}}  # Rounds rebind
+_BENCHMARK_ACCEPT_RATE = "accept_rate"
+_BENCHMARK_FAST_OPEN = "fast_open"
+_BENCHMARK_SUITE = "suite"
+_BENCHMARKS = (_BENCHMARK_ACCEPT_RATE, _BENCHMARK_FAST_OPEN, _BENCHMARK_SUITE)
+_SUITE_FAMILIES = tuple(
+    e
+    for e in (SOCKET_FAMILY_IPV4, SOCKET_FAMILY_IPV6, SOCKET_FAMILY_UNIX)
+    if e in SOCKET_FAMILIES
+)
+_ALPHA_DEFAULT = 0.05
+_THRESHOLD_DEFAULT = 0.05
+_TCP_FASTOPEN_FILE = "/proc/sys/net/ipv4/tcp_fastopen"
+_TCPI_OPT_SYN_DATA = 0x20  # tcp_info.tcpi_options (Linux)
+
+
+def _open_burst(
+    address: Tuple[Any, ...],
+    family: socket.AddressFamily,
+    count: int,
+    timeout: float = 1,
+) -> List[socket.socket]:
+    # Sockets connected within timeout (failed ones dropped, e.g. full unix backlog)
+    socks = []
+    with selectors.DefaultSelector() as selector:
+        for _ in range(count):
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            if sock.connect_ex(address) not in (0, errno.EINPROGRESS):
+                sock.close()
+                continue
+            selector.register(sock, selectors.EVENT_WRITE)
+            socks.append(sock)
+        time_end = time.monotonic() + timeout
+        while selector.get_map():
+            remaining = time_end - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(timeout=remaining):
+                selector.unregister(key.fileobj)
+        for key in list(selector.get_map().values()):  # Still pending
+            selector.unregister(key.fileobj)
+            key.fileobj.close()
+            socks.remove(key.fileobj)
+    return socks
+
+
+@contextlib.contextmanager
+def _endpoint(family: str, port: int) -> Iterator[Tuple[str, int]]:
+    # Loopback (address, port) to serve on: a temporary path for unix sockets
+    if family != SOCKET_FAMILY_UNIX:
+        yield _ADDRESSES[family], port
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, "benchmark.sock"), 0
+
+
+def parse_address_rate(
+    family: str = SOCKET_FAMILY_IPV4,
+    port: int = _PORT_DEFAULT,
+    calls: int = 20000,
+) -> Dict[str, Any]:
+    """Measure parse_address throughput for the loopback address (no resolution involved).
+
+    Args:
+        family: Socket family name of the loopback address to use.
+        port: Port to parse along.
+        calls: Number of calls.
+    """
+    with _endpoint(family, port) as (address, port):
+        start_time = time.perf_counter()
+        for _ in range(calls):
+            parse_address(address, port, family=family, type_=SOCKET_TYPE_TCP)
+        elapsed = time.perf_counter() - start_time
+    return {
+        "calls": calls,
+        "seconds": elapsed,
+        "rate": calls / elapsed if elapsed else 0.0,
+    }
+
+
+def connect_latency(
+    family: str = SOCKET_FAMILY_IPV4,
+    port: int = _PORT_DEFAULT,
+    connections: int = 500,
+) -> Dict[str, Any]:
+    """Measure connect_to_server latency against a TCPServer (one connection at a time).
+
+    Args:
+        family: Socket family name of the loopback address to use.
+        port: Port the server listens on.
+        connections: Number of connections.
+
+    Returns:
+        Latency statistics (nanoseconds, see LatencyHistogram.statistics).
+    """
+    histogram = LatencyHistogram()
+    with _endpoint(family, port) as (address, port), TCPServer(
+        address,
+        port,
+        family=family,
+        silent=True,
+        options=_SERVER_OPTIONS,
+        backlog=max(connections, backlog_max()),
+    ):
+        for _ in range(connections):
+            start_time = time.perf_counter_ns()
+            sock = connect_to_server(
+                address, port, family=family, _return_client_socket=True
+            )
+            histogram.record(time.perf_counter_ns() - start_time)
+            sock.close()
+    return histogram.statistics()
+
+
+def accept_rate(
+    family: str = SOCKET_FAMILY_IPV4,
+    port: int = _PORT_DEFAULT,
+    connections: int = 2000,
+    burst: int = 64,
+    timeout: float = 10,
+) -> Dict[str, Any]:
+    """Measure how fast a TCPServer accepts connections arriving in bursts.
+
+    Args:
+        family: Socket family name of the loopback address to use.
+        port: Port the server listens on.
+        connections: Total number of connections to open.
+        burst: Number of connections opened concurrently (per round).
+        timeout: Maximum seconds to wait for each burst to connect (and for the server to handle
+            everything).
+    """
+    with _endpoint(family, port) as (address, port):
+        return _accept_rate(address, port, family, connections, burst, timeout)
+
+
+def _accept_rate(
+    address: str,
+    port: int,
+    family: str,
+    connections: int,
+    burst: int,
+    timeout: float,
+) -> Dict[str, Any]:
+    with TCPServer(
+        address,
+        port,
+        family=family,
+        silent=True,
+        options=_SERVER_OPTIONS,
+        backlog=max(burst * 2, backlog_max()),
+    ) as srv:
+        record = parse_address(
+            address, port, family=family, type_=SOCKET_TYPE_TCP, exact_matches=1
+        )[0]
+        target = record[0] if family == SOCKET_FAMILY_UNIX else record[:2]
+        start_time = time.perf_counter()
+        attempted, opened = 0, 0
+        while attempted < connections:
+            count = min(burst, connections - attempted)
+            socks = _open_burst(target, record[2], count, timeout=timeout)
+            for sock in socks:
+                sock.close()
+            attempted += count
+            opened += len(socks)
+        time_end = time.perf_counter() + timeout
+        while srv.handled_total < opened and time.perf_counter() < time_end:
+            time.sleep(0.0005)
+        elapsed = time.perf_counter() - start_time
+        handled = srv.handled_total
+    return {
+        "connections": handled,
+        "seconds": elapsed,
+        "rate": handled / elapsed if elapsed else 0.0,
+    }
+
+
+def scan_rate(
+    family: str = SOCKET_FAMILY_IPV4,
+    port: int = _PORT_DEFAULT,
+    ports: int = 1000,
+    concurrency: int = 64,
+    timeout: float = 1,
+) -> Dict[str, Any]:
+    """Measure connect_many scan throughput over a loopback port range.
+
+    The range is mostly closed ports, only the first one has a listening server.
+
+    Args:
+        family: Socket family name of the loopback address to use (not unix).
+        port: First port of the range (a TCPServer listens on it).
+        ports: Number of ports to probe.
+        concurrency: Maximum number of probes in flight.
+        timeout: Timeout in seconds for each probe.
+    """
+    if family == SOCKET_FAMILY_UNIX:
+        raise NetworkException("Port scans require an IP family")
+    address = _ADDRESSES[family]
+    ports = min(ports, 0x10000 - port)
+    open_ = 0
+    with TCPServer(address, port, family=family, silent=True, options=_SERVER_OPTIONS):
+        start_time = time.perf_counter()
+        for _, result, _ in connect_many(
+            ((address, e) for e in range(port, port + ports)),
+            concurrency=concurrency,
+            timeout=timeout,
+            family=family,
+        ):
+            open_ += not isinstance(result, Exception)
+        elapsed = time.perf_counter() - start_time
+    return {
+        "probes": ports,
+        "open": open_,
+        "seconds": elapsed,
+        "rate": ports / elapsed if elapsed else 0.0,
+    }
+
+
+def _reply_handler(client: socket.socket, peer: Tuple[Any, ...]) -> bool:
+    return bool(client.recv(0x400)) and client.send(b"\x00") == 1
+
+
+def _syn_data_acked(sock: socket.socket) -> bool:
+    tcp_info = getattr(socket, "TCP_INFO", None)
+    if tcp_info is None:
+        return False
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, tcp_info, 8)
+    except OSError:
+        return False
+    return bool(info[5] & _TCPI_OPT_SYN_DATA)
+
+
+def _tcp_fastopen_sysctl() -> Optional[int]:
+    try:
+        with open(_TCP_FASTOPEN_FILE) as f:
+            return int(f.read(), 0)
+    except (OSError, ValueError):
+        return None
+
+
+def fast_open_ttfb(
+    family: str = SOCKET_FAMILY_IPV4,
+    port: int = _PORT_DEFAULT,
+    requests: int = 1000,
+    payload: int = 64,
+) -> Dict[str, Any]:
+    """Measure time to first byte of short request connections, with and without TCP Fast Open.
+
+    Each request connects (sending the payload, in the SYN with TFO), waits
+    for the server's 1 byte reply and closes. One unmeasured TFO request
+    first obtains the cookie. On loopback, the saved round trip is tiny (it
+    matters on real links); syn_data shows how many requests actually carried
+    data in the SYN (0 if the kernel lacks TFO or the sysctl disables it).
+
+    Args:
+        family: Socket family name of the loopback address to use.
+        port: Port the server listens on.
+        requests: Number of requests per mode.
+        payload: Request size in bytes.
+
+    Returns:
+        Dictionary with the sysctl value and, per mode ("regular" and
+        "fast_open"), the latency statistics (nanoseconds) and the syn_data count.
+    """
+    if family == SOCKET_FAMILY_UNIX:
+        raise NetworkException("TCP Fast Open requires an IP family")
+    address = _ADDRESSES[family]
+    data = b"\x00" * max(payload, 1)
+    ret = {"tcp_fastopen": _tcp_fastopen_sysctl()}
+    with TCPServer(
+        address,
+        port,
+        family=family,
+        silent=True,
+        backlog=128,
+        handler=_reply_handler,
+        fast_open=max(requests, 16),
+    ):
+        for mode, fast_open in (("regular", False), ("fast_open", True)):
+            histogram = LatencyHistogram()
+            syn_data = 0
+            for idx in range(requests + fast_open):
+                start_time = time.perf_counter_ns()
+                sock = connect_to_server(
+                    address,
+                    port,
+                    family=family,
+                    data=data,
+                    fast_open=fast_open,
+                    _return_client_socket=True,
+                )
+                try:
+                    sock.recv(1)
+                    elapsed = time.perf_counter_ns() - start_time
+                    if fast_open and idx == 0:
+                        continue  # Cookie request
+                    histogram.record(elapsed)
+                    syn_data += _syn_data_acked(sock)
+                finally:
+                    sock.close()
+            ret[mode] = {**histogram.statistics(), "syn_data": syn_data}
+    return ret
+
+
+# Name: (function, result key, unit, higher is better)
+_SUITE = {
+    "parse_address": (parse_address_rate, "rate", "calls/s", True),
+    "connect_latency": (connect_latency, "p50", "ns", False),
+    "accept_rate": (accept_rate, "rate", "accepts/s", True),
+    "scan_rate": (scan_rate, "rate", "probes/s", True),
+}
+
+
+def environment() -> Dict[str, Any]:
+    """Return metadata describing where the benchmarks run (to tell apart result sets)."""
+    return {
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "pycfutils": __version__,
+        "cpu_count": os.cpu_count(),
+        "usable_cpus": cpu_count(),
+        "somaxconn": backlog_max(),
+        "tcp_fastopen": _tcp_fastopen_sysctl(),
+    }
+
+
+def run_suite(
+    families: Optional[Sequence[str]] = None,
+    port: int = _PORT_DEFAULT,
+    rounds: int = 5,
+    progress: Optional[Callable[[str, int, float], None]] = None,
+) -> Dict[str, Any]:
+    """Run every benchmark, for every family, rounds times.
+
+    Args:
+        families: Socket family names (None for all the available ones among
+            ipv4, ipv6 and unix).
+        port: (First) port to listen on.
+        rounds: Number of measurements (samples) per benchmark.
+        progress: Callable invoked as progress(name, round, sample) after each
+            measurement.
+
+    Returns:
+        JSON serializable dictionary with the environment and settings, and
+        the results keyed by "benchmark/family": unit, higher_is_better and
+        samples (or error, if the benchmark couldn't run).
+    """
+    families = _SUITE_FAMILIES if families is None else tuple(families)
+    results = {}
+    for family in families:
+        for benchmark, (function, key, unit, higher) in _SUITE.items():
+            name = f"{benchmark}/{family}"
+            result = {"unit": unit, "higher_is_better": higher, "samples": []}
+            try:
+                for idx in range(rounds):
+                    sample = function(family=family, port=port)[key]
+                    result["samples"].append(sample)
+                    if progress is not None:
+                        progress(name, idx, sample)
+            except (NetworkException, OSError) as e:
+                result["error"] = str(e) or e.__class__.__name__
+            results[name] = result
+    return {
+        "environment": environment(),
+        "settings": {"families": families, "port": port, "rounds": rounds},
+        "results": results,
+    }
+
+
+def _continued_fraction(a: float, b: float, x: float) -> float:
+    # Incomplete beta function continued fraction (modified Lentz's method)
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    ret = d
+    for m in range(1, 301):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            delta = c * d
+            ret *= delta
+        if abs(delta - 1) < 1e-12:
+            break
+    return ret
+
+
+def _beta_regularized(a: float, b: float, x: float) -> float:
+    # Regularized incomplete beta function I_x(a, b)
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b)
+        - math.lgamma(a)
+        - math.lgamma(b)
+        + a * math.log(x)
+        + b * math.log1p(-x)
+    )
+    if x < (a + 1) / (a + b + 2):
+        return front * _continued_fraction(a, b, x) / a
+    return 1 - front * _continued_fraction(b, a, 1 - x) / b
+
+
+def _welch_p_value(first: Sequence[float], second: Sequence[float]) -> Optional[float]:
+    # Two sided p-value of Welch's t-test (unequal variances), None without enough samples
+    if len(first) < 2 or len(second) < 2:
+        return None
+    mean0, mean1 = statistics.mean(first), statistics.mean(second)
+    var0 = statistics.variance(first, mean0) / len(first)
+    var1 = statistics.variance(second, mean1) / len(second)
+    if var0 + var1 == 0:
+        return 1.0 if mean0 == mean1 else 0.0
+    t = (mean1 - mean0) / math.sqrt(var0 + var1)
+    df = (var0 + var1) ** 2 / (var0**2 / (len(first) - 1) + var1**2 / (len(second) - 1))
+    return _beta_regularized(df / 2, 0.5, df / (df + t * t))
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    alpha: float = _ALPHA_DEFAULT,
+    threshold: float = _THRESHOLD_DEFAULT,
+) -> List[Dict[str, Any]]:
+    """Compare two run_suite results, benchmark by benchmark.
+
+    A benchmark regressed if its mean got worse by at least threshold
+    (relative) and the difference is statistically significant: Welch's
+    t-test p-value below alpha (so at least 2 samples on each side are needed).
+
+    Args:
+        baseline: Reference results.
+        current: Results to check.
+        alpha: Significance level.
+        threshold: Minimum relative change (e.g. 0.05 for 5%).
+
+    Returns:
+        List of dictionaries (for benchmarks with samples in both):
+        name, unit, baseline and current (means), change (relative),
+        p_value (None if not enough samples) and regression.
+    """
+    ret = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if not base.get("samples") or not cur or not cur.get("samples"):
+            continue
+        base_mean = statistics.mean(base["samples"])
+        cur_mean = statistics.mean(cur["samples"])
+        change = (cur_mean - base_mean) / base_mean if base_mean else 0.0
+        p_value = _welch_p_value(base["samples"], cur["samples"])
+        worse = change < 0 if base["higher_is_better"] else change > 0
+        ret.append(
+            {
+                "name": name,
+                "unit": base["unit"],
+                "baseline": base_mean,
+                "current": cur_mean,
+                "change": change,
+                "p_value": p_value,
+                "regression": worse
+                and abs(change) >= threshold
+                and p_value is not None
+                and p_value < alpha,
+            }
+        )
+    return ret
+
+
+def parse_args(
+    argv: Optional[Sequence[str]] = None,
+) -> Tuple[argparse.Namespace, List[str]]:
+    parser = argparse.ArgumentParser(description="Network benchmarks (loopback)")
+    parser.add_argument(
+        "--benchmark",
+        "-B",
+        choices=_BENCHMARKS,
+        default=_BENCHMARK_ACCEPT_RATE,
+        help=(
+            "accept rate (of bursts of connections), TCP Fast Open time to"
+            " first byte (of request connections), or the suite (parse_address"
+            " throughput, connect latency, accept rate and scan rate for every"
+            " family, see --output and --compare)"
+        ),
+    )
+    parser.add_argument(
+        "--burst", "-b", default=64, type=int, help="concurrent connections per round"
+    )
+    parser.add_argument(
+        "--compare",
+        "-C",
+        default=None,
+        help=(
+            "baseline results (JSON file written by --output) to compare the"
+            " suite results with. Exits with 1 if any benchmark regressed"
+        ),
+    )
+    parser.add_argument(
+        "--connections",
+        "-c",
+        default=2000,
+        type=int,
+        help="number of connections to open (per mode, for fast_open)",
+    )
+    parser.add_argument(
+        "--family",
+        "-f",
+        choices=SOCKET_FAMILIES,
+        default=None,
+        help="address family (default: ipv4, all of them for the suite)",
+    )
+    parser.add_argument(
+        "--input",
+        "-i",
+        default=None,
+        help="compare these suite results (JSON file) instead of running the suite",
+    )
+    parser.add_argument(
+        "--output", "-o", default=None, help="write the suite results to a JSON file"
+    )
+    parser.add_argument(
+        "--port", "-p", default=_PORT_DEFAULT, type=int, help="port to listen on"
+    )
+    parser.add_argument(
+        "--rounds",
+        "-r",
+        default=5,
+        type=int,
+        help="number of measurements (samples, for the suite)",
+    )
+    parser.add_argument(
+        "--significance",
+        "-s",
+        default=_ALPHA_DEFAULT,
+        type=float,
+        help="p-value below which a difference is statistically significant",
+    )
+    parser.add_argument(
+        "--threshold",
+        "-t",
+        default=_THRESHOLD_DEFAULT * 100,
+        type=float,
+        help="minimum change (percent) reported as a regression",
+    )
+
+    args, unk = parser.parse_known_args(argv)
+    if unk:
+        print(f"Warning: Ignoring unknown arguments: {unk}")
+
+    if args.port <= 0 or args.burst <= 0 or args.connections <= 0:
+        parser.exit(status=-1, message="Invalid port, burst or connection count\n")
+    if not 0 < args.significance < 1 or args.threshold < 0:
+        parser.exit(status=-1, message="Invalid significance or threshold\n")
+    if args.compare or args.input or args.output:
+        args.benchmark = _BENCHMARK_SUITE
+    if args.input and not args.compare:
+        parser.exit(status=-1, message="Input requires a baseline to compare with\n")
+    if args.benchmark != _BENCHMARK_SUITE:
+        args.family = args.family or SOCKET_FAMILY_IPV4
+    if args.benchmark == _BENCHMARK_FAST_OPEN and args.family == SOCKET_FAMILY_UNIX:
+        parser.exit(status=-1, message="TCP Fast Open requires an IP family\n")
+    args.rounds = max(args.rounds, 1)
+
+    return args, unk
+
+
+def _fast_open_main(args: argparse.Namespace) -> int:
+    print(
+        f"TCP Fast Open TTFB ({args.family}): {args.connections} request(s) per mode,"
+        f" {args.rounds} round(s)"
+    )
+    for idx in range(args.rounds):
+        res = fast_open_ttfb(
+            family=args.family, port=args.port, requests=args.connections
+        )
+        if idx == 0:
+            print(f"  net.ipv4.tcp_fastopen: {res['tcp_fastopen']}")
+        for mode in ("regular", "fast_open"):
+            stats = res[mode]
+            print(
+                f"  Round {idx}: {mode:9s} "
+                + " ".join(
+                    f"{name}: {stats[name] / 1000:.1f}"
+                    for name in ("min", "avg", "p50", "p99")
+                )
+                + f" (us), data in SYN: {stats['syn_data']}/{stats['count']}"
+            )
+    return 0
+
+
+def _load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _print_suite_progress(name: str, index: int, sample: float) -> None:
+    print(f"  {name:24s} round {index}: {sample:.1f}")
+
+
+def _suite_main(args: argparse.Namespace) -> int:
+    if args.input:
+        print(f"Loading results from {args.input}")
+        results = _load_results(args.input)
+    else:
+        families = None if args.family is None else (args.family,)
+        print(
+            f"Suite ({', '.join(families or _SUITE_FAMILIES)}):"
+            f" {args.rounds} round(s) per benchmark"
+        )
+        results = run_suite(
+            families=families,
+            port=args.port,
+            rounds=args.rounds,
+            progress=_print_suite_progress,
+        )
+        for name, result in results["results"].items():
+            if "error" in result:
+                print(f"  {name:24s} skipped: {result['error']}")
+                continue
+            print(
+                f"  {name:24s} median: {statistics.median(result['samples']):.1f}"
+                f" {result['unit']}"
+            )
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {args.output}")
+    if not args.compare:
+        return 0
+    baseline = _load_results(args.compare)
+    print(
+        f"\nComparing with {args.compare}"
+        f" ({baseline['environment'].get('time')}, {baseline['environment'].get('hostname')})"
+    )
+    rows = compare(
+        baseline,
+        results,
+        alpha=args.significance,
+        threshold=args.threshold / 100,
+    )
+    for row in rows:
+        p_value = "-" if row["p_value"] is None else f"{row['p_value']:.4f}"
+        print(
+            f"  {row['name']:24s} {row['baseline']:14.1f} -> {row['current']:14.1f}"
+            f" {row['unit']:10s} {row['change'] * 100:+7.2f}% (p: {p_value})"
+            f"{' REGRESSION' if row['regression'] else ''}"
+        )
+    regressions = sum(e["regression"] for e in rows)
+    print(f"{regressions} regression(s) in {len(rows)} benchmark(s)")
+    return int(bool(regressions))
+
+
+def main(*argv) -> int:
+    args, _ = parse_args(argv or None)
+    if args.benchmark == _BENCHMARK_SUITE:
+        return _suite_main(args)
+    if args.benchmark == _BENCHMARK_FAST_OPEN:
+        return _fast_open_main(args)
+    print(
+        f"Accept rate ({args.family}): {args.connections} connections"
+        f" in bursts of {args.burst}, {args.rounds} round(s)"
+    )
+    rates = []
+    for idx in range(args.rounds):
+        res = accept_rate(
+            family=args.family,
+            port=args.port,
+            connections=args.connections,
+            burst=args.burst,
+        )
+        rates.append(res["rate"])
+        print(
+            f"  Round {idx}: {res['connections']} connections"
+            f" in {res['seconds']:.3f} seconds ({res['rate']:.0f} accepts/sec)"
+        )
+    print(f"Best: {max(rates):.0f} accepts/sec")
+    return 0
+
+
+__all__ = (
+    "accept_rate",
+    "compare",
+    "connect_latency",
+    "environment",
+    "fast_open_ttfb",
+    "parse_address_rate",
+    "run_suite",
+    "scan_rate",
+)
+
+
+if __name__ == "__main__":
+    print(
+        "Python {:s} {:03d}bit on {:s}\n".format(
+            " ".join(elem.strip() for elem in sys.version.split("\n")),
+            64 if sys.maxsize > 0x100000000 else 32,
+            sys.platform,
+        )
+    )
+    rc = main(*sys.argv[1:])
+    print("\nDone.\n")
+    sys.exit(rc)
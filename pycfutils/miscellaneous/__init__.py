@@ -44,6 +44,84 @@ class DictMergeOverlapPolicy(Enum):
 Numeric = Union[int, float]
 
 
+class Permutation:
+    """Seeded pseudo-random bijection over range(size), computed in constant memory.
+
+    Items are computed on demand by a balanced Feistel network over the smallest
+    even bit width covering size (cycle walking keeps results in range), so huge
+    sizes (e.g. IPv6 ranges) work. The same seed always yields the same order.
+    The permutation can be split into shards (disjoint, covering the whole range
+    together): shard k (of shards) holds every shards-th position, starting at k.
+
+    Args:
+        size: Number of elements.
+        seed: Order seed. None for the identity (sharding still applies).
+        shard: Index of the shard to hold (0 based).
+        shards: Total number of shards.
+    """
+
+    _ROUNDS = 4
+
+    def __init__(
+        self, size: int, seed: Optional[int] = None, shard: int = 0, shards: int = 1
+    ):
+        if size < 0:
+            raise ValueError("Size can't be negative")
+        if shards <= 0 or not 0 <= shard < shards:
+            raise ValueError(f"Invalid shard: {shard} (of {shards})")
+        self.size = size
+        self.seed = seed
+        self.shard = shard
+        self.shards = shards
+        self._half_bits = max(((size - 1).bit_length() + 1) // 2, 1)
+        self._mask = (1 << self._half_bits) - 1
+        self._shift = max(self._half_bits // 2, 1)
+        rng = random.Random(seed)
+        self._keys = tuple(
+            rng.getrandbits(self._half_bits) for _ in range(self._ROUNDS)
+        )
+
+    @property
+    def count(self) -> int:
+        """Number of items (len() overflows for sizes beyond sys.maxsize)."""
+        return max(self.size - self.shard + self.shards - 1, 0) // self.shards
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Permutation index out of range")
+        value = self.shard + index * self.shards
+        if self.seed is None:
+            return value
+        value = self._encrypt(value)
+        while value >= self.size:  # Cycle walking (less than 4 steps on average)
+            value = self._encrypt(value)
+        return value
+
+    def __iter__(self) -> Generator[int, None, None]:
+        index = 0
+        count = self.count
+        while index < count:
+            yield self[index]
+            index += 1
+
+    def _round(self, value: int, key: int) -> int:
+        value = ((value ^ key) * 0x9E3779B97F4A7C15) & self._mask
+        value ^= value >> self._shift
+        value = (value * 0xBF58476D1CE4E5B9) & self._mask
+        return value ^ (value >> self._shift)
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._mask
+        for key in self._keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self._half_bits) | right
+
+
 def dimensions_2d(value: int) -> Tuple[int, int]:
     """Compute near-square 2D grid dimensions for a given number of items."""
     if value <= 0:
@@ -509,6 +587,7 @@ def object_items(
 
 
 __all__ = (
+    "Permutation",
     "call_stack",
     "dimensions_2d",
     "int_format",
@@ -1,16 +1,45 @@
 """Network server and client connection utilities."""
 
+import array
+import asyncio
+import collections
+import contextlib
+import errno
+import functools
+import heapq
 import ipaddress
+import itertools
+import multiprocessing
+import os
 import select
+import selectors
 import socket
+import stat
+import struct
 import sys
 import threading
+import time
 import traceback
 import types as builtin_types
-from typing import Any, AnyStr, Dict, Optional, Tuple, Type, Union
+from concurrent import futures
+from typing import (
+    Any,
+    AnyStr,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 from pycfutils.exceptions import NetworkException
-from pycfutils.miscellaneous import uniques
+from pycfutils.miscellaneous import progression, randomize, uniques
+from pycfutils.system import cpu_count
 
 SOCKET_FAMILY_IPV4 = "ipv4"
 SOCKET_FAMILY_IPV6 = "ipv6"
@@ -18,11 +47,13 @@ SOCKET_FAMILY_UNIX = "unix"
 SOCKET_FAMILY_UNSPEC = "unspec"
 _SocketFamilyMap = {
     SOCKET_FAMILY_IPV4: socket.AF_INET,
-    # SOCKET_FAMILY_UNIX: socket.AF_UNIX,
     # SOCKET_FAMILY_UNSPEC: socket.AF_UNSPEC,
 }
 if socket.has_ipv6:
     _SocketFamilyMap[SOCKET_FAMILY_IPV6] = socket.AF_INET6
+_AF_UNIX = getattr(socket, "AF_UNIX", None)
+if _AF_UNIX is not None:
+    _SocketFamilyMap[SOCKET_FAMILY_UNIX] = _AF_UNIX
 SOCKET_FAMILIES = tuple(_SocketFamilyMap.keys())
 SOCKET_FAMILY_DEFAULT = SOCKET_FAMILY_IPV4
 if SOCKET_FAMILY_DEFAULT not in SOCKET_FAMILIES:
@@ -41,11 +72,92 @@ SOCKET_TYPE_DEFAULT = SOCKET_TYPE_TCP
 if SOCKET_TYPE_DEFAULT not in SOCKET_TYPES:
     raise NetworkException("Invalid default socket type")
 
+BACKPRESSURE_PAUSE = "pause"  # Stop accepting (leave connections in the backlog)
+BACKPRESSURE_RESET = "reset"  # Accept and reset connections
+BACKPRESSURES = (BACKPRESSURE_PAUSE, BACKPRESSURE_RESET)
+
+ADMISSION_CONNECTIONS = "connections"  # Too many open connections
+ADMISSION_RATE = "rate"  # Global rate limit
+ADMISSION_SOURCE = "source"  # Source (subnet) rate limit
+ADMISSION_REASONS = (ADMISSION_CONNECTIONS, ADMISSION_RATE, ADMISSION_SOURCE)
+
+SOCKET_PROFILE_LOW_LATENCY = "low_latency"
+SOCKET_PROFILE_SERVER = "server"
+SOCKET_PROFILE_SCANNER = "scanner"
+# (level, option, value) - names missing from the socket module are skipped
+_SocketProfileMap = {
+    SOCKET_PROFILE_LOW_LATENCY: (
+        ("IPPROTO_TCP", "TCP_NODELAY", 1),
+        ("IPPROTO_TCP", "TCP_QUICKACK", 1),
+        ("SOL_SOCKET", "SO_BUSY_POLL", 50),  # Microseconds
+    ),
+    SOCKET_PROFILE_SERVER: (
+        ("IPPROTO_TCP", "TCP_DEFER_ACCEPT", 1),  # Seconds
+        ("IPPROTO_TCP", "TCP_FASTOPEN", 256),  # Pending TFO requests
+    ),
+    SOCKET_PROFILE_SCANNER: (
+        ("SOL_SOCKET", "SO_LINGER", struct.pack("ii", 1, 0)),  # Close with RST
+        ("SOL_SOCKET", "SO_RCVBUF", 4096),
+        ("SOL_SOCKET", "SO_SNDBUF", 4096),
+        ("IPPROTO_TCP", "TCP_SYNCNT", 1),
+    ),
+}
+SOCKET_PROFILES = tuple(_SocketProfileMap.keys())
+# Option values not exported by (older) socket modules
+_SOCKET_OPTION_FALLBACKS = (
+    {"SO_BUSY_POLL": 46} if sys.platform.startswith("linux") else {}
+)
+_SOMAXCONN_FILE = "/proc/sys/net/core/somaxconn"
+_MSG_FASTOPEN = getattr(socket, "MSG_FASTOPEN", None)
+_HANDOFF_MESSAGE = b"pycfutils-listener"
+_HANDOFF_ACK = b"\x01"
+_TCP_FASTOPEN_CONNECT = getattr(
+    socket,
+    "TCP_FASTOPEN_CONNECT",
+    30 if sys.platform.startswith("linux") else None,  # Linux 4.11+
+)
+
 _ADDRESS_DEFAULT = "localhost"
 _PORT_DEFAULT = 27183
 _TIMEOUT_DEFAULT = 1
+_ATTEMPT_DELAY_DEFAULT = 0.25  # RFC 8305 (Connection Attempt Delay)
+_CONNECT_IN_PROGRESS = tuple(
+    getattr(errno, e)
+    for e in ("EINPROGRESS", "EWOULDBLOCK", "EAGAIN", "WSAEWOULDBLOCK")
+    if hasattr(errno, e)
+)
+_DATAGRAM_SIZE_MAX = 65535
+_FRAME_HEADER = struct.Struct("!I")  # Payload size
+_FRAME_SIZE_MAX = 0x1000000
+_FRAME_BUFFER_SIZE = 0x10000
+_FRAME_PIPELINE_DEPTH = 64
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, OSError, ValueError):
+    _IOV_MAX = 16
+_IOV_MAX = _IOV_MAX if _IOV_MAX > 0 else 16
+_ACCEPT_BATCH_MAX = 256  # Incoming items handled per readiness event (fairness)
+
+_METRICS_WINDOWS = (1, 10, 60)  # Seconds
+_TCP_INFO_SIZE = 104
+
+# Worker shared memory slots: state, handled_total, handled_ok
+_WORKER_SLOTS = 3
+_WORKER_PENDING = 0
+_WORKER_RUNNING = 1
+_WORKER_STOPPED = 2
+_WORKER_FAILED = -1
+_WORKER_JOIN_TIMEOUT = 5  # Seconds to wait for a worker to exit before terminating it
 
 SockOpts = Optional[Dict[int, Dict[int, Any]]]
+ConnectionHandler = Callable[[socket.SocketType, Tuple[Any, ...]], Optional[bool]]
+DatagramHandler = Callable[[memoryview, Tuple[Any, ...]], Optional[bool]]
+ConnectResult = Tuple[
+    Tuple[AnyStr, int], Union[Tuple[Any, ...], socket.SocketType, Exception], float
+]
+AsyncHandler = Callable[
+    [asyncio.StreamReader, asyncio.StreamWriter], Awaitable[Optional[bool]]
+]
 
 
 def _create_socket(
@@ -71,6 +183,112 @@ def _create_socket(
     return sock
 
 
+@functools.lru_cache(maxsize=None)
+def _socket_option_supported(
+    family: socket.AddressFamily,
+    type_: socket.SocketKind,
+    level: int,
+    name: int,
+    value: Any,
+) -> bool:
+    try:
+        with socket.socket(family=family, type=type_) as sock:
+            sock.setsockopt(level, name, value)
+    except OSError:
+        return False
+    return True
+
+
+def socket_options(
+    profile: str,
+    family: Optional[AnyStr] = None,
+    type_: Optional[AnyStr] = None,
+    strict: bool = False,
+) -> SockOpts:
+    """Return the options of a named socket profile (see SOCKET_PROFILES).
+
+    Profiles: low_latency (no Nagle / delayed ACKs, busy polling), server
+    (deferred accept, TCP Fast Open; pair it with backlog_max) and scanner
+    (RST on close, small buffers, a single SYN retry). Options that the
+    platform doesn't support are detected (by setting them on a probe socket)
+    and left out.
+
+    Args:
+        profile: Profile name.
+        family: Socket family name (default SOCKET_FAMILY_DEFAULT).
+        type_: Socket type name (default SOCKET_TYPE_DEFAULT).
+        strict: Raise (instead of skipping) if any option is unsupported.
+
+    Returns:
+        Nested dict (level -> option -> value) usable as options argument.
+    """
+    if profile not in _SocketProfileMap:
+        raise NetworkException(f"Invalid socket profile: {profile}")
+    try:
+        sock_family = _SocketFamilyMap[family or SOCKET_FAMILY_DEFAULT]
+        sock_type = _SocketTypeMap[type_ or SOCKET_TYPE_DEFAULT]
+    except KeyError:
+        raise NetworkException("Invalid family or type") from None
+    ret = {}
+    unsupported = []
+    for level_name, option_name, value in _SocketProfileMap[profile]:
+        level = getattr(socket, level_name)
+        name = getattr(socket, option_name, _SOCKET_OPTION_FALLBACKS.get(option_name))
+        if name is None or not _socket_option_supported(
+            sock_family, sock_type, level, name, value
+        ):
+            unsupported.append(option_name)
+            continue
+        ret.setdefault(level, {})[name] = value
+    if strict and unsupported:
+        raise NetworkException(f"Unsupported socket options: {', '.join(unsupported)}")
+    return ret
+
+
+def backlog_max() -> int:
+    """Return the maximum listen backlog (the kernel caps larger values).
+
+    Read from /proc/sys/net/core/somaxconn where available, otherwise
+    socket.SOMAXCONN.
+    """
+    try:
+        with open(_SOMAXCONN_FILE) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return socket.SOMAXCONN
+
+
+def _unix_address(address: AnyStr) -> AnyStr:
+    # Leading "@": Linux abstract namespace name
+    at, nul = (b"@", b"\0") if isinstance(address, bytes) else ("@", "\0")
+    if address.startswith(at):
+        if not sys.platform.startswith("linux"):
+            raise NetworkException(
+                "Abstract Unix socket names are only supported on Linux"
+            )
+        return nul + address[1:]
+    return address
+
+
+def _unix_name(address: AnyStr) -> AnyStr:
+    # Inverse of _unix_address (for displaying)
+    nul, at = (b"\0", b"@") if isinstance(address, bytes) else ("\0", "@")
+    return at + address[1:] if address[:1] == nul else address
+
+
+def _sockaddr(record: Tuple[Any, int, socket.AddressFamily, socket.SocketKind]) -> Any:
+    return record[0] if _AF_UNIX is not None and record[2] == _AF_UNIX else record[:2]
+
+
+def _peer_string(peer: Any) -> str:
+    if isinstance(peer, tuple):
+        return f"{peer[0]:s}:{peer[1]:d}"
+    if not peer:
+        return "(unnamed)"
+    name = _unix_name(peer)
+    return name.decode(errors="replace") if isinstance(name, bytes) else name
+
+
 def _close_socket(sock: Any, method: Optional[int] = socket.SHUT_RDWR) -> int:
     if not isinstance(sock, socket.socket):
         return -1
@@ -85,6 +303,93 @@ def _close_socket(sock: Any, method: Optional[int] = socket.SHUT_RDWR) -> int:
     return ret
 
 
+def _unix_path(sock: Any) -> Optional[AnyStr]:
+    # Filesystem path of a bound Unix socket (None for others or abstract names)
+    if not isinstance(sock, socket.socket) or sock.family != _AF_UNIX:
+        return None
+    try:
+        path = sock.getsockname()
+    except OSError:
+        return None
+    return path if path and path[:1] not in ("\0", b"\0") else None
+
+
+def _remove_unix_path(path: Optional[AnyStr]) -> None:
+    if path:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+
+def _remove_stale_unix_path(path: AnyStr, type_: socket.SocketKind) -> None:
+    # Remove a socket file nobody serves on (left by a crashed server), raise
+    # EADDRINUSE if a server still owns it
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return  # Not a socket: let bind fail
+    except FileNotFoundError:
+        return
+    with socket.socket(_AF_UNIX, type_) as probe:
+        probe.setblocking(False)
+        try:
+            probe.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+        except OSError as e:  # E.g. full backlog (EAGAIN) or other socket type
+            raise OSError(errno.EADDRINUSE, os.strerror(errno.EADDRINUSE)) from e
+        else:
+            raise OSError(errno.EADDRINUSE, os.strerror(errno.EADDRINUSE))
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+
+def _close_server_socket(sock: Any) -> None:
+    # Close (and remove a filesystem Unix socket's file)
+    path = _unix_path(sock)
+    _close_socket(sock, method=None)
+    _remove_unix_path(path)
+
+
+def _reset_socket(sock: Any) -> int:
+    # Close with SO_LINGER 0 (RST instead of FIN)
+    if not isinstance(sock, socket.socket):
+        return -1
+    ret = 0
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+    except OSError:
+        ret = 1
+    sock.close()
+    return ret
+
+
+class _TokenBucket:
+    # Token bucket rate limiter (not thread-safe)
+    def __init__(self, rate: float, capacity: float = 0) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity > 0 else max(rate / 10, 1)
+        self.tokens = self.capacity
+        self.time = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.time:
+            self.tokens = min(
+                self.tokens + (now - self.time) * self.rate, self.capacity
+            )
+            self.time = now
+
+    def consume(self, count: float = 1, now: Optional[float] = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= count:
+            self.tokens -= count
+            return True
+        return False
+
+    def delay(self, count: float = 1, now: Optional[float] = None) -> float:
+        # Seconds until count tokens are available
+        self._refill(time.monotonic() if now is None else now)
+        return max(count - self.tokens, 0) / self.rate if self.rate > 0 else 0
+
+
 def _parse_address(
     address: Optional[AnyStr],
     port: int,
@@ -100,6 +405,164 @@ def _parse_address(
     return tuple(uniques((*e[-1][:2], e[0], e[1]) for e in records))
 
 
+AddressRecords = Tuple[Tuple[Any, int, socket.AddressFamily, socket.SocketKind], ...]
+_ResolverKey = Tuple[Optional[AnyStr], int, Optional[AnyStr], Optional[AnyStr]]
+
+
+class ResolverCache:
+    """Thread-safe, size-bounded (LRU), TTL-aware cache of address resolutions.
+
+    Failures are cached too (for a shorter time). Enable it for parse_address
+    (and everything built on it) with set_resolver_cache.
+    """
+
+    def __init__(
+        self, max_size: int = 1024, ttl: float = 60, negative_ttl: float = 5
+    ) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of entries (least recently used are evicted).
+            ttl: Seconds a successful resolution is valid.
+            negative_ttl: Seconds a failed resolution is valid (0 to not cache failures).
+        """
+        self.max_size = max(max_size, 1)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(
+        self,
+        key: _ResolverKey,
+        records: Optional[AddressRecords],
+        error: Optional[OSError],
+        ttl: float,
+    ) -> None:
+        # Failures are kept as (class, args): a shared instance would accumulate
+        # the traceback (and the frames) of every raise
+        error = None if error is None else (error.__class__, error.args)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, records, error)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _resolve(
+        self,
+        address: Optional[AnyStr],
+        port: int,
+        family: Optional[AnyStr],
+        type_: Optional[AnyStr],
+    ) -> AddressRecords:
+        key = (address, port, family, type_)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    if entry[2] is not None:
+                        self.negative_hits += 1
+                        raise entry[2][0](*entry[2][1])
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+        try:
+            records = _parse_address(address, port, family, type_)
+        except OSError as e:
+            if self.negative_ttl > 0:
+                self._store(key, None, e, self.negative_ttl)
+            raise
+        if self.ttl > 0:
+            self._store(key, records, None, self.ttl)
+        return records
+
+    def invalidate(
+        self,
+        address: Optional[AnyStr] = None,
+        port: Optional[int] = None,
+        family: Optional[AnyStr] = None,
+        type_: Optional[AnyStr] = None,
+    ) -> int:
+        """Remove the entries matching all the given (not None) criteria.
+
+        Without arguments, the cache is cleared. Returns the number of removed entries.
+        """
+        criteria = tuple(
+            (idx, value)
+            for idx, value in enumerate((address, port, family, type_))
+            if value is not None
+        )
+        with self._lock:
+            keys = tuple(
+                key
+                for key in self._entries
+                if all(key[idx] == value for idx, value in criteria)
+            )
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def warm(
+        self,
+        entries: Iterable[
+            Union[
+                AnyStr,
+                Tuple[Optional[AnyStr], int],
+                Tuple[Optional[AnyStr], int, Optional[AnyStr], Optional[AnyStr]],
+            ]
+        ],
+    ) -> int:
+        """Resolve (and cache) entries in bulk.
+
+        Args:
+            entries: Addresses or (address, port[, family, type]) tuples.
+
+        Returns the number of successfully resolved entries.
+        """
+        ret = 0
+        for entry in entries:
+            args = (entry,) if isinstance(entry, (str, bytes)) else tuple(entry)
+            args += (0, None, None)[len(args) - 1 :]
+            try:
+                self._resolve(*args)
+            except OSError:
+                continue
+            ret += 1
+        return ret
+
+    def statistics(self) -> Dict[str, int]:
+        """Return the hit / miss / eviction counters and the current size."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_resolver_cache = None
+
+
+def set_resolver_cache(cache: Optional[ResolverCache]) -> Optional[ResolverCache]:
+    """Set (None to disable) the cache used by parse_address and return the previous one."""
+    global _resolver_cache
+    ret = _resolver_cache
+    _resolver_cache = cache
+    return ret
+
+
 def parse_address(
     address: Optional[AnyStr],
     port: int = 0,
@@ -109,6 +572,8 @@ def parse_address(
 ) -> Tuple[Tuple[Any, int, socket.AddressFamily, socket.SocketKind], ...]:
     """Resolve an address and port into a tuple of (address, port, family, type) records.
 
+    Resolutions are cached if a resolver cache is set (see set_resolver_cache).
+
     Args:
         address: Hostname or IP to resolve.
         port: Port number (0 for any).
@@ -120,6 +585,23 @@ def parse_address(
         type_ is not None and type_ not in SOCKET_TYPES
     ):
         raise NetworkException("Invalid family or type")
+    if family == SOCKET_FAMILY_UNIX:
+        if not address:
+            raise NetworkException("Unix socket address (path or @name) required")
+        path = _unix_address(address)
+        records = tuple(
+            (path, 0, _AF_UNIX, e)
+            for e in (
+                (_SocketTypeMap[type_],)
+                if type_ is not None
+                else tuple(_SocketTypeMap.values())
+            )
+        )
+        if exact_matches > 0 and exact_matches != len(records):
+            raise NetworkException(
+                f"Got {len(records)} records (expected {exact_matches})"
+            )
+        return records
     if address is not None and family is not None:
         try:
             addr_str = address.decode() if isinstance(address, bytes) else address
@@ -131,13 +613,17 @@ def parse_address(
                 family == SOCKET_FAMILY_IPV6 and parsed.version != 6
             ):
                 raise NetworkException("Address does not match requested family")
+    cache = _resolver_cache
     try:
-        records = _parse_address(
-            address,
-            port,
-            family,
-            type_,
-        )
+        if cache is None:
+            records = _parse_address(
+                address,
+                port,
+                family,
+                type_,
+            )
+        else:
+            records = cache._resolve(address, port, family, type_)
     except OSError as e:
         raise NetworkException("Could not parse address") from e
     else:
@@ -148,8 +634,513 @@ def parse_address(
         return records
 
 
+def _create_server_socket(
+    address: AnyStr,
+    port: int,
+    family: Optional[AnyStr],
+    type_: Optional[AnyStr],
+    options: SockOpts,
+    backlog: int,
+) -> socket.SocketType:
+    record = parse_address(
+        address, port=port, family=family, type_=type_, exact_matches=1
+    )
+    return _bind_server_socket(record[0], options, backlog)
+
+
+def _bind_server_socket(
+    record: Tuple[Any, int, socket.AddressFamily, socket.SocketKind],
+    options: SockOpts,
+    backlog: int,
+) -> socket.SocketType:
+    resolved_family, resolved_type = record[2:]
+    default_options = {socket.SOL_SOCKET: {socket.SO_REUSEADDR: 1}}
+    if options:
+        for level, opts in options.items():
+            default_options.setdefault(level, {}).update(opts)
+    try:
+        sock = _create_socket(resolved_family, resolved_type, 0, default_options)
+    except OSError as e:
+        raise NetworkException("Error creating server") from e
+    try:
+        path = _sockaddr(record)
+        if resolved_family == _AF_UNIX and path[:1] not in ("\0", b"\0"):
+            _remove_stale_unix_path(path, resolved_type)
+        sock.bind(path)
+        if resolved_type in (socket.SOCK_STREAM, socket.SOCK_SEQPACKET):
+            sock.listen(backlog)
+    except OSError as e:
+        _close_socket(sock, method=None)
+        raise NetworkException("Error creating server") from e
+    return sock
+
+
+def _adopt_server_socket(fd: int, type_: Optional[AnyStr], backlog: int) -> Any:
+    try:
+        sock = socket.socket(fileno=fd)
+    except OSError as e:
+        raise NetworkException("Invalid socket file descriptor") from e
+    if type_ is not None and sock.type != _SocketTypeMap[type_]:
+        sock.detach()  # Left to the caller
+        raise NetworkException("Socket type mismatch")
+    try:
+        sock.setblocking(False)
+        if sock.type in (socket.SOCK_STREAM, socket.SOCK_SEQPACKET):
+            accept_conn = getattr(socket, "SO_ACCEPTCONN", None)
+            if accept_conn is None or not sock.getsockopt(
+                socket.SOL_SOCKET, accept_conn
+            ):
+                sock.listen(backlog)
+    except OSError as e:
+        sock.detach()
+        raise NetworkException("Error adopting server socket") from e
+    return sock
+
+
+def _send_fd(sock: socket.SocketType, fd: int, data: bytes) -> None:
+    sock.sendmsg(
+        (data,),
+        ((socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", (fd,))),),
+    )
+
+
+def _receive_fd(sock: socket.SocketType, data: bytes) -> int:
+    fds = array.array("i")
+    msg, ancdata, _, _ = sock.recvmsg(len(data), socket.CMSG_LEN(fds.itemsize))
+    for level, type_, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[: len(cmsg_data) - len(cmsg_data) % fds.itemsize])
+    if msg != data or len(fds) != 1:
+        for fd in fds:
+            os.close(fd)
+        raise NetworkException("Invalid handoff message")
+    return fds[0]
+
+
+class Backoff:
+    """Delays between retries: a capped geometric progression, with jitter.
+
+    The n-th delay is initial * factor ** n seconds (at most maximum), randomly
+    lowered by up to jitter_percent percent. 100 ("full jitter") spreads
+    retries the most, 0 disables jitter, factor 1 gives constant delays.
+    """
+
+    def __init__(
+        self,
+        initial: float = 0.1,
+        factor: float = 2,
+        maximum: float = 10,
+        jitter_percent: int = 100,
+    ) -> None:
+        if initial < 0 or factor < 1 or maximum < initial:
+            raise NetworkException("Invalid backoff parameters")
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter_percent = min(max(jitter_percent, 0), 100)
+
+    def delays(self) -> Generator[float, None, None]:
+        """Yield the delays (seconds, endless)."""
+        for delay in progression(
+            ratio=float(self.factor),
+            first=self.initial,
+            count=0,
+            stop_function=lambda arg: arg >= self.maximum,
+        ):
+            yield randomize(delay, self.jitter_percent, 0)
+        while True:
+            yield randomize(self.maximum, self.jitter_percent, 0)
+
+
+def _subnet(address: AnyStr, prefixes: Dict[int, int]) -> Any:
+    # Network address of the subnet (prefix length by IP version) address is in
+    try:
+        ip = ipaddress.ip_address(
+            address.decode() if isinstance(address, bytes) else address
+        )
+    except ValueError:
+        return address  # Hostname (or unix socket path): its own group
+    prefix = prefixes[ip.version]
+    if prefix >= ip.max_prefixlen:
+        return ip
+    return ipaddress.ip_network((ip, prefix), strict=False).network_address
+
+
+class RTTEstimator:
+    """Thread-safe, size-bounded (LRU), per subnet connect latency estimator.
+
+    Keeps a smoothed RTT and its variation for each subnet (RFC 6298) and
+    derives per attempt timeouts (SRTT + 4 * RTTVAR) from them, within [floor,
+    ceiling]. Subnets without samples get the initial timeout. Only attempts
+    that got an answer (connected or refused) are valid samples.
+    """
+
+    _ALPHA = 0.125
+    _BETA = 0.25
+    _K = 4
+
+    def __init__(
+        self,
+        floor: float = 0.05,
+        ceiling: float = _TIMEOUT_DEFAULT,
+        initial: Optional[float] = None,
+        ipv4_prefix: int = 24,
+        ipv6_prefix: int = 64,
+        max_size: int = 4096,
+    ) -> None:
+        """Initialize an estimator without samples.
+
+        Args:
+            floor: Minimum timeout (seconds).
+            ceiling: Maximum timeout (seconds).
+            initial: Timeout for subnets without samples (None for ceiling).
+            ipv4_prefix: Prefix length grouping IPv4 addresses.
+            ipv6_prefix: Prefix length grouping IPv6 addresses.
+            max_size: Maximum number of subnets (least recently used are evicted).
+        """
+        if not 0 < floor <= ceiling:
+            raise NetworkException("Invalid timeout bounds")
+        self.floor = floor
+        self.ceiling = ceiling
+        self.initial = ceiling if initial is None else initial
+        self.prefixes = {4: ipv4_prefix, 6: ipv6_prefix}
+        self.max_size = max(max_size, 1)
+        self.samples = 0
+        self._entries = collections.OrderedDict()  # Subnet: [SRTT, RTTVAR]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, address: AnyStr) -> Any:
+        return _subnet(address, self.prefixes)
+
+    def _clamp(self, value: float) -> float:
+        return min(max(value, self.floor), self.ceiling)
+
+    def timeout(self, address: AnyStr) -> float:
+        """Return the timeout (seconds) for a connection attempt to address."""
+        key = self._key(address)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return self._clamp(self.initial)
+            self._entries.move_to_end(key)
+            return self._clamp(entry[0] + self._K * entry[1])
+
+    def update(self, address: AnyStr, rtt: float) -> None:
+        """Add an answered attempt duration (seconds) to address' subnet estimate."""
+        key = self._key(address)
+        with self._lock:
+            self.samples += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [rtt, rtt / 2]
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                return
+            self._entries.move_to_end(key)
+            entry[1] += self._BETA * (abs(entry[0] - rtt) - entry[1])
+            entry[0] += self._ALPHA * (rtt - entry[0])
+
+    def estimate(self, address: AnyStr) -> Optional[Tuple[float, float]]:
+        """Return address' subnet (SRTT, RTTVAR) or None if there are no samples."""
+        with self._lock:
+            entry = self._entries.get(self._key(address))
+        return None if entry is None else tuple(entry)
+
+
+class AdmissionControl:
+    """Accept path admission control (see TCPServer admission).
+
+    Limits the rate of admitted connections, globally and per source subnet
+    (token buckets), and the number of concurrently open connections. Source
+    buckets are only kept for the max_sources most recently seen subnets
+    (least recently used are evicted), so memory is bounded whatever the
+    number of sources. Connections over the limits are shed either by
+    resetting them (SO_LINGER 0) right after accept, or by not accepting,
+    leaving them in the backlog (global limits only: the source is only known
+    after accept, so sources over their limit are always reset).
+    """
+
+    def __init__(
+        self,
+        rate: float = 0,
+        burst: float = 0,
+        source_rate: float = 0,
+        source_burst: float = 0,
+        max_connections: int = 0,
+        ipv4_prefix: int = 32,
+        ipv6_prefix: int = 64,
+        max_sources: int = 4096,
+        shed: str = BACKPRESSURE_RESET,
+    ) -> None:
+        """Initialize the limits (0 for no limit).
+
+        Args:
+            rate: Admitted connections per second (all sources).
+            burst: Connections admitted at once (0 for a tenth of rate, at least 1).
+            source_rate: Admitted connections per second from a source subnet.
+            source_burst: Connections admitted at once from a source subnet
+                (0 for a tenth of source_rate, at least 1).
+            max_connections: Maximum number of open connections.
+            ipv4_prefix: Prefix length grouping IPv4 sources.
+            ipv6_prefix: Prefix length grouping IPv6 sources.
+            max_sources: Maximum number of source buckets (least recently used
+                are evicted).
+            shed: Action over the global limits (one of BACKPRESSURES).
+        """
+        if min(rate, burst, source_rate, source_burst, max_connections) < 0:
+            raise NetworkException("Invalid admission limits")
+        if shed not in BACKPRESSURES:
+            raise NetworkException("Invalid shed action")
+        self.rate = rate
+        self.source_rate = source_rate
+        self.source_burst = source_burst
+        self.max_connections = max_connections
+        self.prefixes = {4: ipv4_prefix, 6: ipv6_prefix}
+        self.max_sources = max(max_sources, 1)
+        self.shed = shed
+        self.admitted = 0
+        self.rejected = dict.fromkeys(ADMISSION_REASONS, 0)
+        self._bucket = _TokenBucket(rate, burst) if rate > 0 else None
+        self._sources = collections.OrderedDict()  # Subnet: _TokenBucket
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def ready(
+        self, connections: int = 0, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Return seconds until the global limits admit a connection.
+
+        0 if one is admitted now, None if waiting for open connections to close.
+
+        Args:
+            connections: Currently open connections.
+            now: time.monotonic value (None for the current one).
+        """
+        if self.max_connections and connections >= self.max_connections:
+            return None
+        if self._bucket is None:
+            return 0
+        with self._lock:
+            return self._bucket.delay(1, now)
+
+    def admit(
+        self, address: AnyStr, connections: int = 0, now: Optional[float] = None
+    ) -> Optional[str]:
+        """Take an admission decision for a connection from address.
+
+        Return None if admitted, or the rejection reason (one of ADMISSION_REASONS).
+
+        Args:
+            address: Source IP (or unix socket path).
+            connections: Currently open connections (excluding this one).
+            now: time.monotonic value (None for the current one).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.max_connections and connections >= self.max_connections:
+                reason = ADMISSION_CONNECTIONS
+            elif self.source_rate > 0 and not self._source_bucket(address).consume(
+                1, now
+            ):
+                reason = ADMISSION_SOURCE
+            elif self._bucket is not None and not self._bucket.consume(1, now):
+                reason = ADMISSION_RATE
+            else:
+                self.admitted += 1
+                return None
+            self.rejected[reason] += 1
+            return reason
+
+    def _source_bucket(self, address: AnyStr) -> _TokenBucket:
+        # Called with the lock held
+        key = _subnet(address, self.prefixes)
+        bucket = self._sources.get(key)
+        if bucket is None:
+            bucket = _TokenBucket(self.source_rate, self.source_burst)
+            self._sources[key] = bucket
+            while len(self._sources) > self.max_sources:
+                self._sources.popitem(last=False)
+        else:
+            self._sources.move_to_end(key)
+        return bucket
+
+    def statistics(self) -> Dict[str, Any]:
+        """Return the admitted count, the rejected counts by reason and the tracked source count."""
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "sources": len(self._sources),
+            }
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of non-negative integer values (e.g. nanoseconds).
+
+    Every power of 2 range is split into 2 ** precision_bits equal buckets, so
+    any value is stored with a relative error below 2 ** -precision_bits, in
+    memory that only grows with the logarithm of the range. Count, sum, min
+    and max are exact.
+    """
+
+    def __init__(self, precision_bits: int = 5) -> None:
+        self.precision_bits = max(precision_bits, 1)
+        self._sub = 1 << self.precision_bits
+        self.buckets = collections.Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _index(self, value: int) -> int:
+        if value < self._sub:
+            return value
+        shift = value.bit_length() - self.precision_bits - 1
+        return (shift + 1) * self._sub + (value >> shift) - self._sub
+
+    def _bounds(self, index: int) -> Tuple[int, int]:
+        if index < self._sub * 2:
+            return index, index
+        shift = index // self._sub - 1
+        low = (index % self._sub + self._sub) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        """Add value (count times)."""
+        value = max(int(value), 0)
+        self.buckets[self._index(value)] += count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add all the values recorded in other (with the same precision)."""
+        if other.precision_bits != self.precision_bits:
+            raise NetworkException("Histogram precisions differ")
+        if not other.count:
+            return
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return the (approximate) value below which percent of the values are."""
+        if not self.count:
+            return None
+        rank = max(percent, 0) / 100 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                low, high = self._bounds(index)
+                return min(max((low + high) / 2, self.min), self.max)
+        return self.max
+
+    def statistics(
+        self, percents: Iterable[float] = (50, 90, 99)
+    ) -> Dict[str, Optional[float]]:
+        """Return count, min, avg, the given percentiles (p50, ...) and max."""
+        ret = {
+            "count": self.count,
+            "min": self.min,
+            "avg": self.total / self.count if self.count else None,
+        }
+        for percent in percents:
+            ret[f"p{percent:g}"] = self.percentile(percent)
+        ret["max"] = self.max
+        return ret
+
+
+def _answered(error: Optional[BaseException]) -> bool:
+    # The peer replied: the attempt duration is a valid RTT sample
+    return error is None or (
+        isinstance(error, OSError) and error.errno == errno.ECONNREFUSED
+    )
+
+
+class _RateWindow:
+    """Event counts for each of the last seconds (ring buffer). Not thread-safe."""
+
+    def __init__(self, seconds: int = max(_METRICS_WINDOWS)) -> None:
+        self._counts = [0] * (seconds + 1)
+        self._second = self._start = int(time.monotonic())
+
+    def _advance(self, second: int) -> None:
+        size = len(self._counts)
+        for idx in range(self._second + 1, min(second, self._second + size) + 1):
+            self._counts[idx % size] = 0
+        self._second = max(second, self._second)
+
+    def add(self, count: int = 1, now: Optional[float] = None) -> None:
+        second = int(time.monotonic() if now is None else now)
+        self._advance(second)
+        self._counts[second % len(self._counts)] += count
+
+    def rate(self, window: int, now: Optional[float] = None) -> float:
+        """Return the events per second over the last window complete seconds."""
+        second = int(time.monotonic() if now is None else now)
+        self._advance(second)
+        window = max(min(window, len(self._counts) - 1, second - self._start), 1)
+        size = len(self._counts)
+        return sum(self._counts[(second - i) % size] for i in range(1, window + 1)) / (
+            window
+        )
+
+
+def _listen_queue(sock: socket.SocketType) -> Optional[Tuple[int, Optional[int]]]:
+    # (Current, maximum) accept queue length of a listening TCP socket (Linux)
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, _TCP_INFO_SIZE)
+        return struct.unpack_from("II", info, 24)  # tcpi_unacked, tcpi_sacked
+    except (AttributeError, OSError, struct.error):
+        pass
+    try:  # Recv-Q of the socket's /proc/net/tcp* line
+        inode = str(os.fstat(sock.fileno()).st_ino)
+    except (OSError, ValueError):
+        return None
+    for file_name in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(file_name) as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if len(fields) > 9 and fields[9] == inode:
+                return int(fields[4].split(":")[1], 16), None
+    return None
+
+
+def _tcp_listen_overflows() -> Dict[str, int]:
+    # Network namespace wide counters (Linux)
+    try:
+        with open("/proc/net/netstat") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return {}
+    for names, values in zip(lines[::2], lines[1::2]):
+        if names.startswith("TcpExt:"):
+            stats = dict(zip(names.split()[1:], values.split()[1:]))
+            return {
+                "listen_overflows": int(stats.get("ListenOverflows", 0)),
+                "listen_drops": int(stats.get("ListenDrops", 0)),
+            }
+    return {}
+
+
 class _Server:
-    """Base class for poll-based socket servers running in a background thread."""
+    """Base class for selector-based socket servers running in a background thread."""
 
     def __init__(
         self,
@@ -161,6 +1152,7 @@ class _Server:
         silent: bool,
         options: SockOpts,
         backlog: int,
+        fd: Optional[int] = None,
     ) -> None:
         """Initialize the server, resolve the address, and bind the socket.
 
@@ -169,10 +1161,13 @@ class _Server:
             port: Port number to listen on.
             family: Socket family name (e.g. "ipv4"), or None for auto.
             type_: Socket type name (e.g. "tcp"), or None for auto.
-            poll_timeout: Seconds between polling cycles for incoming connections.
+            poll_timeout: Maximum seconds between polling cycles (0 or negative
+                to wait indefinitely, stopping wakes the thread anyway).
             silent: Suppress connection log messages.
             options: Nested dict of socket options keyed by level and option name.
             backlog: Maximum number of queued connections for stream sockets.
+            fd: Adopt this bound socket file descriptor instead of creating one
+                (address, port, family and options are ignored), see from_fd.
         """
         self.poll_timeout = poll_timeout
         self.silent = silent
@@ -183,25 +1178,116 @@ class _Server:
         self.daemon_thread = False
         self.handled_total = 0
         self.handled_ok = 0
-        record = parse_address(
-            address, port=port, family=family, type_=type_, exact_matches=1
-        )
-        resolved_addr, resolved_port, resolved_family, resolved_type = record[0]
-        self.type = resolved_type
-        default_options = {socket.SOL_SOCKET: {socket.SO_REUSEADDR: 1}}
-        if options:
-            for level, opts in options.items():
-                default_options.setdefault(level, {}).update(opts)
-        try:
-            self.socket = _create_socket(
-                resolved_family, resolved_type, 0, default_options
-            )
-            self.socket.bind((resolved_addr, resolved_port))
-            if resolved_type in (socket.SOCK_STREAM, socket.SOCK_SEQPACKET):
-                self.socket.listen(backlog)
+        self.start_time = None
+        self._accepts = _RateWindow()
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self.socket = self._bind(address, port, family, type_, options, backlog, fd)
+        self.type = self.socket.type
+
+    def _bind(
+        self,
+        address: AnyStr,
+        port: Any,
+        family: Optional[AnyStr],
+        type_: Optional[AnyStr],
+        options: SockOpts,
+        backlog: int,
+        fd: Optional[int],
+    ) -> socket.SocketType:
+        # Return the (main) server socket
+        if fd is None:
+            return _create_server_socket(address, port, family, type_, options, backlog)
+        return _adopt_server_socket(fd, type_, backlog)
+
+    def _sockets(self) -> Tuple[socket.SocketType, ...]:
+        # All the sockets served by the loop
+        return () if self.socket is None else (self.socket,)
+
+    @classmethod
+    def from_fd(cls, fd: int, **kwargs: Any) -> "_Server":
+        """Create a server adopting a bound (for TCP, listening or not) socket.
+
+        Nothing is (re)bound, so the address remains reachable across server
+        restarts. The descriptor (owned by the server from now on) may be
+        inherited (e.g. subprocess.Popen pass_fds) or received (receive_handoff).
+
+        Args:
+            fd: Socket file descriptor.
+            kwargs: Constructor arguments (except address, port and family).
+        """
+        return cls(None, 0, fd=fd, **kwargs)
+
+    @classmethod
+    def receive_handoff(
+        cls, address: AnyStr, timeout: float = 0, **kwargs: Any
+    ) -> "_Server":
+        """Wait for a running server's socket (see handoff) and adopt it (from_fd).
+
+        Args:
+            address: Unix socket path (or @name) to wait on.
+            timeout: Maximum seconds to wait (0 or negative for ever).
+            kwargs: Constructor arguments (except address, port and family).
+        """
+        if _AF_UNIX is None or not hasattr(socket, "SCM_RIGHTS"):
+            raise NetworkException("Listener handoff not supported")
+        listener = _create_server_socket(
+            address, 0, SOCKET_FAMILY_UNIX, SOCKET_TYPE_TCP, None, 1
+        )
+        try:
+            listener.settimeout(timeout if timeout > 0 else None)
+            channel = listener.accept()[0]
         except OSError as e:
-            self.close()
-            raise NetworkException("Error creating server") from e
+            raise NetworkException("No handoff received") from e
+        finally:
+            _close_server_socket(listener)
+        with channel:
+            try:
+                channel.settimeout(timeout if timeout > 0 else None)
+                fd = _receive_fd(channel, _HANDOFF_MESSAGE)
+            except OSError as e:
+                raise NetworkException("Invalid handoff message") from e
+            try:
+                srv = cls.from_fd(fd, **kwargs)
+            except Exception:
+                os.close(fd)
+                raise
+            try:
+                channel.sendall(_HANDOFF_ACK)
+            except OSError as e:
+                srv.close()
+                raise NetworkException("Could not confirm handoff") from e
+        return srv
+
+    def handoff(self, address: AnyStr, timeout: float = _TIMEOUT_DEFAULT) -> None:
+        """Pass the socket to a replacement server (in receive_handoff), then drain and close.
+
+        This server keeps serving until the replacement confirms it adopted
+        the socket, then it stops (handling the connections it already
+        accepted). Meanwhile, incoming connections wait in the (shared)
+        backlog, so none is refused during restarts.
+
+        Args:
+            address: Unix socket path (or @name) the replacement waits on.
+            timeout: Maximum seconds for the exchange (0 or negative for ever).
+        """
+        if self.socket is None:
+            raise NetworkException("Server closed")
+        if _AF_UNIX is None or not hasattr(socket, "SCM_RIGHTS"):
+            raise NetworkException("Listener handoff not supported")
+        try:
+            with socket.socket(_AF_UNIX, socket.SOCK_STREAM) as channel:
+                channel.settimeout(timeout if timeout > 0 else None)
+                channel.connect(_unix_address(address))
+                _send_fd(channel, self.socket.fileno(), _HANDOFF_MESSAGE)
+                if channel.recv(len(_HANDOFF_ACK)) != _HANDOFF_ACK:
+                    raise NetworkException("Handoff not confirmed")
+        except OSError as e:
+            raise NetworkException("Handoff failed") from e
+        self.stop()
+        sock, self.socket = self.socket, None
+        # Just release the descriptor (no shutdown or unlink): it's shared now
+        _close_socket(sock, method=None)
 
     def __enter__(self) -> "_Server":
         if not self.start():
@@ -226,45 +1312,185 @@ class _Server:
             return False
         if self.running:
             return True
+        try:
+            self._wakeup = socket.socketpair()
+            for sock in self._wakeup:
+                sock.setblocking(False)
+        except OSError:
+            self._close_wakeup()
+            return False
         self.thread = threading.Thread(target=self._run)
         self.thread.daemon = self.daemon_thread
+        self.start_time = time.monotonic()
         self.running = True
         self.thread.start()
         return True
 
     def stop(self) -> None:
-        """Stop the server's background polling thread."""
+        """Stop the server's background polling thread (without waiting for a poll cycle)."""
         self.running = False
+        self._wake()
         if self.thread is not None:
             self.thread.join()
             self.thread = None
+        self._close_wakeup()
+
+    def _wake(self) -> None:
+        wakeup = self._wakeup
+        if wakeup is None:
+            return
+        try:
+            wakeup[1].send(b"\0")
+        except OSError:  # Buffer full (a wakeup is already pending) or closed
+            pass
+
+    def _close_wakeup(self) -> None:
+        if self._wakeup is None:
+            return
+        for sock in self._wakeup:
+            _close_socket(sock, method=None)
+        self._wakeup = None
+
+    def handle_incoming(
+        self, sock: Optional[socket.SocketType] = None
+    ) -> Optional[bool]:
+        """Handle a single incoming connection (on sock, default the server socket).
 
-    def handle_incoming(self) -> bool:
-        """Handle a single incoming connection. Subclasses must override."""
+        Subclasses must override it. Return None if the outcome is counted later (via _count).
+        Raise BlockingIOError when there is nothing (left) to handle.
+        """
         raise NotImplementedError
 
+    def _count(self, ok: bool, sock: Optional[socket.SocketType] = None) -> None:
+        with self._lock:
+            if ok:
+                self.handled_ok += 1
+            self.handled_total += 1
+
+    def _accepting(self) -> bool:
+        return True
+
+    def _poll_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        # Selector timeout for the next cycle (e.g. to resume accepting)
+        return timeout
+
+    def _handle_ready(self, sock: socket.SocketType) -> None:
+        accepted = 0
+        try:
+            for _ in range(_ACCEPT_BATCH_MAX):
+                if not self.running or not self._accepting():
+                    break
+                try:
+                    ok = self.handle_incoming(sock)
+                except (BlockingIOError, InterruptedError):
+                    break
+                accepted += 1
+                if ok is not None:
+                    self._count(ok, sock)
+        finally:
+            if accepted:
+                with self._lock:
+                    self._accepts.add(accepted)
+
+    def _metrics(self, metrics: Dict[str, Any]) -> None:
+        # Add subclass specific values (called with the lock held)
+        pass
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return a snapshot of the server counters and gauges.
+
+        Keys: type, address, port, uptime (seconds), handled_total, handled_ok,
+        accept_rate (incoming items per second over the last 1, 10 and 60
+        seconds), plus (for TCP) accept_queue and accept_queue_max (listening
+        socket Recv-Q and backlog, where available) and listen_overflows and
+        listen_drops (network namespace wide, from /proc/net/netstat).
+        Subclasses add their own.
+        """
+        now = time.monotonic()
+        sock = self.socket
+        ret = {
+            "type": (
+                SOCKET_TYPE_UDP if self.type == socket.SOCK_DGRAM else SOCKET_TYPE_TCP
+            ),
+            "address": None,
+            "port": None,
+            "uptime": 0 if self.start_time is None else now - self.start_time,
+        }
+        if sock is not None:
+            try:
+                name = sock.getsockname()
+            except OSError:
+                pass
+            else:
+                if isinstance(name, tuple):
+                    ret["address"], ret["port"] = name[:2]
+                else:
+                    ret["address"] = _peer_string(name)
+        with self._lock:
+            ret["handled_total"] = self.handled_total
+            ret["handled_ok"] = self.handled_ok
+            ret["accept_rate"] = {
+                window: self._accepts.rate(window, now) for window in _METRICS_WINDOWS
+            }
+            self._metrics(ret)
+        if ret["type"] == SOCKET_TYPE_TCP:
+            queue = None if sock is None else _listen_queue(sock)
+            ret["accept_queue"], ret["accept_queue_max"] = queue or (None, None)
+            ret.update(_tcp_listen_overflows())
+        return ret
+
     def _run(self) -> None:
-        if self.socket is None:
+        sockets = self._sockets()
+        if not sockets or self._wakeup is None:
             return
-        while self.running:
-            if (
-                self.socket
-                in select.select((self.socket,), (), (), self.poll_timeout)[0]
-            ):
-                if self.handle_incoming():
-                    self.handled_ok += 1
-                self.handled_total += 1
+        timeout = self.poll_timeout if self.poll_timeout > 0 else None
+        wakeup = self._wakeup[0]
+        with selectors.DefaultSelector() as selector:
+            selector.register(wakeup, selectors.EVENT_READ)
+            listening = False
+            while self.running:
+                if self._accepting() != listening:
+                    for sock in sockets:
+                        if listening:
+                            selector.unregister(sock)
+                        else:
+                            selector.register(sock, selectors.EVENT_READ)
+                    listening = not listening
+                for key, _ in selector.select(timeout=self._poll_timeout(timeout)):
+                    if key.fileobj is wakeup:
+                        try:
+                            wakeup.recv(512)
+                        except OSError:
+                            pass
+                    elif self.running:
+                        self._handle_ready(key.fileobj)
 
     def close(self, stop_thread: bool = True) -> None:
         """Stop the server thread and close the socket."""
         if stop_thread:
             self.stop()
-        _close_socket(self.socket)
+        _close_server_socket(self.socket)
         self.socket = None
 
 
+def _run_connection_handler(
+    handler: Optional[ConnectionHandler],
+    client: socket.SocketType,
+    peer: Tuple[Any, ...],
+) -> bool:
+    try:
+        if handler is None:
+            return True
+        # Accepted sockets may inherit the listener's O_NONBLOCK (e.g. BSD, macOS)
+        client.setblocking(True)
+        ret = handler(client, peer)
+        return ret is None or bool(ret)
+    finally:
+        _close_socket(client)
+
+
 class TCPServer(_Server):
-    """TCP server that accepts and immediately closes incoming connections."""
+    """TCP server that hands accepted connections to a handler (by default, closes them)."""
 
     def __init__(
         self,
@@ -275,7 +1501,70 @@ class TCPServer(_Server):
         silent: bool = False,
         options: SockOpts = None,
         backlog: int = 5,
+        handler: Optional[ConnectionHandler] = None,
+        handler_workers: int = 0,
+        handler_process_pool: bool = False,
+        queue_size: int = 0,
+        backpressure: str = BACKPRESSURE_PAUSE,
+        fast_open: int = 0,
+        fd: Optional[int] = None,
+        admission: Optional[AdmissionControl] = None,
     ) -> None:
+        """Initialize the server, resolve the address, and bind the socket.
+
+        Args:
+            address: Hostname or IP to bind to.
+            port: Port number to listen on.
+            family: Socket family name (e.g. "ipv4"), or None for auto.
+            poll_timeout: Maximum seconds between polling cycles.
+            silent: Suppress connection log messages.
+            options: Nested dict of socket options keyed by level and option name.
+            backlog: Maximum number of queued connections.
+            handler: Callable invoked as handler(client_socket, peer) for each
+                connection (the socket is closed afterwards). Returning False
+                (or raising) counts as a failure. None to only close connections.
+            handler_workers: Number of pool workers running the handler
+                (0 to run it in the server thread).
+            handler_process_pool: Use a process pool instead of a thread pool
+                (handler must be picklable).
+            queue_size: Maximum number of connections queued or being handled
+                by the pool (0 for twice the worker count).
+            backpressure: Action when the queue is full (one of BACKPRESSURES).
+            fast_open: Enable TCP Fast Open (RFC 7413) on the listening socket,
+                with this maximum number of pending TFO requests (0 to disable).
+                On Linux, the net.ipv4.tcp_fastopen sysctl must also have the
+                server bit (2) set.
+            fd: Adopt this bound socket file descriptor (see from_fd).
+            admission: Limits on the accepted connections (rate, per source
+                rate and open connections), None for no limits.
+        """
+        if backpressure not in BACKPRESSURES:
+            raise NetworkException("Invalid backpressure")
+        if fast_open > 0:
+            tcp_fastopen = getattr(socket, "TCP_FASTOPEN", None)
+            if tcp_fastopen is None:
+                raise NetworkException("TCP Fast Open not supported")
+            options = {
+                **(options or {}),
+                socket.IPPROTO_TCP: {
+                    **(options or {}).get(socket.IPPROTO_TCP, {}),
+                    tcp_fastopen: fast_open,
+                },
+            }
+        self.handler = handler
+        self.handler_workers = max(handler_workers, 0)
+        self.handler_process_pool = handler_process_pool
+        self.queue_size = queue_size if queue_size > 0 else self.handler_workers * 2
+        self.backpressure = backpressure
+        self.admission = admission
+        self.connections_open = 0
+        self.executor = None
+        self.queue_depth = 0
+        self.queue_depth_max = 0
+        self.handled_rejected = 0
+        self.handler_latency_total = 0.0
+        self.handler_latency_max = 0.0
+        self.handler_latency = LatencyHistogram()  # Nanoseconds
         super().__init__(
             address,
             port,
@@ -285,90 +1574,1899 @@ class TCPServer(_Server):
             silent,
             options,
             backlog,
+            fd=fd,
+        )
+
+    def start(self) -> bool:
+        if self.running or not self.handler_workers or self.socket is None:
+            return super().start()
+        executor_class = (
+            futures.ProcessPoolExecutor
+            if self.handler_process_pool
+            else futures.ThreadPoolExecutor
+        )
+        self.executor = executor_class(max_workers=self.handler_workers)
+        if super().start():
+            return True
+        self.executor.shutdown()
+        self.executor = None
+        return False
+
+    def stop(self) -> None:
+        """Stop accepting, then wait for the queued connections to be handled."""
+        super().stop()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _admission_paused(self) -> bool:
+        return self.admission is not None and self.admission.shed == BACKPRESSURE_PAUSE
+
+    def _accepting(self) -> bool:
+        if (
+            self._admission_paused()
+            and self.admission.ready(self.connections_open) != 0
+        ):
+            return False  # Over the global limits: leave them in the backlog
+        return (
+            self.executor is None
+            or self.backpressure != BACKPRESSURE_PAUSE
+            or self.queue_depth < self.queue_size
         )
 
-    def handle_incoming(self) -> bool:
+    def _poll_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        if not self._admission_paused():
+            return timeout
+        delay = self.admission.ready(self.connections_open)
+        if not delay:  # Accepting, or woken up when a connection closes
+            return timeout
+        return delay if timeout is None else min(delay, timeout)
+
+    def _record_latency(self, accept_time: float) -> None:
+        latency = time.perf_counter() - accept_time
+        with self._lock:
+            self.handler_latency_total += latency
+            if latency > self.handler_latency_max:
+                self.handler_latency_max = latency
+            self.handler_latency.record(latency * 1000000000)
+
+    def _metrics(self, metrics: Dict[str, Any]) -> None:
+        stats = self.handler_latency.statistics()
+        metrics["handler_latency"] = {
+            key: value if key == "count" or value is None else value / 1000000000
+            for key, value in stats.items()
+        }
+        metrics["handler_latency"]["sum"] = self.handler_latency_total
+        metrics["queue_depth"] = self.queue_depth
+        metrics["queue_depth_max"] = self.queue_depth_max
+        metrics["handled_rejected"] = self.handled_rejected
+        metrics["connections_open"] = self.connections_open
+        if self.admission is not None:
+            metrics["admission_rejected"] = self.admission.statistics()["rejected"]
+
+    def _handler_done(
+        self,
+        client: socket.SocketType,
+        accept_time: float,
+        sock: socket.SocketType,
+        future: futures.Future,
+    ) -> None:
+        try:
+            ok = future.result()
+        except (Exception, futures.CancelledError) as e:
+            if not self.silent:
+                print(e)
+            ok = False
+        _close_socket(client, method=None)
+        self._record_latency(accept_time)
+        with self._lock:
+            self.queue_depth -= 1
+            self.connections_open -= 1
+        self._count(ok, sock)
+        if self.backpressure == BACKPRESSURE_PAUSE or self._admission_paused():
+            self._wake()
+
+    def handle_incoming(
+        self, sock: Optional[socket.SocketType] = None
+    ) -> Optional[bool]:
+        sock = self.socket if sock is None else sock
+        try:
+            client, peer = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            raise
+        except Exception as e:
+            if not self.silent:
+                print(e)
+            return False
+        accept_time = time.perf_counter()
+        if self.admission is not None:
+            reason = self.admission.admit(
+                peer[0] if isinstance(peer, tuple) else peer, self.connections_open
+            )
+            if reason is not None:
+                with self._lock:
+                    self.handled_rejected += 1
+                if not self.silent:
+                    print(f"Rejected connection from {_peer_string(peer)} ({reason})")
+                _reset_socket(client)
+                return False
+        if not self.silent:
+            print(f"Established connection from {_peer_string(peer)}")
+        executor = self.executor
+        if executor is None:
+            with self._lock:
+                self.connections_open += 1
+            try:
+                ok = _run_connection_handler(self.handler, client, peer)
+            except Exception as e:
+                if not self.silent:
+                    print(e)
+                ok = False
+            finally:
+                with self._lock:
+                    self.connections_open -= 1
+            self._record_latency(accept_time)
+            return ok
+        with self._lock:
+            full = self.queue_depth >= self.queue_size
+            if not full:
+                self.queue_depth += 1
+                self.connections_open += 1
+                if self.queue_depth > self.queue_depth_max:
+                    self.queue_depth_max = self.queue_depth
+            else:
+                self.handled_rejected += 1
+        if full:
+            _reset_socket(client)
+            return False
         try:
-            client, peer = self.socket.accept()
+            future = executor.submit(
+                _run_connection_handler, self.handler, client, peer
+            )
+        except Exception as e:
             if not self.silent:
-                print(f"Established connection from {peer[0]:s}:{peer[1]:d}")
+                print(e)
             _close_socket(client)
+            with self._lock:
+                self.queue_depth -= 1
+                self.connections_open -= 1
+            return False
+        future.add_done_callback(
+            functools.partial(self._handler_done, client, accept_time, sock)
+        )
+        return None
+
+
+class ServerGroup(TCPServer):
+    """TCP listeners on many ports (each on all its resolved addresses), served by one thread.
+
+    All the listening sockets share one selector loop (and handler, pool and
+    counters), so thousands of ports don't need thousands of threads.
+    Outcomes are also counted per port (see port_counters).
+    """
+
+    def __init__(
+        self,
+        address: AnyStr,
+        ports: Union[int, Iterable[int]],
+        family: Optional[AnyStr] = None,
+        poll_timeout: float = _TIMEOUT_DEFAULT,
+        silent: bool = False,
+        options: SockOpts = None,
+        backlog: int = 5,
+        handler: Optional[ConnectionHandler] = None,
+        handler_workers: int = 0,
+        handler_process_pool: bool = False,
+        queue_size: int = 0,
+        backpressure: str = BACKPRESSURE_PAUSE,
+        admission: Optional[AdmissionControl] = None,
+    ) -> None:
+        """Initialize the group, resolve the address, and bind all the sockets.
+
+        Args:
+            address: Hostname or IP to bind to (every resolved record, e.g. both
+                IPv4 and IPv6 ones, gets its own socket).
+            ports: Port number(s) to listen on (e.g. range(20000, 21001)).
+            family: Socket family name (e.g. "ipv4"), or None for all.
+            poll_timeout: Maximum seconds between polling cycles.
+            silent: Suppress connection log messages.
+            options: Nested dict of socket options keyed by level and option name.
+            backlog: Maximum number of queued connections (per socket).
+            handler: Connection handler (see TCPServer).
+            handler_workers: Number of handler pool workers (see TCPServer).
+            handler_process_pool: Use a process pool (see TCPServer).
+            queue_size: Maximum number of queued connections (see TCPServer).
+            backpressure: Action when the queue is full (one of BACKPRESSURES).
+            admission: Limits on the accepted connections, shared by all the
+                listeners (see TCPServer).
+        """
+        self.ports = (ports,) if isinstance(ports, int) else tuple(uniques(ports))
+        self.listeners = {}  # Socket: port
+        self.port_counters = {}  # Port: [handled_total, handled_ok]
+        super().__init__(
+            address,
+            self.ports,
+            family=family,
+            poll_timeout=poll_timeout,
+            silent=silent,
+            options=options,
+            backlog=backlog,
+            handler=handler,
+            handler_workers=handler_workers,
+            handler_process_pool=handler_process_pool,
+            queue_size=queue_size,
+            backpressure=backpressure,
+            admission=admission,
+        )
+
+    @classmethod
+    def from_fd(cls, fd: int, **kwargs: Any) -> "_Server":
+        raise NetworkException("Not supported for server groups")
+
+    def handoff(self, address: AnyStr, timeout: float = _TIMEOUT_DEFAULT) -> None:
+        raise NetworkException("Not supported for server groups")
+
+    def _bind(
+        self,
+        address: AnyStr,
+        port: Any,
+        family: Optional[AnyStr],
+        type_: Optional[AnyStr],
+        options: SockOpts,
+        backlog: int,
+        fd: Optional[int],
+    ) -> socket.SocketType:
+        if not port or any(e <= 0 or e > 0xFFFF for e in port):
+            raise NetworkException("Invalid port(s)")
+        ipv6_options = {
+            **(options or {}),
+            socket.IPPROTO_IPV6: {
+                **(options or {}).get(socket.IPPROTO_IPV6, {}),
+                socket.IPV6_V6ONLY: 1,  # IPv4 records get their own sockets
+            },
+        }
+        try:
+            for idx in port:
+                for record in parse_address(
+                    address, port=idx, family=family, type_=type_
+                ):
+                    sock = _bind_server_socket(
+                        record,
+                        ipv6_options if record[2] == socket.AF_INET6 else options,
+                        backlog,
+                    )
+                    self.listeners[sock] = idx
+                self.port_counters[idx] = [0, 0]
+        except NetworkException:
+            self._close_listeners()
+            raise
+        return next(iter(self.listeners))
+
+    def _sockets(self) -> Tuple[socket.SocketType, ...]:
+        return tuple(self.listeners) if self.socket is not None else ()
+
+    def _count(self, ok: bool, sock: Optional[socket.SocketType] = None) -> None:
+        super()._count(ok, sock)
+        port = self.listeners.get(sock)
+        if port is not None:
+            with self._lock:
+                counters = self.port_counters[port]
+                counters[0] += 1
+                if ok:
+                    counters[1] += 1
+
+    def counters(self) -> Dict[int, Tuple[int, int]]:
+        """Return the (handled_total, handled_ok) counters of each port."""
+        with self._lock:
+            return {port: tuple(e) for port, e in self.port_counters.items()}
+
+    def _metrics(self, metrics: Dict[str, Any]) -> None:
+        super()._metrics(metrics)
+        metrics["listeners"] = len(self.listeners)
+        metrics["ports"] = len(self.ports)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return a snapshot of the group counters and gauges.
+
+        Like TCPServer.metrics, with port being the ports range (or count) and
+        the accept queues summed over all the sockets, plus listeners and ports.
+        """
+        ret = super().metrics()
+        first, last = min(self.ports), max(self.ports)
+        if len(self.ports) == 1:
+            ret["port"] = first
+        elif len(self.ports) == last - first + 1:
+            ret["port"] = f"{first}-{last}"
+        else:
+            ret["port"] = f"{len(self.ports)} ports"
+        queues = [_listen_queue(e) for e in self._sockets()]
+        if queues and None not in queues:
+            ret["accept_queue"] = sum(e[0] for e in queues)
+            ret["accept_queue_max"] = sum(e[1] for e in queues)
+        return ret
+
+    def _close_listeners(self) -> None:
+        for sock in self.listeners:
+            _close_server_socket(sock)
+        self.listeners = {}
+
+    def close(self, stop_thread: bool = True) -> None:
+        """Stop the server thread and close all the sockets."""
+        if stop_thread:
+            self.stop()
+        self._close_listeners()
+        self.socket = None
+
+
+class UDPServer(_Server):
+    """UDP server that receives datagrams (without allocating) and passes them to a handler."""
+
+    def __init__(
+        self,
+        address: AnyStr,
+        port: int,
+        family: Optional[AnyStr] = None,
+        poll_timeout: float = _TIMEOUT_DEFAULT,
+        silent: bool = False,
+        options: SockOpts = None,
+        handler: Optional[DatagramHandler] = None,
+        buffer_size: int = _DATAGRAM_SIZE_MAX,
+        fd: Optional[int] = None,
+    ) -> None:
+        """Initialize the server, resolve the address, and bind the socket.
+
+        Args:
+            address: Hostname or IP to bind to.
+            port: Port number to listen on.
+            family: Socket family name (e.g. "ipv4"), or None for auto.
+            poll_timeout: Maximum seconds between polling cycles.
+            silent: Suppress datagram log messages.
+            options: Nested dict of socket options keyed by level and option name.
+            handler: Callable invoked as handler(data, peer) for each datagram.
+                data is a memoryview over the (reused) receive buffer, only valid
+                during the call (copy it to keep it). Returning False (or raising)
+                counts as a failure.
+            buffer_size: Receive buffer size (longer datagrams are truncated).
+            fd: Adopt this bound socket file descriptor (see from_fd).
+        """
+        self.handler = handler
+        self.buffer = bytearray(max(buffer_size, 1))
+        self.view = memoryview(self.buffer)
+        self.received_packets = 0
+        self.received_bytes = 0
+        super().__init__(
+            address,
+            port,
+            family,
+            SOCKET_TYPE_UDP,
+            poll_timeout,
+            silent,
+            options,
+            0,
+            fd=fd,
+        )
+
+    def handle_incoming(self, sock: Optional[socket.SocketType] = None) -> bool:
+        sock = self.socket if sock is None else sock
+        try:
+            size, peer = sock.recvfrom_into(self.buffer)
+        except (BlockingIOError, InterruptedError):
+            raise
+        except Exception as e:
+            if not self.silent:
+                print(e)
+            return False
+        self.received_packets += 1
+        self.received_bytes += size
+        if not self.silent:
+            print(f"Received {size:d} bytes from {_peer_string(peer)}")
+        if self.handler is None:
             return True
+        try:
+            ret = self.handler(self.view[:size], peer)
+            return ret is None or bool(ret)
         except Exception as e:
             if not self.silent:
                 print(e)
             return False
 
+    def _metrics(self, metrics: Dict[str, Any]) -> None:
+        metrics["received_packets"] = self.received_packets
+        metrics["received_bytes"] = self.received_bytes
 
-def connect_to_server(
-    address: AnyStr,
-    port: int,
-    family: Optional[str] = None,
-    attempts: int = 1,
-    attempt_timeout: float = _TIMEOUT_DEFAULT,
-    options: SockOpts = None,
-    # If True, socket will have to be closed by caller
-    _return_client_socket: bool = False,
-) -> Union[Tuple[Any, ...], socket.SocketType, None]:
-    """Attempt a TCP connection and return the local address or the client socket.
 
-    Args:
-        address: Hostname or IP to connect to.
-        port: Target port number.
-        family: Socket family name (e.g. "ipv4", "ipv6"), or None for auto.
-        attempts: Number of connection attempts before raising.
-        attempt_timeout: Timeout in seconds for each attempt.
-        options: Nested dict of socket options keyed by level and option name.
-        _return_client_socket: If True, return the connected socket instead of
-            the local address. The caller is responsible for closing it.
+class _WorkerTCPServer(TCPServer):
+    def __init__(self, counters: Any, index: int, *args, **kwargs) -> None:
+        self._counters = counters
+        self._index = index * _WORKER_SLOTS
+        super().__init__(*args, **kwargs)
+
+    def _count(self, ok: bool, sock: Optional[socket.SocketType] = None) -> None:
+        # Published under the same lock, so concurrent handlers can't write stale values
+        with self._lock:
+            if ok:
+                self.handled_ok += 1
+            self.handled_total += 1
+            self._counters[self._index + 1] = self.handled_total
+            self._counters[self._index + 2] = self.handled_ok
+
+
+def _tcp_server_worker(
+    index: int,
+    counters: Any,
+    stop_event: Any,
+    server_args: Tuple[Any, ...],
+    server_kwargs: Dict[str, Any],
+) -> None:
+    slot = index * _WORKER_SLOTS
+    try:
+        srv = _WorkerTCPServer(counters, index, *server_args, **server_kwargs)
+    except NetworkException as e:
+        counters[slot] = _WORKER_FAILED
+        if not server_kwargs.get("silent"):
+            print(f"Worker {index}: {e}")
+        return
+    try:
+        srv.daemon_thread = True
+        if not srv.start():
+            counters[slot] = _WORKER_FAILED
+            return
+        counters[slot] = _WORKER_RUNNING
+        stop_event.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.close()
+        counters[slot] = _WORKER_STOPPED
+
+
+class MultiProcessTCPServer:
+    """TCP server running in multiple processes sharing the same address and port.
+
+    Each worker process binds its own listening socket with SO_REUSEPORT, and
+    the kernel load-balances incoming connections between them. Counters are
+    aggregated through shared memory.
     """
-    attempts = max(attempts, 1)
-    record = parse_address(
-        address, port=port, family=family, type_=SOCKET_TYPE_TCP, exact_matches=1
-    )
-    resolved_addr, resolved_port, resolved_family, resolved_type = record[0]
-    client = None
-    last_error = None
-    for _ in range(attempts):
+
+    def __init__(
+        self,
+        address: AnyStr,
+        port: int,
+        family: Optional[AnyStr] = None,
+        poll_timeout: float = _TIMEOUT_DEFAULT,
+        silent: bool = False,
+        options: SockOpts = None,
+        backlog: int = 5,
+        workers: int = 0,
+        start_timeout: float = 10,
+        handler: Optional[ConnectionHandler] = None,
+        handler_workers: int = 0,
+        queue_size: int = 0,
+        backpressure: str = BACKPRESSURE_PAUSE,
+    ) -> None:
+        """Initialize the server group (worker processes are spawned by start).
+
+        Args:
+            address: Hostname or IP to bind to.
+            port: Port number to listen on (0 to pick a free one).
+            family: Socket family name (e.g. "ipv4"), or None for auto.
+            poll_timeout: Maximum seconds between polling cycles (per worker).
+            silent: Suppress connection log messages.
+            options: Nested dict of socket options keyed by level and option name.
+            backlog: Maximum number of queued connections (per worker).
+            workers: Number of worker processes (0 or negative for the usable CPU count).
+            start_timeout: Seconds to wait for all workers to start listening.
+            handler: Connection handler (see TCPServer), must be picklable.
+            handler_workers: Number of handler threads (per worker).
+            queue_size: Maximum number of queued connections (per worker).
+            backpressure: Action when the queue is full (one of BACKPRESSURES).
+        """
+        self.workers = workers if workers > 0 else cpu_count()
+        self.start_timeout = start_timeout
+        self.processes = []
+        self.socket = None
+        self._stop_event = None
+        self._counters = None
+        self._base_total = 0
+        self._base_ok = 0
+        self.start_time = None
+        if family == SOCKET_FAMILY_UNIX:
+            raise NetworkException("Unix sockets can't be shared between processes")
+        reuse_port = getattr(socket, "SO_REUSEPORT", None)
+        if reuse_port is None:
+            raise NetworkException("SO_REUSEPORT not supported")
+        opts = {socket.SOL_SOCKET: {socket.SO_REUSEADDR: 1, reuse_port: 1}}
+        if options:
+            for level, level_opts in options.items():
+                opts.setdefault(level, {}).update(level_opts)
+        record = parse_address(
+            address, port=port, family=family, type_=SOCKET_TYPE_TCP, exact_matches=1
+        )
+        resolved_addr, resolved_port, resolved_family, resolved_type = record[0]
+        # Bound (not listening) socket: reserves the port for the workers
         try:
-            client = _create_socket(
-                resolved_family, resolved_type, attempt_timeout, options
-            )
-            client.connect((resolved_addr, resolved_port))
-            if _return_client_socket:
-                return client
-            else:
-                try:
-                    return client.getsockname()
-                finally:
-                    if attempt_timeout > 0:
-                        _close_socket(client)
-                    else:
-                        ws = select.select((), (client,), ())[1]
-                        if ws and ws[0] == client:
-                            _close_socket(client)
-                        else:
-                            _close_socket(client, method=None)
+            self.socket = _create_socket(resolved_family, resolved_type, 0, opts)
+            self.socket.bind((resolved_addr, resolved_port))
         except OSError as e:
-            last_error = e
-            if client is not None:
-                try:
-                    _close_socket(client, method=None)
-                except Exception:
-                    pass
-                client = None
-    raise NetworkException("Could not connect to server") from last_error
+            self.close()
+            raise NetworkException("Error creating server") from e
+        self.address = self.socket.getsockname()
+        self._server_args = (resolved_addr, self.address[1])
+        self._server_kwargs = {
+            "family": family,
+            "poll_timeout": poll_timeout,
+            "silent": silent,
+            "options": opts,
+            "backlog": backlog,
+            "handler": handler,
+            "handler_workers": handler_workers,
+            "queue_size": queue_size,
+            "backpressure": backpressure,
+        }
+
+    def __enter__(self) -> "MultiProcessTCPServer":
+        if not self.start():
+            raise NetworkException("Could not start server")
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[builtin_types.TracebackType],
+    ) -> bool:
+        self.close()
+        return exc_type is None
+
+    def __del__(self) -> None:
+        self.close()
+
+    @property
+    def running(self) -> bool:
+        return bool(self.processes)
+
+    @property
+    def handled_total(self) -> int:
+        return self._base_total + self._counter_sum(1)
+
+    @property
+    def handled_ok(self) -> int:
+        return self._base_ok + self._counter_sum(2)
+
+    def _counter_sum(self, offset: int) -> int:
+        if self._counters is None:
+            return 0
+        return sum(self._counters[offset::_WORKER_SLOTS])
+
+    def start(self) -> bool:
+        """Spawn the worker processes and wait for them to start listening."""
+        if self.socket is None:
+            return False
+        if self.processes:
+            return True
+        self._counters = multiprocessing.Array(
+            "q", self.workers * _WORKER_SLOTS, lock=False
+        )
+        self._stop_event = multiprocessing.Event()
+        for index in range(self.workers):
+            proc = multiprocessing.Process(
+                target=_tcp_server_worker,
+                args=(
+                    index,
+                    self._counters,
+                    self._stop_event,
+                    self._server_args,
+                    self._server_kwargs,
+                ),
+            )
+            proc.daemon = True
+            proc.start()
+            self.processes.append(proc)
+        self.start_time = time.monotonic()
+        time_end = time.monotonic() + self.start_timeout
+        while True:
+            states = self._counters[::_WORKER_SLOTS]
+            if all(e == _WORKER_RUNNING for e in states):
+                return True
+            if (
+                any(e not in (_WORKER_PENDING, _WORKER_RUNNING) for e in states)
+                or any(not e.is_alive() for e in self.processes)
+                or time.monotonic() >= time_end
+            ):
+                self.stop()
+                return False
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        """Stop and join the worker processes (counters are preserved)."""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for proc in self.processes:
+            proc.join(_WORKER_JOIN_TIMEOUT)
+            if proc.is_alive():  # Stuck in a handler
+                proc.terminate()
+                proc.join()
+        self.processes = []
+        self._stop_event = None
+        if self._counters is not None:
+            self._base_total += self._counter_sum(1)
+            self._base_ok += self._counter_sum(2)
+            self._counters = None
+
+    def close(self) -> None:
+        """Stop the workers and release the address."""
+        self.stop()
+        _close_socket(self.socket, method=None)
+        self.socket = None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return a snapshot of the server counters and gauges.
+
+        Like _Server.metrics, but without the accept rates and queue (each
+        worker has its own listening socket), and with the number of running
+        workers.
+        """
+        counters = self._counters
+        ret = {
+            "type": SOCKET_TYPE_TCP,
+            "address": self.address[0],
+            "port": self.address[1],
+            "uptime": (
+                0 if self.start_time is None else time.monotonic() - self.start_time
+            ),
+            "handled_total": self.handled_total,
+            "handled_ok": self.handled_ok,
+            "workers": self.workers,
+            "workers_running": (
+                0
+                if counters is None
+                else sum(e == _WORKER_RUNNING for e in counters[::_WORKER_SLOTS])
+            ),
+        }
+        ret.update(_tcp_listen_overflows())
+        return ret
+
+
+_PROMETHEUS_PREFIX = "pycfutils_"
+_PROMETHEUS_METRICS = (
+    # (metrics key, name, type, help)
+    ("uptime", "server_uptime_seconds", "gauge", "Seconds since the server started"),
+    ("handled_total", "server_handled_total", "counter", "Handled items"),
+    ("handled_ok", "server_handled_ok_total", "counter", "Successfully handled items"),
+    (
+        "handled_rejected",
+        "server_rejected_total",
+        "counter",
+        "Connections rejected (handler queue full or admission control)",
+    ),
+    (
+        "admission_rejected",
+        "server_admission_rejected_total",
+        "counter",
+        "Connections rejected by admission control (by reason)",
+    ),
+    (
+        "connections_open",
+        "server_connections_open",
+        "gauge",
+        "Accepted connections not closed yet",
+    ),
+    (
+        "accept_rate",
+        "server_accept_rate",
+        "gauge",
+        "Incoming items per second (over a time window)",
+    ),
+    (
+        "accept_queue",
+        "server_accept_queue_length",
+        "gauge",
+        "Connections waiting in the listening socket's accept queue",
+    ),
+    (
+        "accept_queue_max",
+        "server_accept_queue_max",
+        "gauge",
+        "Listening socket's accept queue size (backlog)",
+    ),
+    (
+        "queue_depth",
+        "server_handler_queue_depth",
+        "gauge",
+        "Connections queued or being handled by the handler pool",
+    ),
+    (
+        "handler_latency",
+        "server_handler_latency_seconds",
+        "summary",
+        "Time from accepting a connection until closing it",
+    ),
+    ("received_packets", "server_received_packets_total", "counter", "Datagrams"),
+    ("received_bytes", "server_received_bytes_total", "counter", "Datagram bytes"),
+    ("workers_running", "server_workers_running", "gauge", "Running worker processes"),
+)
+_PROMETHEUS_SYSTEM_METRICS = (
+    (
+        "listen_overflows",
+        "tcp_listen_overflows_total",
+        "counter",
+        "Connections dropped because an accept queue was full (network namespace)",
+    ),
+    (
+        "listen_drops",
+        "tcp_listen_drops_total",
+        "counter",
+        "Connections dropped while listening, for any reason (network namespace)",
+    ),
+)
+
+
+def _prometheus_labels(**labels: Any) -> str:
+    return ",".join(
+        '{}="{}"'.format(
+            name,
+            ("" if value is None else str(value))
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    ).join("{}")
+
+
+def _prometheus_value(value: Optional[float]) -> str:
+    if value is None:
+        return "NaN"
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def prometheus_metrics(servers: Iterable[Any]) -> str:
+    """Return the servers' metrics in the Prometheus text exposition format.
+
+    Args:
+        servers: Objects with a metrics method (e.g. TCPServer, UDPServer,
+            MultiProcessTCPServer). Their samples are labeled by type, address
+            and port.
+    """
+    snapshots = [e.metrics() for e in servers]
+    lines = []
+    for key, name, type_, help_ in _PROMETHEUS_METRICS:
+        samples = []
+        for snapshot in snapshots:
+            value = snapshot.get(key)
+            if value is None:
+                continue
+            labels = {
+                "type": snapshot["type"],
+                "address": snapshot["address"],
+                "port": snapshot["port"],
+            }
+            if key == "accept_rate":
+                for window, rate in value.items():
+                    labels["window"] = f"{window}s"
+                    samples.append(
+                        f"{name}{_prometheus_labels(**labels)} {_prometheus_value(rate)}"
+                    )
+            elif key == "admission_rejected":
+                for reason, count in value.items():
+                    labels["reason"] = reason
+                    samples.append(
+                        f"{name}{_prometheus_labels(**labels)} {_prometheus_value(count)}"
+                    )
+            elif key == "handler_latency":
+                for quantile in (50, 90, 99):
+                    quantile_value = value.get(f"p{quantile}")
+                    samples.append(
+                        f"{name}{_prometheus_labels(**labels, quantile=quantile / 100)}"
+                        f" {_prometheus_value(quantile_value)}"
+                    )
+                samples.append(
+                    f"{name}_sum{_prometheus_labels(**labels)} {_prometheus_value(value['sum'])}"
+                )
+                samples.append(
+                    f"{name}_count{_prometheus_labels(**labels)}"
+                    f" {_prometheus_value(value['count'])}"
+                )
+            else:
+                samples.append(
+                    f"{name}{_prometheus_labels(**labels)} {_prometheus_value(value)}"
+                )
+        if samples:
+            lines.append(f"# HELP {_PROMETHEUS_PREFIX}{name} {help_}")
+            lines.append(f"# TYPE {_PROMETHEUS_PREFIX}{name} {type_}")
+            lines.extend(_PROMETHEUS_PREFIX + e for e in samples)
+    system = snapshots[0] if snapshots else _tcp_listen_overflows()
+    for key, name, type_, help_ in _PROMETHEUS_SYSTEM_METRICS:
+        if system.get(key) is not None:
+            lines.append(f"# HELP {_PROMETHEUS_PREFIX}{name} {help_}")
+            lines.append(f"# TYPE {_PROMETHEUS_PREFIX}{name} {type_}")
+            lines.append(f"{_PROMETHEUS_PREFIX}{name} {_prometheus_value(system[key])}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer(TCPServer):
+    """Tiny HTTP server exposing servers' metrics (Prometheus text format) on GET."""
+
+    def __init__(
+        self,
+        servers: Iterable[Any],
+        address: AnyStr,
+        port: int,
+        family: Optional[AnyStr] = None,
+        poll_timeout: float = _TIMEOUT_DEFAULT,
+        options: SockOpts = None,
+        backlog: int = 16,
+    ) -> None:
+        """Initialize the server, resolve the address, and bind the socket.
+
+        Args:
+            servers: Objects with a metrics method (see prometheus_metrics).
+            address: Hostname or IP to bind to.
+            port: Port number to listen on.
+            family: Socket family name (e.g. "ipv4"), or None for auto.
+            poll_timeout: Maximum seconds between polling cycles.
+            options: Nested dict of socket options keyed by level and option name.
+            backlog: Maximum number of queued connections.
+        """
+        self.servers = tuple(servers)
+        super().__init__(
+            address,
+            port,
+            family=family,
+            poll_timeout=poll_timeout,
+            silent=True,
+            options=options,
+            backlog=backlog,
+            handler=self._serve,
+        )
+
+    def _serve(self, client: socket.SocketType, peer: Tuple[Any, ...]) -> bool:
+        client.settimeout(_TIMEOUT_DEFAULT)
+        request = b""
+        try:
+            while b"\r\n\r\n" not in request and len(request) < 0x2000:
+                data = client.recv(0x1000)
+                if not data:
+                    break
+                request += data
+        except OSError:
+            return False
+        method = request.split(b" ", 1)[0]
+        if method in (b"GET", b"HEAD"):
+            status = "200 OK"
+            body = prometheus_metrics(self.servers).encode()
+        else:
+            status = "405 Method Not Allowed"
+            body = b""
+        header = (
+            f"HTTP/1.0 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+        try:
+            client.sendall(header + (body if method == b"GET" else b""))
+        except OSError:
+            return False
+        return status.startswith("200")
+
+
+class AsyncTCPServer:
+    """TCP server running on an asyncio event loop (a coroutine per connection)."""
+
+    def __init__(
+        self,
+        address: AnyStr,
+        port: int,
+        family: Optional[AnyStr] = None,
+        handler: Optional[AsyncHandler] = None,
+        silent: bool = False,
+        options: SockOpts = None,
+        backlog: int = 5,
+    ) -> None:
+        """Initialize the server, resolve the address, and bind the socket.
+
+        Args:
+            address: Hostname or IP to bind to.
+            port: Port number to listen on.
+            family: Socket family name (e.g. "ipv4"), or None for auto.
+            handler: Coroutine function called as handler(reader, writer) for
+                each connection. Returning False (or raising) counts as a failure.
+                None to accept and immediately close connections.
+            silent: Suppress connection log messages.
+            options: Nested dict of socket options keyed by level and option name.
+            backlog: Maximum number of queued connections.
+        """
+        self.handler = handler
+        self.silent = silent
+        self.backlog = backlog
+        self.server = None
+        self.socket = None
+        self.handled_total = 0
+        self.handled_ok = 0
+        self.socket = _create_server_socket(
+            address, port, family, SOCKET_TYPE_TCP, options, backlog
+        )
+
+    async def __aenter__(self) -> "AsyncTCPServer":
+        if not await self.start():
+            raise NetworkException("Could not start server")
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[builtin_types.TracebackType],
+    ) -> bool:
+        await self.close()
+        return exc_type is None
+
+    def __del__(self) -> None:
+        if self.server is None:
+            _close_socket(self.socket)
+            self.socket = None
+
+    async def start(self) -> bool:
+        """Start accepting connections on the running event loop."""
+        if self.socket is None:
+            return False
+        if self.server is None:
+            start_server = (
+                asyncio.start_unix_server
+                if self.socket.family == _AF_UNIX
+                else asyncio.start_server
+            )
+            self.server = await start_server(
+                self._handle, sock=self.socket, backlog=self.backlog
+            )
+        return True
+
+    async def serve_forever(self) -> None:
+        """Start (if needed) and serve until cancelled or closed."""
+        if not await self.start():
+            raise NetworkException("Could not start server")
+        await self.server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting connections and close the socket."""
+        path = _unix_path(self.socket)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        else:
+            _close_socket(self.socket)
+        _remove_unix_path(path)
+        self.socket = None
+
+    async def _default_handler(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        if not self.silent:
+            peer = writer.get_extra_info("peername")
+            print(f"Established connection from {_peer_string(peer)}")
+        return True
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        ok = False
+        try:
+            ret = await (self.handler or self._default_handler)(reader, writer)
+            ok = ret is None or bool(ret)
+        except Exception as e:
+            if not self.silent:
+                print(e)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+            if ok:
+                self.handled_ok += 1
+            self.handled_total += 1
+
+
+def _happy_eyeballs_order(records: AddressRecords) -> AddressRecords:
+    # Interleave families (RFC 8305), starting with the first record's one
+    if not records:
+        return records
+    preferred = tuple(e for e in records if e[2] == records[0][2])
+    others = tuple(e for e in records if e[2] != records[0][2])
+    ret = []
+    for idx in range(max(len(preferred), len(others))):
+        ret.extend(e[idx] for e in (preferred, others) if idx < len(e))
+    return tuple(ret)
+
+
+def _start_connect(
+    record: Tuple[Any, int, socket.AddressFamily, socket.SocketKind],
+    options: SockOpts,
+) -> socket.SocketType:
+    # Non-blocking connect (in progress or done) or raise
+    sock = _create_socket(record[2], record[3], 0, options)
+    err = sock.connect_ex(_sockaddr(record))
+    if err and (err not in _CONNECT_IN_PROGRESS or record[2] == _AF_UNIX):
+        _close_socket(sock, method=None)
+        raise OSError(err, os.strerror(err))
+    return sock
+
+
+def _connect_error(sock: socket.SocketType) -> Optional[OSError]:
+    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+    return OSError(err, os.strerror(err)) if err else None
+
+
+def _connect_fast_open(
+    sock: socket.SocketType, address: Any, data: bytes, timeout: float
+) -> None:
+    # Data goes out in the SYN if the kernel has a TFO cookie for the server,
+    # otherwise the handshake (also requesting one) completes before sending
+    sent = 0
+    if _MSG_FASTOPEN is not None:
+        try:
+            sent = sock.sendto(data, _MSG_FASTOPEN, address)
+        except BlockingIOError as e:
+            if e.errno not in _CONNECT_IN_PROGRESS:
+                raise
+            # Never wait unbounded (e.g. for a dropped SYN)
+            wait = timeout if timeout > 0 else _TIMEOUT_DEFAULT
+            if not select.select((), (sock,), (), wait)[1]:
+                raise socket.timeout("timed out") from None
+            err = _connect_error(sock)
+            if err is not None:
+                raise err from None
+    else:
+        sock.setsockopt(socket.IPPROTO_TCP, _TCP_FASTOPEN_CONNECT, 1)
+        sock.connect(address)
+    if sent < len(data):
+        sock.sendall(memoryview(data)[sent:])
+
+
+def _connect_happy_eyeballs(
+    records: AddressRecords,
+    attempt_timeout: float,
+    attempt_delay: float,
+    options: SockOpts,
+) -> socket.SocketType:
+    # Staggered non-blocking connects, the first one to succeed wins
+    pending = {}
+    last_error = None
+    idx = 0
+    next_start = time.perf_counter()
+    selector = selectors.DefaultSelector()
+    try:
+        while idx < len(records) or pending:
+            now = time.perf_counter()
+            if idx < len(records) and (now >= next_start or not pending):
+                record = records[idx]
+                idx += 1
+                next_start = now + attempt_delay
+                try:
+                    sock = _start_connect(record, options)
+                except OSError as e:
+                    last_error = e
+                    next_start = now
+                    continue
+                pending[sock] = now + attempt_timeout if attempt_timeout > 0 else None
+                selector.register(sock, selectors.EVENT_WRITE)
+                continue
+            deadlines = [e for e in pending.values() if e is not None]
+            if idx < len(records):
+                deadlines.append(next_start)
+            timeout = max(min(deadlines) - now, 0) if deadlines else None
+            for key, _ in selector.select(timeout=timeout):
+                sock = key.fileobj
+                selector.unregister(sock)
+                del pending[sock]
+                error = _connect_error(sock)
+                if error is None:
+                    return sock
+                last_error = error
+                _close_socket(sock, method=None)
+                next_start = time.perf_counter()
+            now = time.perf_counter()
+            for sock, deadline in tuple(pending.items()):
+                if deadline is not None and deadline <= now:
+                    selector.unregister(sock)
+                    del pending[sock]
+                    _close_socket(sock, method=None)
+                    last_error = socket.timeout("timed out")
+    finally:
+        for sock in pending:
+            _close_socket(sock, method=None)
+        selector.close()
+    raise last_error or OSError("No address to connect to")
+
+
+def connect_to_server(
+    address: AnyStr,
+    port: int,
+    family: Optional[str] = None,
+    attempts: int = 1,
+    attempt_timeout: float = _TIMEOUT_DEFAULT,
+    options: SockOpts = None,
+    happy_eyeballs: bool = False,
+    attempt_delay: float = _ATTEMPT_DELAY_DEFAULT,
+    rtt_estimator: Optional[RTTEstimator] = None,
+    backoff: Optional[Backoff] = None,
+    deadline: float = 0,
+    report: Optional[Dict[str, Any]] = None,
+    data: Optional[bytes] = None,
+    fast_open: bool = False,
+    # If True, socket will have to be closed by caller
+    _return_client_socket: bool = False,
+) -> Union[Tuple[Any, ...], socket.SocketType, None]:
+    """Attempt a TCP connection and return the local address or the client socket.
+
+    Args:
+        address: Hostname or IP to connect to.
+        port: Target port number.
+        family: Socket family name (e.g. "ipv4", "ipv6"), or None for auto.
+        attempts: Number of connection attempts before raising (0 or negative
+            for no limit, if there is a deadline).
+        attempt_timeout: Timeout in seconds for each attempt.
+        options: Nested dict of socket options keyed by level and option name.
+        happy_eyeballs: Accept all the resolved records (instead of exactly one)
+            and race them (RFC 8305): families are interleaved and each attempt
+            starts attempt_delay seconds after the previous one (or right after
+            it failed). The first connected socket wins. attempt_timeout (if
+            positive) applies to each of them.
+        attempt_delay: Seconds between staggered Happy Eyeballs attempts.
+        rtt_estimator: Take the attempt timeout from it (instead of
+            attempt_timeout), doubled after each timed out attempt (up to its
+            ceiling), and feed it the answered attempts' durations.
+        backoff: Wait its delays between failed attempts (instead of retrying
+            immediately).
+        deadline: Maximum total seconds for all the attempts (and the delays
+            between them), 0 or negative for no limit.
+        report: Dictionary to fill with the number of attempts made, the total
+            backoff delay, the address resolution time and the elapsed time of
+            the attempts (seconds).
+        data: Payload to send once connected (as part of the attempt).
+        fast_open: Send data in the SYN, using TCP Fast Open (RFC 7413), saving
+            a round trip. The first connection to a server only obtains a TFO
+            cookie (and sends data after the handshake). Ignored for Happy
+            Eyeballs and Unix sockets.
+        _return_client_socket: If True, return the connected socket instead of
+            the local address. The caller is responsible for closing it.
+    """
+    if deadline <= 0:
+        attempts = max(attempts, 1)
+    if fast_open and _MSG_FASTOPEN is None and _TCP_FASTOPEN_CONNECT is None:
+        raise NetworkException("TCP Fast Open not supported")
+    resolve_time = time.perf_counter()
+    if happy_eyeballs:
+        records = _happy_eyeballs_order(
+            parse_address(address, port=port, family=family, type_=SOCKET_TYPE_TCP)
+        )
+    else:
+        records = parse_address(
+            address, port=port, family=family, type_=SOCKET_TYPE_TCP, exact_matches=1
+        )
+    resolved_addr, resolved_port, resolved_family, resolved_type = records[0]
+    client = None
+    last_error = None
+    timeout_factor = 1
+    start_time = time.perf_counter()
+    resolve_time = start_time - resolve_time
+    end_time = start_time + deadline if deadline > 0 else None
+    delays = backoff.delays() if backoff is not None else None
+    delay_total = 0
+    attempt = 0
+    try:
+        while attempts <= 0 or attempt < attempts:
+            if attempt and delays is not None:
+                delay = next(delays)
+                if end_time is not None and time.perf_counter() + delay >= end_time:
+                    break
+                time.sleep(delay)
+                delay_total += delay
+            timeout = attempt_timeout
+            if rtt_estimator is not None:
+                timeout = min(
+                    rtt_estimator.timeout(resolved_addr) * timeout_factor,
+                    rtt_estimator.ceiling,
+                )
+            if end_time is not None:
+                remaining = end_time - time.perf_counter()
+                if remaining <= 0:
+                    break
+                timeout = min(timeout, remaining) if timeout > 0 else remaining
+            attempt += 1
+            connect_time = time.perf_counter()
+            try:
+                if happy_eyeballs:
+                    client = _connect_happy_eyeballs(
+                        records, timeout, attempt_delay, options
+                    )
+                    client.settimeout(timeout if timeout > 0 else None)
+                    if data:
+                        client.sendall(data)
+                else:
+                    client = _create_socket(
+                        resolved_family, resolved_type, timeout, options
+                    )
+                    if data and fast_open and resolved_family != _AF_UNIX:
+                        _connect_fast_open(client, _sockaddr(records[0]), data, timeout)
+                    else:
+                        client.connect(_sockaddr(records[0]))
+                        if data:
+                            client.sendall(data)
+                if rtt_estimator is not None:
+                    peer = client.getpeername()
+                    rtt_estimator.update(
+                        peer[0] if isinstance(peer, tuple) else resolved_addr,
+                        time.perf_counter() - connect_time,
+                    )
+                if _return_client_socket:
+                    return client
+                else:
+                    try:
+                        return client.getsockname()
+                    finally:
+                        if timeout > 0:
+                            _close_socket(client)
+                        else:
+                            ws = select.select((), (client,), ())[1]
+                            if ws and ws[0] == client:
+                                _close_socket(client)
+                            else:
+                                _close_socket(client, method=None)
+            except OSError as e:
+                last_error = e
+                if rtt_estimator is not None:
+                    if _answered(e):
+                        rtt_estimator.update(
+                            resolved_addr, time.perf_counter() - connect_time
+                        )
+                    elif isinstance(e, socket.timeout):
+                        timeout_factor *= 2
+                if client is not None:
+                    try:
+                        _close_socket(client, method=None)
+                    except Exception:
+                        pass
+                    client = None
+    finally:
+        if report is not None:
+            report.update(
+                attempts=attempt,
+                delay=delay_total,
+                resolve=resolve_time,
+                elapsed=time.perf_counter() - start_time,
+            )
+    raise NetworkException(
+        f"Could not connect to server ({attempt} attempt(s))"
+    ) from last_error
+
+
+def connect_many(
+    targets: Iterable[Tuple[AnyStr, int]],
+    concurrency: int = 64,
+    timeout: float = _TIMEOUT_DEFAULT,
+    family: Optional[str] = None,
+    options: SockOpts = None,
+    return_sockets: bool = False,
+    rate: float = 0,
+    rtt_estimator: Optional[RTTEstimator] = None,
+) -> Generator[ConnectResult, None, None]:
+    """Run many non-blocking TCP connection attempts at once and yield them as they complete.
+
+    Yields (target, result, elapsed) tuples in completion order. result is the
+    local address (or the connected socket, if return_sockets), or the exception
+    (NetworkException, OSError, socket.timeout) on failure. elapsed is the attempt
+    duration in seconds (address resolution included).
+
+    Args:
+        targets: Iterable of (address, port, ...) tuples (consumed lazily, any
+            extra items are passed through unchanged in the yielded target).
+        concurrency: Maximum number of attempts in flight.
+        timeout: Timeout in seconds for each attempt (0 or negative for none).
+        family: Socket family name (e.g. "ipv4", "ipv6"), or None for auto.
+        options: Nested dict of socket options keyed by level and option name.
+        return_sockets: Yield the connected sockets (to be closed by the caller)
+            instead of the local addresses.
+        rate: Maximum number of attempts started per second (0 or negative for
+            no limit).
+        rtt_estimator: Take each attempt's timeout from it (instead of timeout)
+            and feed it the answered attempts' durations.
+    """
+    concurrency = max(concurrency, 1)
+    targets = iter(targets)
+    pending = {}  # Socket: (target, start time, connect time, address)
+    deadlines = []  # Heap of (deadline, sequence, socket)
+    sequence = 0
+    exhausted = False
+    bucket = _TokenBucket(rate) if rate > 0 else None
+    selector = selectors.DefaultSelector()
+
+    def _finish(sock: socket.SocketType, error: Optional[Exception]) -> ConnectResult:
+        target, start_time, connect_time, address = pending.pop(sock)
+        selector.unregister(sock)
+        now = time.perf_counter()
+        elapsed = now - start_time
+        if rtt_estimator is not None and _answered(error):
+            rtt_estimator.update(address, now - connect_time)
+        if error is not None:
+            _close_socket(sock, method=None)
+            return target, error, elapsed
+        if return_sockets:
+            sock.settimeout(timeout if timeout > 0 else None)
+            return target, sock, elapsed
+        try:
+            return target, sock.getsockname(), elapsed
+        finally:
+            _close_socket(sock)
+
+    try:
+        while True:
+            throttle = None
+            while not exhausted and len(pending) < concurrency:
+                if bucket is not None and not bucket.consume():
+                    throttle = bucket.delay()
+                    break
+                try:
+                    target = next(targets)
+                except StopIteration:
+                    exhausted = True
+                    break
+                start_time = time.perf_counter()
+                try:
+                    record = parse_address(
+                        target[0],
+                        port=target[1],
+                        family=family,
+                        type_=SOCKET_TYPE_TCP,
+                    )[0]
+                    connect_time = time.perf_counter()
+                    sock = _start_connect(record, options)
+                except (NetworkException, OSError) as e:
+                    yield target, e, time.perf_counter() - start_time
+                    continue
+                pending[sock] = target, start_time, connect_time, record[0]
+                selector.register(sock, selectors.EVENT_WRITE)
+                attempt_timeout = (
+                    timeout
+                    if rtt_estimator is None
+                    else rtt_estimator.timeout(record[0])
+                )
+                if attempt_timeout > 0:
+                    heapq.heappush(
+                        deadlines, (connect_time + attempt_timeout, sequence, sock)
+                    )
+                    sequence += 1
+            if not pending:
+                if throttle is None:
+                    break
+                time.sleep(throttle)
+                continue
+            while deadlines and deadlines[0][2] not in pending:
+                heapq.heappop(deadlines)
+            wait = max(deadlines[0][0] - time.perf_counter(), 0) if deadlines else None
+            if throttle is not None:
+                wait = throttle if wait is None else min(wait, throttle)
+            for key, _ in selector.select(timeout=wait):
+                yield _finish(key.fileobj, _connect_error(key.fileobj))
+            now = time.perf_counter()
+            while deadlines and deadlines[0][0] <= now:
+                sock = heapq.heappop(deadlines)[2]
+                if sock in pending:
+                    yield _finish(sock, socket.timeout("timed out"))
+    finally:
+        for sock in pending:
+            _close_socket(sock, method=None)
+        selector.close()
+
+
+def _socket_alive(sock: socket.SocketType) -> bool:
+    # Non-blocking peek: no data pending (and no EOF) on an idle connection
+    timeout = sock.gettimeout()
+    try:
+        sock.settimeout(0)
+        sock.recv(1, socket.MSG_PEEK)
+    except (BlockingIOError, InterruptedError):
+        return True
+    except OSError:
+        return False
+    finally:
+        try:
+            sock.settimeout(timeout)
+        except OSError:
+            pass
+    return False  # EOF or unexpected data
+
+
+class ConnectionPool:
+    """Thread-safe pool of client connections (created by connect_to_server) keyed by endpoint."""
+
+    def __init__(
+        self,
+        max_per_host: int = 8,
+        max_total: int = 64,
+        idle_timeout: float = 60,
+        family: Optional[str] = None,
+        attempts: int = 1,
+        attempt_timeout: float = _TIMEOUT_DEFAULT,
+        options: SockOpts = None,
+        happy_eyeballs: bool = False,
+    ) -> None:
+        """Initialize an empty pool.
+
+        Args:
+            max_per_host: Maximum number of (idle and in use) connections per endpoint.
+            max_total: Maximum number of (idle and in use) connections.
+            idle_timeout: Seconds an idle connection is kept (0 or negative for ever).
+            family: Socket family name (e.g. "ipv4", "ipv6"), or None for auto.
+            attempts: Number of connection attempts (see connect_to_server).
+            attempt_timeout: Timeout in seconds for each attempt (also the
+                timeout of the returned sockets).
+            options: Nested dict of socket options keyed by level and option name.
+            happy_eyeballs: Race all resolved records (see connect_to_server).
+        """
+        self.max_per_host = max(max_per_host, 1)
+        self.max_total = max(max_total, self.max_per_host)
+        self.idle_timeout = idle_timeout
+        self.connect_kwargs = {
+            "family": family,
+            "attempts": attempts,
+            "attempt_timeout": attempt_timeout,
+            "options": options,
+            "happy_eyeballs": happy_eyeballs,
+        }
+        self.created = 0
+        self.reused = 0
+        self.expired = 0
+        self.stale = 0
+        self.closed = False
+        self._idle = {}  # Endpoint: deque of (socket, release time)
+        self._counts = collections.Counter()  # Endpoint: idle + in use
+        self._in_use = {}  # Socket: endpoint
+        self._condition = threading.Condition()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[builtin_types.TracebackType],
+    ) -> bool:
+        self.close()
+        return exc_type is None
+
+    def __del__(self) -> None:
+        self.close()
+
+    def _discard(self, key: Tuple[Any, int], sock: socket.SocketType) -> None:
+        # Lock held
+        _close_socket(sock)
+        self._counts[key] -= 1
+        if self._counts[key] <= 0:
+            del self._counts[key]
+        self._condition.notify_all()
+
+    def _pop_idle(self, key: Tuple[Any, int]) -> Optional[socket.SocketType]:
+        # Lock held. Most recently released first
+        idle = self._idle.get(key)
+        limit = time.monotonic() - self.idle_timeout
+        while idle:
+            sock, released = idle.pop()
+            if self.idle_timeout > 0 and released < limit:
+                self.expired += 1
+            elif not _socket_alive(sock):
+                self.stale += 1
+            else:
+                return sock
+            self._discard(key, sock)
+        return None
+
+    def _evict_idle(self) -> bool:
+        # Lock held. Close the oldest idle connection (any endpoint)
+        oldest = None
+        for key, idle in self._idle.items():
+            if idle and (oldest is None or idle[0][1] < self._idle[oldest][0][1]):
+                oldest = key
+        if oldest is None:
+            return False
+        self._discard(oldest, self._idle[oldest].popleft()[0])
+        return True
+
+    def acquire(
+        self, address: AnyStr, port: int, timeout: Optional[float] = None
+    ) -> socket.SocketType:
+        """Return a live (idle or new) connection to an endpoint.
+
+        Args:
+            address: Hostname or IP to connect to.
+            port: Target port number.
+            timeout: Seconds to wait for a free slot when limits are reached
+                (None to wait for ever).
+        """
+        return self._acquire(address, port, timeout)
+
+    def _acquire(
+        self,
+        address: AnyStr,
+        port: int,
+        timeout: Optional[float],
+        prewarm: bool = False,
+    ) -> socket.SocketType:
+        key = (address, port)
+        time_end = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self.closed:
+                    raise NetworkException("Pool closed")
+                sock = self._pop_idle(key)
+                if sock is not None:
+                    if not prewarm:  # Only handing out an idle connection is a reuse
+                        self.reused += 1
+                    self._in_use[sock] = key
+                    return sock
+                if self._counts[key] < self.max_per_host and (
+                    sum(self._counts.values()) < self.max_total or self._evict_idle()
+                ):
+                    self._counts[key] += 1
+                    break
+                remaining = None if time_end is None else time_end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise NetworkException("No connection available")
+                self._condition.wait(remaining)
+        try:
+            sock = connect_to_server(
+                address, port, _return_client_socket=True, **self.connect_kwargs
+            )
+        except Exception:
+            with self._condition:
+                self._counts[key] -= 1
+                self._condition.notify_all()
+            raise
+        with self._condition:
+            self.created += 1
+            self._in_use[sock] = key
+        return sock
+
+    def release(self, sock: socket.SocketType, reuse: bool = True) -> None:
+        """Return a connection to the pool (or close it, if reuse is False)."""
+        with self._condition:
+            key = self._in_use.pop(sock, None)
+            if key is None:
+                _close_socket(sock)
+                return
+            if reuse and not self.closed and sock.fileno() >= 0:
+                self._idle.setdefault(key, collections.deque()).append(
+                    (sock, time.monotonic())
+                )
+                self._condition.notify_all()
+            else:
+                self._discard(key, sock)
+
+    @contextlib.contextmanager
+    def connection(
+        self, address: AnyStr, port: int, timeout: Optional[float] = None
+    ) -> Generator[socket.SocketType, None, None]:
+        """Context manager acquiring a connection and releasing it (closing it on errors)."""
+        sock = self.acquire(address, port, timeout=timeout)
+        try:
+            yield sock
+        except BaseException:
+            self.release(sock, reuse=False)
+            raise
+        self.release(sock)
+
+    def prewarm(self, address: AnyStr, port: int, count: int = 1) -> int:
+        """Ensure (limits permitting) count idle connections to an endpoint.
+
+        Return the number of new connections.
+        """
+        socks = []
+        created = self.created
+        try:
+            for _ in range(count):
+                socks.append(self._acquire(address, port, 0, prewarm=True))
+        except NetworkException:
+            pass
+        finally:
+            for sock in socks:
+                self.release(sock)
+        return self.created - created
+
+    def purge(self) -> int:
+        """Close the expired and stale idle connections and return their number."""
+        ret = 0
+        limit = time.monotonic() - self.idle_timeout
+        with self._condition:
+            for key, idle in self._idle.items():
+                for item in tuple(idle):
+                    sock, released = item
+                    if self.idle_timeout > 0 and released < limit:
+                        self.expired += 1
+                    elif not _socket_alive(sock):
+                        self.stale += 1
+                    else:
+                        continue
+                    idle.remove(item)
+                    self._discard(key, sock)
+                    ret += 1
+        return ret
+
+    def statistics(self) -> Dict[str, int]:
+        """Return the connection counters and the current (idle / in use) sizes."""
+        with self._condition:
+            return {
+                "idle": sum(len(e) for e in self._idle.values()),
+                "in_use": len(self._in_use),
+                "created": self.created,
+                "reused": self.reused,
+                "expired": self.expired,
+                "stale": self.stale,
+            }
+
+    def close(self) -> None:
+        """Close the idle connections (in use ones are closed when released)."""
+        with self._condition:
+            self.closed = True
+            for key, idle in self._idle.items():
+                while idle:
+                    self._discard(key, idle.popleft()[0])
+            self._idle.clear()
+
+
+class FrameReader:
+    """Reader of length-prefixed frames (4 byte big endian size, then payload) from a socket.
+
+    Data is received into one reusable buffer, and frames are returned as
+    memoryviews into it (no copies), valid until the next read (copy them to
+    keep them). All the frames a recv brings (pipelined ones) are parsed
+    before receiving again.
+    """
+
+    def __init__(
+        self,
+        sock: socket.SocketType,
+        buffer_size: int = _FRAME_BUFFER_SIZE,
+        max_size: int = _FRAME_SIZE_MAX,
+    ) -> None:
+        """Initialize the reader.
+
+        Args:
+            sock: Connected (blocking) stream socket.
+            buffer_size: Initial buffer size (it grows for larger frames).
+            max_size: Maximum payload size (larger frames are an error).
+        """
+        self.sock = sock
+        self.max_size = max_size
+        self.buffer = bytearray(max(buffer_size, _FRAME_HEADER.size))
+        self.view = memoryview(self.buffer)
+        self.start = 0  # Unparsed data
+        self.end = 0
+
+    def _frame_size(self) -> Optional[int]:
+        # Size (header included) of the buffered frame, if its header is there
+        if self.end - self.start < _FRAME_HEADER.size:
+            return None
+        size = _FRAME_HEADER.unpack_from(self.buffer, self.start)[0]
+        if size > self.max_size:
+            raise NetworkException(f"Frame too large ({size} bytes)")
+        return _FRAME_HEADER.size + size
+
+    def pending(self) -> bool:
+        """Return whether a whole frame is buffered (read won't block)."""
+        size = self._frame_size()
+        return size is not None and self.end - self.start >= size
+
+    def _make_room(self, size: int) -> None:
+        # Move the partial frame to the buffer start, or to a larger buffer
+        count = self.end - self.start
+        if size > len(self.buffer):
+            buffer = bytearray(max(size, len(self.buffer) * 2))
+            buffer[:count] = self.view[self.start : self.end]
+            self.buffer, self.view = buffer, memoryview(buffer)
+        elif self.start:
+            self.view[:count] = self.view[self.start : self.end]
+        self.start, self.end = 0, count
+
+    def read(self) -> Optional[memoryview]:
+        """Return the next frame's payload, or None if the peer closed between frames."""
+        while True:
+            size = self._frame_size()
+            if size is not None and self.end - self.start >= size:
+                frame = self.view[self.start + _FRAME_HEADER.size : self.start + size]
+                self.start += size
+                if self.start == self.end:
+                    self.start = self.end = 0
+                return frame
+            needed = size or _FRAME_HEADER.size
+            if self.start + needed > len(self.buffer):
+                self._make_room(needed)
+            try:
+                count = self.sock.recv_into(self.view[self.end :])
+            except OSError as e:
+                raise NetworkException("Error receiving frame") from e
+            if not count:
+                if self.start == self.end:
+                    return None
+                raise NetworkException("Connection closed in the middle of a frame")
+            self.end += count
+
+    def __iter__(self) -> Generator[memoryview, None, None]:
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+
+def send_frames(sock: socket.SocketType, payloads: Iterable[Any]) -> int:
+    """Send payloads (bytes-like objects) as length-prefixed frames (see FrameReader).
+
+    Headers and payloads are sent together with vectored I/O (sendmsg, where
+    available), without joining them. Returns the number of bytes sent.
+    """
+    buffers = []
+    for payload in payloads:
+        payload = memoryview(payload)
+        payload = payload.cast("B") if payload.c_contiguous else payload.tobytes()
+        buffers.append(_FRAME_HEADER.pack(len(payload)))
+        if payload:
+            buffers.append(payload)
+    total = sum(len(e) for e in buffers)
+    try:
+        if not hasattr(sock, "sendmsg"):
+            sock.sendall(b"".join(buffers))
+            return total
+        idx = 0
+        while idx < len(buffers):
+            sent = sock.sendmsg(buffers[idx : idx + _IOV_MAX])
+            while idx < len(buffers) and sent >= len(buffers[idx]):
+                sent -= len(buffers[idx])
+                idx += 1
+            if sent:
+                buffers[idx] = memoryview(buffers[idx])[sent:]
+    except OSError as e:
+        raise NetworkException("Error sending frames") from e
+    return total
+
+
+def send_frame(sock: socket.SocketType, payload: Any) -> int:
+    """Send a payload as a length-prefixed frame (see send_frames)."""
+    return send_frames(sock, (payload,))
+
+
+FrameFunction = Callable[[memoryview], Any]
+
+
+def _serve_frames(
+    function: FrameFunction,
+    buffer_size: int,
+    max_size: int,
+    client: socket.SocketType,
+    peer: Tuple[Any, ...],
+) -> bool:
+    reader = FrameReader(client, buffer_size=buffer_size, max_size=max_size)
+    responses = []
+    for frame in reader:
+        responses.append(function(frame))
+        # Pipelined requests: reply to all the buffered ones at once
+        if not reader.pending():
+            send_frames(client, responses)
+            responses = []
+    return True
+
+
+def frame_handler(
+    function: FrameFunction,
+    buffer_size: int = _FRAME_BUFFER_SIZE,
+    max_size: int = _FRAME_SIZE_MAX,
+) -> ConnectionHandler:
+    """Return a TCPServer connection handler answering each request frame with function(payload).
+
+    Requests are read until the client closes the connection. Responses to
+    pipelined requests are sent together. The payload is a memoryview into
+    the receive buffer (see FrameReader), which the result may also be.
+    Picklable if function is (for process pools).
+    """
+    return functools.partial(_serve_frames, function, buffer_size, max_size)
+
+
+class FramedClient:
+    """Client exchanging length-prefixed frames (see FrameReader, frame_handler)."""
+
+    def __init__(
+        self,
+        sock: socket.SocketType,
+        buffer_size: int = _FRAME_BUFFER_SIZE,
+        max_size: int = _FRAME_SIZE_MAX,
+    ) -> None:
+        """Wrap a connected stream socket (closed by close)."""
+        self.sock = sock
+        self.reader = FrameReader(sock, buffer_size=buffer_size, max_size=max_size)
+
+    @classmethod
+    def connect(cls, address: AnyStr, port: int, **kwargs: Any) -> "FramedClient":
+        """Connect (kwargs are passed to connect_to_server) and wrap the socket."""
+        return cls(
+            connect_to_server(address, port, _return_client_socket=True, **kwargs)
+        )
+
+    def __enter__(self) -> "FramedClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[builtin_types.TracebackType],
+    ) -> bool:
+        self.close()
+        return exc_type is None
+
+    def send(self, payload: Any) -> int:
+        """Send a frame."""
+        return send_frame(self.sock, payload)
+
+    def receive(self) -> memoryview:
+        """Receive a frame (valid until the next receive)."""
+        frame = self.reader.read()
+        if frame is None:
+            raise NetworkException("Connection closed by peer")
+        return frame
+
+    def request(self, payload: Any) -> bytes:
+        """Send a request frame and return the response."""
+        self.send(payload)
+        return bytes(self.receive())
+
+    def pipeline(
+        self, payloads: Iterable[Any], depth: int = _FRAME_PIPELINE_DEPTH
+    ) -> List[bytes]:
+        """Send requests without waiting for each response and return the responses (in order).
+
+        Requests go in batches of depth frames (one sendmsg each). Bounding the
+        batches keeps both peers from blocking on full send buffers while
+        nobody reads.
+        """
+        payloads = iter(payloads)
+        depth = max(depth, 1)
+        ret = []
+        while True:
+            batch = tuple(itertools.islice(payloads, depth))
+            if not batch:
+                return ret
+            send_frames(self.sock, batch)
+            ret.extend(bytes(self.receive()) for _ in batch)
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self.sock is not None:
+            _close_socket(self.sock)
+            self.sock = None
 
 
 __all__ = (
+    "ADMISSION_CONNECTIONS",
+    "ADMISSION_RATE",
+    "ADMISSION_REASONS",
+    "ADMISSION_SOURCE",
+    "BACKPRESSURES",
+    "BACKPRESSURE_PAUSE",
+    "BACKPRESSURE_RESET",
     "SOCKET_FAMILIES",
     # "SOCKET_FAMILY_DEFAULT",
     "SOCKET_FAMILY_IPV4",
-    # "SOCKET_FAMILY_UNIX",
     # "SOCKET_FAMILY_UNSPEC",
+    "SOCKET_PROFILES",
+    "SOCKET_PROFILE_LOW_LATENCY",
+    "SOCKET_PROFILE_SCANNER",
+    "SOCKET_PROFILE_SERVER",
 )
 if socket.has_ipv6:
     __all__ += ("SOCKET_FAMILY_IPV6",)
+if _AF_UNIX is not None:
+    __all__ += ("SOCKET_FAMILY_UNIX",)
 __all__ += (
     "SOCKET_TYPES",
     # "SOCKET_TYPE_DEFAULT",
@@ -377,9 +3475,30 @@ __all__ += (
     # "SOCKET_TYPE_RAW",
 )
 __all__ += (
+    "AdmissionControl",
+    "AsyncTCPServer",
+    "Backoff",
+    "ConnectionPool",
+    "FrameReader",
+    "FramedClient",
+    "LatencyHistogram",
+    "MetricsServer",
+    "MultiProcessTCPServer",
+    "RTTEstimator",
+    "ResolverCache",
+    "ServerGroup",
     "TCPServer",
+    "UDPServer",
+    "backlog_max",
+    "connect_many",
     "connect_to_server",
+    "frame_handler",
     "parse_address",
+    "prometheus_metrics",
+    "send_frame",
+    "send_frames",
+    "set_resolver_cache",
+    "socket_options",
 )
 
 
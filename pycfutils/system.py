@@ -27,6 +27,16 @@ def _cpu_stress(duration: float) -> None:
         pass
 
 
+def cpu_count(usable: bool = True) -> int:
+    """Return the number of (usable by the current process, if possible) CPUs."""
+    if usable and hasattr(os, "sched_getaffinity"):
+        try:
+            return len(os.sched_getaffinity(0)) or 1
+        except OSError:
+            pass
+    return os.cpu_count() or 1
+
+
 def cpu_stress(duration: float, count: int = 1) -> None:
     """Spawn processes that busy-loop for a given duration to stress CPUs."""
     procs = []
@@ -59,6 +69,7 @@ def path_ancestor(path: common.PathLike, level: int = 1) -> AnyStr:
 
 
 __all__ = (
+    "cpu_count",
     "cpu_stress",
     "path_ancestor",
 )
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import math
+import unittest
+
+from pycfutils.benchmarks import network
+
+
+def _results(**samples):
+    results = {}
+    for name, (values, higher_is_better) in samples.items():
+        results[name] = {
+            "unit": "x",
+            "higher_is_better": higher_is_better,
+            "samples": list(values),
+        }
+    return {"environment": {}, "settings": {}, "results": results}
+
+
+class BenchmarksNetworkTestCase(unittest.TestCase):
+    def test__beta_regularized(self):
+        func = network._beta_regularized
+        self.assertEqual(func(2, 0.5, 0), 0)
+        self.assertEqual(func(2, 0.5, 1), 1)
+        # Two sided Student t p-values: I_(df / (df + t ** 2))(df / 2, 1 / 2)
+        for t, df, p_value in (
+            (2, 2, 1 - 2 / math.sqrt(6)),  # Closed form for 2 degrees of freedom
+            (2.776445, 4, 0.05),  # t table critical values
+            (3.169273, 10, 0.01),
+            (1, 1, 0.5),  # Cauchy
+        ):
+            self.assertAlmostEqual(func(df / 2, 0.5, df / (df + t * t)), p_value, 6)
+
+    def test__welch_p_value(self):
+        func = network._welch_p_value
+        # Equal sizes and variances: t = 1.2247, 4 degrees of freedom
+        self.assertAlmostEqual(func((1, 2, 3), (2, 3, 4)), 0.287864, 6)
+        # Welch's t-test Wikipedia example (t = -2.46, df = 24.9, p = 0.021)
+        self.assertAlmostEqual(
+            func(
+                (27.5, 21.0, 19.0, 23.6, 17.0, 17.9, 16.9, 20.1, 21.9, 22.6)
+                + (23.1, 19.6, 19.0, 21.7, 21.4),
+                (27.1, 22.0, 20.8, 23.4, 23.4, 23.5, 25.8, 22.0, 24.8, 20.2)
+                + (21.9, 22.1, 22.9, 20.5, 24.4),
+            ),
+            0.021,
+            3,
+        )
+        self.assertAlmostEqual(func((1, 2, 3), (1, 2, 3)), 1)
+        self.assertEqual(func((5, 5, 5), (5, 5)), 1)
+        self.assertEqual(func((5, 5, 5), (6, 6)), 0)
+        self.assertIsNone(func((1,), (1, 2)))
+        self.assertIsNone(func((1, 2), ()))
+
+    def test_ip_only(self):
+        for func in (network.fast_open_ttfb, network.scan_rate):
+            self.assertRaises(
+                network.NetworkException, func, family=network.SOCKET_FAMILY_UNIX
+            )
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                network.parse_args(("-B", "fast_open", "-f", "unix"))
+        args, _ = network.parse_args(("-B", "accept_rate", "-f", "unix"))
+        self.assertEqual(args.family, network.SOCKET_FAMILY_UNIX)
+
+    def test_compare(self):
+        baseline = _results(
+            rate=((100, 101, 99, 100), True),
+            latency=((10, 11, 10, 9), False),
+            noisy=((100, 50, 150, 100), True),
+            small=((100, 100.5, 99.5), True),
+            single=((100,), True),
+            skipped=((100, 101), True),
+            missing=((100, 101), True),
+        )
+        current = _results(
+            rate=((80, 81, 79, 80), True),
+            latency=((15, 16, 15, 14), False),
+            noisy=((90, 45, 135, 90), True),
+            small=((98, 98.5, 97.5), True),
+            single=((50,), True),
+            skipped=((), True),
+        )
+        current["results"]["skipped"]["error"] = "Not supported"
+        rows = {e["name"]: e for e in network.compare(baseline, current)}
+        self.assertEqual(set(rows), {"rate", "latency", "noisy", "small", "single"})
+        self.assertAlmostEqual(rows["rate"]["change"], -0.2)
+        self.assertTrue(rows["rate"]["regression"])
+        self.assertTrue(rows["latency"]["regression"])  # Lower is better
+        self.assertFalse(rows["noisy"]["regression"])  # Not significant
+        self.assertGreater(rows["noisy"]["p_value"], 0.05)
+        self.assertFalse(rows["small"]["regression"])  # Below threshold
+        self.assertLess(rows["small"]["p_value"], 0.05)
+        rows_low = {
+            e["name"]: e for e in network.compare(baseline, current, threshold=0.01)
+        }
+        self.assertTrue(rows_low["small"]["regression"])
+        self.assertIsNone(rows["single"]["p_value"])  # Not enough samples
+        self.assertFalse(rows["single"]["regression"])
+        # Improvements (in both directions) aren't regressions
+        rows = {e["name"]: e for e in network.compare(current, baseline)}
+        self.assertFalse(any(e["regression"] for e in rows.values()))
+        self.assertGreater(rows["rate"]["change"], 0)
+        self.assertLess(rows["latency"]["change"], 0)
+        self.assertLess(rows["latency"]["p_value"], 0.05)
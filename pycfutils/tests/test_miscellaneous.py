@@ -311,6 +311,33 @@ class MiscellaneousTestCase(unittest.TestCase):
             [0] * 9,
         )
 
+    def test_permutation(self):
+        self.assertRaises(ValueError, miscellaneous.Permutation, -1)
+        self.assertRaises(ValueError, miscellaneous.Permutation, 5, shard=2, shards=2)
+        self.assertEqual(list(miscellaneous.Permutation(5)), [0, 1, 2, 3, 4])
+        self.assertEqual(list(miscellaneous.Permutation(0, seed=1)), [])
+        for size in (1, 2, 3, 10, 1000, 4097):
+            perm = miscellaneous.Permutation(size, seed=size)
+            self.assertEqual(len(perm), size)
+            self.assertEqual(sorted(perm), list(range(size)))
+        self.assertEqual(
+            list(miscellaneous.Permutation(100, seed=3)),
+            list(miscellaneous.Permutation(100, seed=3)),
+        )
+        self.assertNotEqual(
+            list(miscellaneous.Permutation(100, seed=3)),
+            list(miscellaneous.Permutation(100, seed=4)),
+        )
+        shards = [list(miscellaneous.Permutation(1001, 7, k, 3)) for k in range(3)]
+        self.assertEqual([len(e) for e in shards], [334, 334, 333])
+        self.assertEqual(sorted(sum(shards, [])), list(range(1001)))
+        self.assertEqual(list(miscellaneous.Permutation(7, shard=1, shards=3)), [1, 4])
+        perm = miscellaneous.Permutation(1 << 144, seed=0)
+        self.assertEqual(perm.count, 1 << 144)
+        self.assertTrue(0 <= perm[-1] < 1 << 144)
+        self.assertNotEqual(perm[0], perm[1])
+        self.assertRaises(IndexError, perm.__getitem__, 1 << 144)
+
     def test_timed_execution(self):
         bools = (False, True)
         sleep_val = 0.2
@@ -1,11 +1,23 @@
+import asyncio
+import os
 import socket
 import sys
+import tempfile
+import threading
 import time
+import traceback
 import unittest
+from unittest import mock
 
 from pycfutils import network
 
 
+def _echo_handler(client, peer):
+    data = client.recv(16)
+    client.sendall(data)
+    return data != b"fail"
+
+
 class NetworkBaseTestCase(unittest.TestCase):
     def setUp(self):
         self.ipv6 = socket.has_ipv6
@@ -96,6 +108,247 @@ class NetworkGenericTestCase(NetworkBaseTestCase):
                 )
                 self.assertEqual(len(res), 1)
 
+    def test_resolver_cache(self):
+        invalid = "invalid.invalid"
+        cache = network.ResolverCache(max_size=2, ttl=0.3, negative_ttl=0.3)
+        self.assertIsNone(network.set_resolver_cache(cache))
+        try:
+            with mock.patch.object(
+                network, "_parse_address", wraps=network._parse_address
+            ) as func:
+                for _ in range(3):
+                    self.assertEqual(
+                        network.parse_address(self.lh4, self.port)[0][:2],
+                        (self.lh4, self.port),
+                    )
+                    with self.assertRaises(network.NetworkException):
+                        network.parse_address(invalid, self.port)
+                self.assertEqual(func.call_count, 2)
+                self.assertEqual(
+                    cache.statistics(),
+                    {
+                        "size": 2,
+                        "hits": 2,
+                        "negative_hits": 2,
+                        "misses": 2,
+                        "evictions": 0,
+                    },
+                )
+                time.sleep(0.4)
+                network.parse_address(self.lh4, self.port)
+                self.assertEqual(func.call_count, 3)
+                network.parse_address(self.lh4, self.port + 1)
+                network.parse_address(self.lh4, self.port + 2)
+                self.assertEqual(len(cache), 2)
+                self.assertEqual(cache.evictions, 2)
+                self.assertEqual(cache.invalidate(port=self.port + 1), 1)
+                self.assertEqual(cache.invalidate(address=invalid), 0)
+                self.assertEqual(cache.invalidate(), 1)
+                self.assertEqual(len(cache), 0)
+                self.assertEqual(
+                    cache.warm(
+                        (
+                            self.lh4,
+                            (self.lh4, self.port),
+                            (
+                                self.lh4,
+                                self.port,
+                                network.SOCKET_FAMILY_IPV4,
+                                network.SOCKET_TYPE_TCP,
+                            ),
+                            (invalid, self.port),
+                        )
+                    ),
+                    3,
+                )
+                self.assertEqual(len(cache), 2)
+                calls = func.call_count
+                network.parse_address(
+                    self.lh4,
+                    self.port,
+                    family=network.SOCKET_FAMILY_IPV4,
+                    type_=network.SOCKET_TYPE_TCP,
+                )
+                self.assertEqual(func.call_count, calls)
+        finally:
+            self.assertIs(network.set_resolver_cache(None), cache)
+
+    def test_resolver_cache_negative(self):
+        cache = network.ResolverCache(negative_ttl=10)
+        error = socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        with mock.patch.object(network, "_parse_address", side_effect=error) as func:
+            errors = []
+            for _ in range(3):
+                with self.assertRaises(socket.gaierror) as ctx:
+                    cache._resolve("invalid.invalid", self.port, None, None)
+                errors.append(ctx.exception)
+            self.assertEqual(func.call_count, 1)
+        self.assertEqual(cache.negative_hits, 2)
+        self.assertIsNot(errors[1], errors[2])
+        self.assertEqual(errors[2].args, error.args)
+        self.assertEqual(errors[2].errno, socket.EAI_NONAME)
+        depth = len(traceback.extract_tb(errors[1].__traceback__))
+        self.assertEqual(len(traceback.extract_tb(errors[2].__traceback__)), depth)
+
+    def test__token_bucket(self):
+        bucket = network._TokenBucket(10, capacity=2)
+        now = bucket.time
+        self.assertTrue(bucket.consume(now=now))
+        self.assertTrue(bucket.consume(now=now))
+        self.assertFalse(bucket.consume(now=now))
+        self.assertAlmostEqual(bucket.delay(now=now), 0.1)
+        self.assertTrue(bucket.consume(now=now + 0.11))
+        self.assertTrue(bucket.consume(2, now=now + 10))
+        self.assertFalse(bucket.consume(3, now=now + 20))
+
+    def test_admission_control(self):
+        self.assertRaises(network.NetworkException, network.AdmissionControl, rate=-1)
+        self.assertRaises(
+            network.NetworkException, network.AdmissionControl, shed="drop"
+        )
+        admission = network.AdmissionControl(
+            rate=10, burst=3, source_rate=1, source_burst=2, max_sources=2
+        )
+        now = time.monotonic() + 1
+        self.assertEqual(admission.ready(now=now), 0)
+        self.assertIsNone(admission.admit("10.0.0.1", now=now))
+        self.assertIsNone(admission.admit("10.0.0.1", now=now))
+        self.assertEqual(admission.admit("10.0.0.1", now=now), network.ADMISSION_SOURCE)
+        self.assertIsNone(admission.admit("10.0.0.2", now=now))
+        self.assertEqual(admission.admit("10.0.0.3", now=now), network.ADMISSION_RATE)
+        self.assertAlmostEqual(admission.ready(now=now), 0.1)
+        self.assertEqual(len(admission), 2)  # 10.0.0.1 evicted
+        self.assertIsNone(admission.admit("10.0.0.1", now=now + 1))
+        stats = admission.statistics()
+        self.assertEqual(stats["admitted"], 4)
+        self.assertEqual(
+            stats["rejected"],
+            {
+                network.ADMISSION_CONNECTIONS: 0,
+                network.ADMISSION_RATE: 1,
+                network.ADMISSION_SOURCE: 1,
+            },
+        )
+        admission = network.AdmissionControl(
+            source_rate=1, source_burst=1, ipv4_prefix=24, max_connections=2
+        )
+        self.assertIsNone(admission.admit("10.0.0.1", 1, now=now))
+        self.assertEqual(
+            admission.admit("10.0.0.2", 1, now=now), network.ADMISSION_SOURCE
+        )
+        self.assertIsNone(admission.admit("10.0.1.1", 1, now=now))
+        self.assertIsNone(admission.ready(2))
+        self.assertEqual(
+            admission.admit("10.0.2.1", 2, now=now), network.ADMISSION_CONNECTIONS
+        )
+
+    def test__rate_window(self):
+        window = network._RateWindow(seconds=10)
+        now = window._start + 0.5
+        window.add(5, now=now)
+        window.add(3, now=now + 1)
+        self.assertEqual(window.rate(1, now=now + 1), 5)
+        self.assertEqual(window.rate(10, now=now + 2), 4)
+        self.assertEqual(window.rate(1, now=now + 2), 3)
+        self.assertEqual(window.rate(10, now=now + 30), 0)
+        window.add(20, now=now + 30)
+        self.assertEqual(window.rate(10, now=now + 31), 2)
+
+    def test_latency_histogram(self):
+        hist = network.LatencyHistogram(precision_bits=4)
+        self.assertIsNone(hist.percentile(50))
+        self.assertEqual(
+            hist.statistics(),
+            {
+                "count": 0,
+                "min": None,
+                "avg": None,
+                "p50": None,
+                "p90": None,
+                "p99": None,
+                "max": None,
+            },
+        )
+        for value in range(1, 10001):
+            hist.record(value * 1000)
+        self.assertEqual((len(hist), hist.min, hist.max), (10000, 1000, 10000000))
+        self.assertLess(len(hist.buckets), 200)
+        stats = hist.statistics(percents=(50, 99.9))
+        self.assertEqual(stats["avg"], 5000500)
+        self.assertAlmostEqual(stats["p50"] / 5000000, 1, delta=1 / 16)
+        self.assertAlmostEqual(stats["p99.9"] / 9990000, 1, delta=1 / 16)
+        self.assertEqual(hist.percentile(100), 10000000)
+        other = network.LatencyHistogram(precision_bits=4)
+        other.record(5, count=3)
+        hist.merge(other)
+        self.assertEqual((len(hist), hist.min), (10003, 5))
+        self.assertEqual(hist.percentile(0.01), 5)
+        self.assertRaises(
+            network.NetworkException, hist.merge, network.LatencyHistogram()
+        )
+
+    def test_socket_options(self):
+        self.assertRaises(network.NetworkException, network.socket_options, "fast")
+        self.assertRaises(
+            network.NetworkException, network.socket_options, "server", family="fam"
+        )
+        for profile in network.SOCKET_PROFILES:
+            options = network.socket_options(profile)
+            self.assertIsInstance(options, dict)
+            with network._create_socket(
+                socket.AF_INET, socket.SOCK_STREAM, 0, options
+            ) as sock:
+                for level, opts in options.items():
+                    for name, value in opts.items():
+                        if isinstance(value, int):
+                            self.assertTrue(sock.getsockopt(level, name))
+        with mock.patch.object(network, "_socket_option_supported", return_value=False):
+            self.assertEqual(network.socket_options("scanner"), {})
+            self.assertRaises(
+                network.NetworkException,
+                network.socket_options,
+                "scanner",
+                strict=True,
+            )
+        self.assertGreater(network.backlog_max(), 0)
+
+    def test_frames(self):
+        left, right = socket.socketpair()
+        with left, right:
+            payloads = (b"data0", b"", bytearray(b"data1"), b"x" * 100)
+            self.assertEqual(
+                network.send_frames(left, payloads),
+                sum(len(e) + 4 for e in payloads),
+            )
+            reader = network.FrameReader(right, buffer_size=16, max_size=100)
+            self.assertFalse(reader.pending())
+            frame = reader.read()
+            self.assertIsInstance(frame, memoryview)
+            self.assertEqual(frame, b"data0")
+            self.assertTrue(reader.pending())  # Pipelined frames are buffered
+            self.assertEqual(
+                [bytes(e) for e in (reader.read(), reader.read(), reader.read())],
+                list(payloads[1:]),
+            )
+            # Header and payload split over multiple receives
+            left.sendall(b"\x00\x00")
+            left.sendall(b"\x00\x03ab")
+            threading.Timer(0.1, left.sendall, (b"c",)).start()
+            self.assertEqual(reader.read(), b"abc")
+            network.send_frame(left, b"x" * 101)
+            self.assertRaises(network.NetworkException, reader.read)
+        left, right = socket.socketpair()
+        with right:
+            with left:
+                left.sendall(b"\x00\x00\x00\x02a")
+            reader = network.FrameReader(right)
+            self.assertRaises(network.NetworkException, reader.read)
+        left, right = socket.socketpair()
+        with left, right:
+            network.send_frames(left, (b"data",) * 3)
+            left.shutdown(socket.SHUT_WR)
+            self.assertEqual(list(network.FrameReader(right)), [b"data"] * 3)
+
     def test__create_socket(self):
         families = tuple(network._SocketFamilyMap[e] for e in self.families)
         types = tuple(network._SocketTypeMap[e] for e in self.types)
@@ -158,6 +411,28 @@ class NetworkTCPServerClientTestCase(NetworkBaseTestCase):
             for srv in srvs:
                 srv.close()
 
+    def test_server_stop(self):
+        count = 16
+        with network.TCPServer(
+            self.lh4, self.port, silent=True, poll_timeout=5, backlog=count
+        ) as srv:
+            clis = [
+                network.connect_to_server(
+                    self.lh4, self.port, attempt_timeout=0.5, _return_client_socket=True
+                )
+                for _ in range(count)
+            ]
+            for _ in range(50):
+                if srv.handled_total >= count:
+                    break
+                time.sleep(0.1)
+            self.assertEqual((srv.handled_total, srv.handled_ok), (count, count))
+            start_time = time.time()
+            srv.stop()
+            self.assertLess(time.time() - start_time, 1)
+            for cli in clis:
+                network._close_socket(cli, method=None)
+
     def test_connect_to_server(self):
         self.assertRaises(
             network.NetworkException,
@@ -174,6 +449,216 @@ class NetworkTCPServerClientTestCase(NetworkBaseTestCase):
             attempt_timeout=0,
         )
 
+    def test_happy_eyeballs(self):
+        a4 = (self.lh4, self.port, socket.AF_INET, socket.SOCK_STREAM)
+        a6 = (self.lh6, self.port, socket.AF_INET6, socket.SOCK_STREAM)
+        self.assertEqual(network._happy_eyeballs_order(()), ())
+        self.assertEqual(
+            network._happy_eyeballs_order((a6, a6, a6, a4)), (a6, a4, a6, a6)
+        )
+        self.assertEqual(
+            network._happy_eyeballs_order((a4, a4, a6, a6)), (a4, a6, a4, a6)
+        )
+        self.assertRaises(
+            network.NetworkException,
+            network.connect_to_server,
+            self.lh4,
+            self.port,
+            attempt_timeout=0.5,
+            happy_eyeballs=True,
+        )
+        with network.TCPServer(self.lh4, self.port, silent=True) as srv:
+            for address in (self.lh4, self.lh):
+                self.assertEqual(
+                    network.connect_to_server(
+                        address, self.port, attempt_timeout=0.5, happy_eyeballs=True
+                    )[0],
+                    self.lh4,
+                )
+            # First record refused, second one started right away
+            closed = a4[:1] + (self.port + 1,) + a4[2:]
+            start_time = time.time()
+            cli = network._connect_happy_eyeballs((closed, a4), 0.5, 5, None)
+            self.assertLess(time.time() - start_time, 1)
+            self.assertEqual(cli.getpeername(), a4[:2])
+            network._close_socket(cli)
+            self.assertRaises(
+                OSError, network._connect_happy_eyeballs, (closed,), 0.5, 0.1, None
+            )
+            time.sleep(0.1)
+            self.assertEqual(srv.handled_ok, 3)
+
+    def test_connect_many(self):
+        self.assertEqual(tuple(network.connect_many(())), ())
+        count = 20
+        targets = [(self.lh4, self.port + idx % 2) for idx in range(count)]
+        targets.append(("invalid.invalid", self.port))
+        with network.TCPServer(self.lh4, self.port, silent=True, backlog=count) as srv:
+            results = tuple(network.connect_many(targets, concurrency=8, timeout=1))
+            self.assertEqual(len(results), len(targets))
+            self.assertEqual(sorted(e[0] for e in results), sorted(targets))
+            ok = [e for e in results if isinstance(e[1], tuple)]
+            self.assertEqual(len(ok), count // 2)
+            for target, result, elapsed in results:
+                self.assertGreaterEqual(elapsed, 0)
+                if target[1] == self.port and target[0] == self.lh4:
+                    self.assertEqual(result[0], self.lh4)
+                else:
+                    self.assertIsInstance(result, Exception)
+            self.assertIsInstance(
+                dict((e[0], e[1]) for e in results)[targets[-1]],
+                network.NetworkException,
+            )
+            socks = [
+                e[1]
+                for e in network.connect_many(
+                    targets[:2], timeout=1, return_sockets=True
+                )
+                if isinstance(e[1], socket.socket)
+            ]
+            self.assertEqual(len(socks), 1)
+            self.assertEqual(socks[0].getpeername(), (self.lh4, self.port))
+            network._close_socket(socks[0])
+            start_time = time.time()
+            self.assertEqual(
+                len(tuple(network.connect_many(targets[:20], rate=50))), 20
+            )
+            self.assertGreater(time.time() - start_time, 0.25)
+            gen = network.connect_many(targets, concurrency=4)
+            next(gen)
+            gen.close()
+            for _ in range(50):
+                if srv.handled_total >= count // 2 + 1:
+                    break
+                time.sleep(0.1)
+            self.assertGreaterEqual(srv.handled_ok, count // 2 + 1)
+
+    def test_rtt_estimator(self):
+        self.assertRaises(network.NetworkException, network.RTTEstimator, 0)
+        self.assertRaises(network.NetworkException, network.RTTEstimator, 2, 1)
+        est = network.RTTEstimator(floor=0.01, ceiling=2, initial=1, max_size=2)
+        self.assertEqual(est.timeout("10.0.0.1"), 1)
+        self.assertIsNone(est.estimate("10.0.0.1"))
+        est.update("10.0.0.1", 0.1)
+        self.assertEqual(est.estimate("10.0.0.200"), (0.1, 0.05))
+        self.assertAlmostEqual(est.timeout("10.0.0.2"), 0.3)
+        self.assertEqual(est.timeout("10.0.1.1"), 1)
+        for _ in range(50):
+            est.update("10.0.0.1", 0.001)
+        self.assertEqual(est.timeout("10.0.0.1"), 0.01)
+        est.update("::1", 5)
+        self.assertEqual(est.timeout("::2"), 2)
+        est.update("10.0.2.1", 0.5)
+        self.assertEqual((len(est), est.samples), (2, 53))
+        self.assertIsNone(est.estimate("10.0.0.1"))
+        est = network.RTTEstimator(floor=0.02, ceiling=1)
+        with network.TCPServer(self.lh4, self.port, silent=True):
+            targets = [(self.lh4, self.port + idx % 2) for idx in range(10)]
+            results = tuple(
+                network.connect_many(targets, concurrency=1, rtt_estimator=est)
+            )
+            self.assertEqual(len([e for e in results if isinstance(e[1], tuple)]), 5)
+            self.assertEqual(est.samples, 10)  # Connected and refused
+            self.assertEqual(est.timeout(self.lh4), 0.02)
+            network.connect_to_server(self.lh4, self.port, rtt_estimator=est)
+            self.assertRaises(
+                network.NetworkException,
+                network.connect_to_server,
+                self.lh4,
+                self.port + 1,
+                attempts=2,
+                rtt_estimator=est,
+            )
+            self.assertEqual(est.samples, 13)
+
+    def test_backoff(self):
+        self.assertRaises(network.NetworkException, network.Backoff, factor=0.5)
+        self.assertRaises(network.NetworkException, network.Backoff, 1, maximum=0.5)
+        delays = network.Backoff(0.1, 2, 1, jitter_percent=0).delays()
+        self.assertEqual(
+            [round(next(delays), 6) for _ in range(7)], [0.1, 0.2, 0.4, 0.8, 1, 1, 1]
+        )
+        delays = network.Backoff(1, 1, 1, jitter_percent=50).delays()
+        for _ in range(20):
+            self.assertTrue(0.5 <= next(delays) <= 1)
+        report = {}
+        start_time = time.time()
+        self.assertRaises(
+            network.NetworkException,
+            network.connect_to_server,
+            self.lh4,
+            self.port,
+            attempts=4,
+            backoff=network.Backoff(0.05, jitter_percent=0),
+            report=report,
+        )
+        self.assertGreaterEqual(time.time() - start_time, 0.35)
+        self.assertEqual(report["attempts"], 4)
+        self.assertAlmostEqual(report["delay"], 0.35)
+        self.assertRaises(
+            network.NetworkException,
+            network.connect_to_server,
+            self.lh4,
+            self.port,
+            attempts=0,
+            backoff=network.Backoff(0.05, jitter_percent=0),
+            deadline=0.5,
+            report=report,
+        )
+        self.assertEqual(report["attempts"], 4)
+        self.assertLess(report["elapsed"], 0.5)  # Resolution not included
+        self.assertGreaterEqual(report["resolve"], 0)
+        with network.TCPServer(self.lh4, self.port, silent=True):
+            network.connect_to_server(
+                self.lh4, self.port, backoff=network.Backoff(), report=report
+            )
+            self.assertEqual((report["attempts"], report["delay"]), (1, 0))
+
+    def test_server_metrics(self):
+        with network.TCPServer(self.lh4, self.port, silent=True) as srv:
+            with network.MetricsServer((srv,), self.lh4, self.port + 1) as msrv:
+                for _ in range(3):
+                    network.connect_to_server(self.lh4, self.port)
+                self._wait_handled(srv, 3)
+                metrics = srv.metrics()
+                self.assertEqual(
+                    (metrics["type"], metrics["address"], metrics["port"]),
+                    (network.SOCKET_TYPE_TCP, self.lh4, self.port),
+                )
+                self.assertEqual(
+                    (metrics["handled_total"], metrics["handled_ok"]), (3, 3)
+                )
+                self.assertEqual(tuple(metrics["accept_rate"]), (1, 10, 60))
+                self.assertEqual(metrics["handler_latency"]["count"], 3)
+                self.assertGreater(metrics["handler_latency"]["sum"], 0)
+                self.assertGreaterEqual(metrics["uptime"], 0)
+                if sys.platform.startswith("linux"):
+                    self.assertEqual(metrics["accept_queue"], 0)
+                    self.assertIn("listen_overflows", metrics)
+                text = network.prometheus_metrics((srv,))
+                labels = f'{{type="tcp",address="{self.lh4}",port="{self.port}"}}'
+                self.assertIn(f"pycfutils_server_handled_total{labels} 3\n", text)
+                self.assertIn("# TYPE pycfutils_server_handled_total counter\n", text)
+                self.assertIn(
+                    "pycfutils_server_handler_latency_seconds_count" f"{labels} 3\n",
+                    text,
+                )
+                client = network.connect_to_server(
+                    self.lh4, self.port + 1, _return_client_socket=True
+                )
+                client.sendall(b"GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n")
+                response = b""
+                while True:
+                    data = client.recv(0x10000)
+                    if not data:
+                        break
+                    response += data
+                network._close_socket(client)
+                self.assertTrue(response.startswith(b"HTTP/1.0 200 OK\r\n"))
+                self.assertIn(f"handled_total{labels} 3".encode(), response)
+                self._wait_handled(msrv, 1)
+                self.assertEqual(msrv.handled_ok, 1)
+
     def test_server_client(
         self,
     ):
@@ -207,7 +692,7 @@ class NetworkTCPServerClientTestCase(NetworkBaseTestCase):
             self.assertEqual(cli.getpeername(), (self.lh4, self.port))
             try:
                 network._close_socket(cli)
-            except:
+            except Exception:
                 pass
             srv.close()
             self.assertRaises(
@@ -247,3 +732,556 @@ class NetworkTCPServerClientTestCase(NetworkBaseTestCase):
                 self.port,
                 **{"attempt_timeout": 0.5},
             )
+
+    def _wait_handled(self, srv, count, retries=50):
+        for _ in range(retries):
+            if srv.handled_total >= count:
+                break
+            time.sleep(0.1)
+
+    def _echo(self, data):
+        cli = network.connect_to_server(
+            self.lh4, self.port, attempt_timeout=1, _return_client_socket=True
+        )
+        try:
+            cli.sendall(data)
+            return cli.recv(16)
+        finally:
+            network._close_socket(cli)
+
+    @unittest.skipUnless(hasattr(socket, "TCP_FASTOPEN"), "TCP_FASTOPEN needed")
+    def test_fast_open(self):
+        with network.TCPServer(
+            self.lh4, self.port, silent=True, handler=_echo_handler, fast_open=8
+        ) as srv:
+            self.assertTrue(
+                srv.socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_FASTOPEN)
+            )
+            # The 1st connection gets the cookie, the next ones send data in the SYN
+            for data in (b"data0", b"data1", b"data2"):
+                cli = network.connect_to_server(
+                    self.lh4,
+                    self.port,
+                    data=data,
+                    fast_open=True,
+                    _return_client_socket=True,
+                )
+                try:
+                    self.assertEqual(cli.recv(16), data)
+                finally:
+                    network._close_socket(cli)
+            self._wait_handled(srv, 3)
+            self.assertEqual((srv.handled_total, srv.handled_ok), (3, 3))
+
+    def test_server_from_fd(self):
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.lh4, self.port))
+        with network.TCPServer.from_fd(sock.detach(), silent=True) as srv:
+            self.assertEqual(srv.socket.getsockname(), (self.lh4, self.port))
+            network.connect_to_server(self.lh4, self.port)
+            self._wait_handled(srv, 1)
+            self.assertEqual(srv.handled_total, 1)
+        with socket.socket(type=socket.SOCK_DGRAM) as sock:
+            self.assertRaises(
+                network.NetworkException, network.TCPServer.from_fd, sock.fileno()
+            )
+            self.assertEqual(sock.type, socket.SOCK_DGRAM)  # Still usable
+
+    @unittest.skipUnless(hasattr(socket, "SCM_RIGHTS"), "SCM_RIGHTS needed")
+    def test_server_handoff(self):
+        path = "@pycfutils-handoff" if sys.platform.startswith("linux") else None
+        if path is None:
+            self.skipTest("Abstract Unix sockets needed")
+        received = []
+        receiver = threading.Thread(
+            target=lambda: received.append(
+                network.TCPServer.receive_handoff(path, timeout=5, silent=True)
+            )
+        )
+        old = network.TCPServer(self.lh4, self.port, silent=True)
+        with old:
+            network.connect_to_server(self.lh4, self.port)
+            receiver.start()
+            for _ in range(50):
+                try:
+                    old.handoff(path)
+                    break
+                except network.NetworkException:  # Receiver not ready yet
+                    time.sleep(0.1)
+            receiver.join()
+            self.assertIsNone(old.socket)
+            self._wait_handled(old, 1)
+            self.assertEqual(old.handled_total, 1)
+            # Queued in the shared backlog until the new server starts
+            cli = network.connect_to_server(
+                self.lh4, self.port, _return_client_socket=True
+            )
+            with received[0] as new:
+                self._wait_handled(new, 1)
+                self.assertEqual(new.handled_total, 1)
+            network._close_socket(cli)
+        self.assertRaises(network.NetworkException, old.handoff, path)
+
+    def test_server_group(self):
+        with self.assertRaises(network.NetworkException):
+            network.ServerGroup(self.lh4, (self.port, 0))
+        ports = range(self.port, self.port + 32)
+        threads = threading.active_count()
+        with network.ServerGroup(
+            self.lh4, ports, silent=True, handler=_echo_handler
+        ) as srv:
+            self.assertEqual(threading.active_count(), threads + 1)
+            self.assertEqual(len(srv.listeners), len(ports))
+            for port in ports[::8]:
+                cli = network.connect_to_server(
+                    self.lh4, port, _return_client_socket=True
+                )
+                cli.sendall(b"fail" if port == self.port else b"data")
+                cli.recv(16)
+                network._close_socket(cli)
+                time.sleep(0.02)
+            self._wait_handled(srv, 4)
+            self.assertEqual((srv.handled_total, srv.handled_ok), (4, 3))
+            counters = srv.counters()
+            self.assertEqual(len(counters), len(ports))
+            self.assertEqual(counters[self.port], (1, 0))
+            self.assertEqual(counters[self.port + 8], (1, 1))
+            self.assertEqual(counters[self.port + 1], (0, 0))
+            metrics = srv.metrics()
+            self.assertEqual(metrics["port"], f"{ports[0]}-{ports[-1]}")
+            self.assertEqual(metrics["listeners"], len(ports))
+        self.assertEqual(srv.listeners, {})
+        if self.ipv6:
+            with network.ServerGroup(self.lh6, self.port, silent=True) as srv:
+                network.connect_to_server(self.lh6, self.port)
+                self._wait_handled(srv, 1)
+                self.assertEqual(srv.counters(), {self.port: (1, 1)})
+
+    def test_framed_client(self):
+        with network.TCPServer(
+            self.lh4,
+            self.port,
+            silent=True,
+            handler=network.frame_handler(lambda frame: frame[::-1]),
+            handler_workers=1,
+        ) as srv:
+            with network.FramedClient.connect(self.lh4, self.port) as cli:
+                self.assertEqual(cli.request(b"data"), b"atad")
+                self.assertEqual(cli.request(b""), b"")
+                payload = bytes(range(256)) * 1024  # Larger than the buffer
+                self.assertEqual(cli.request(payload), payload[::-1])
+                payloads = [str(e).encode() * e for e in range(100)]
+                self.assertEqual(
+                    cli.pipeline(payloads, depth=16), [e[::-1] for e in payloads]
+                )
+            self._wait_handled(srv, 1)
+            self.assertEqual((srv.handled_total, srv.handled_ok), (1, 1))
+
+    def test_server_handler(self):
+        with self.assertRaises(network.NetworkException):
+            network.TCPServer(self.lh4, self.port, backpressure="backpressure")
+        # Accepted sockets inheriting O_NONBLOCK (BSD, macOS) are made blocking
+        client, peer = socket.socketpair()
+        with peer:
+            client.setblocking(False)
+            self.assertTrue(
+                network._run_connection_handler(
+                    lambda cli, _: cli.getblocking(), client, ()
+                )
+            )
+        for kwargs in (
+            {},
+            {"handler_workers": 2},
+            {"handler_workers": 1, "handler_process_pool": True},
+        ):
+            with network.TCPServer(
+                self.lh4, self.port, silent=True, handler=_echo_handler, **kwargs
+            ) as srv:
+                for data in (b"data0", b"fail", b"data1"):
+                    self.assertEqual(self._echo(data), data)
+                self._wait_handled(srv, 3)
+                self.assertEqual((srv.handled_total, srv.handled_ok), (3, 2))
+                self.assertEqual(srv.queue_depth, 0)
+                self.assertGreater(srv.handler_latency_total, 0)
+                self.assertGreaterEqual(
+                    srv.handler_latency_total, srv.handler_latency_max
+                )
+
+    def test_server_backpressure(self):
+        event = threading.Event()
+
+        def handler(client, peer):
+            return event.wait(5)
+
+        for backpressure in network.BACKPRESSURES:
+            event.clear()
+            with network.TCPServer(
+                self.lh4,
+                self.port,
+                silent=True,
+                handler=handler,
+                handler_workers=1,
+                queue_size=1,
+                backpressure=backpressure,
+            ) as srv:
+                clis = [
+                    network.connect_to_server(
+                        self.lh4,
+                        self.port,
+                        attempt_timeout=1,
+                        _return_client_socket=True,
+                    )
+                    for _ in range(2)
+                ]
+                time.sleep(0.3)
+                self.assertEqual(srv.queue_depth, 1)
+                if backpressure == network.BACKPRESSURE_RESET:
+                    self.assertEqual(srv.handled_rejected, 1)
+                    self.assertEqual(srv.handled_total, 1)
+                else:
+                    self.assertEqual(srv.handled_rejected, 0)
+                    self.assertEqual(srv.handled_total, 0)
+                event.set()
+                self._wait_handled(srv, 2)
+                self.assertEqual(srv.queue_depth_max, 1)
+                self.assertEqual(
+                    srv.handled_ok,
+                    1 if backpressure == network.BACKPRESSURE_RESET else 2,
+                )
+                for cli in clis:
+                    network._close_socket(cli)
+
+    def test_server_admission(self):
+        event = threading.Event()
+
+        def handler(client, peer):
+            return event.wait(5)
+
+        for shed in network.BACKPRESSURES:
+            event.clear()
+            admission = network.AdmissionControl(max_connections=1, shed=shed)
+            with network.TCPServer(
+                self.lh4,
+                self.port,
+                silent=True,
+                handler=handler,
+                handler_workers=2,
+                admission=admission,
+            ) as srv:
+                clis = [
+                    network.connect_to_server(
+                        self.lh4,
+                        self.port,
+                        attempt_timeout=1,
+                        _return_client_socket=True,
+                    )
+                    for _ in range(2)
+                ]
+                time.sleep(0.3)
+                self.assertEqual(srv.connections_open, 1)
+                if shed == network.BACKPRESSURE_RESET:
+                    self.assertEqual(srv.handled_rejected, 1)
+                    self.assertEqual(
+                        srv.metrics()["admission_rejected"][
+                            network.ADMISSION_CONNECTIONS
+                        ],
+                        1,
+                    )
+                else:
+                    self.assertEqual(srv.handled_rejected, 0)
+                    self.assertEqual(srv.metrics()["accept_queue"], 1)
+                event.set()
+                self._wait_handled(srv, 2)
+                self.assertEqual(srv.connections_open, 0)
+                self.assertEqual(
+                    srv.handled_ok, 1 if shed == network.BACKPRESSURE_RESET else 2
+                )
+                for cli in clis:
+                    network._close_socket(cli)
+
+        admission = network.AdmissionControl(
+            rate=1000, burst=1, shed=network.BACKPRESSURE_PAUSE
+        )
+        with network.TCPServer(
+            self.lh4, self.port, silent=True, admission=admission
+        ) as srv:
+            for _ in range(4):
+                cli = network.connect_to_server(
+                    self.lh4, self.port, attempt_timeout=1, _return_client_socket=True
+                )
+                network._close_socket(cli)
+            self._wait_handled(srv, 4)
+            self.assertEqual(srv.handled_ok, 4)
+            self.assertEqual(admission.statistics()["admitted"], 4)
+
+    def test_connection_pool(self):
+        def handler(client, peer):
+            while True:
+                data = client.recv(16)
+                if not data or data == b"close":
+                    return True
+                client.sendall(data)
+
+        with network.TCPServer(
+            self.lh4,
+            self.port,
+            silent=True,
+            handler=handler,
+            handler_workers=4,
+            backlog=8,
+        ) as srv, network.ConnectionPool(
+            max_per_host=2, max_total=2, attempt_timeout=1
+        ) as pool:
+            cli = pool.acquire(self.lh4, self.port)
+            cli.sendall(b"data")
+            self.assertEqual(cli.recv(16), b"data")
+            pool.release(cli)
+            with pool.connection(self.lh4, self.port) as cli1:
+                self.assertIs(cli1, cli)
+                cli0 = pool.acquire(self.lh4, self.port)
+                self.assertIsNot(cli0, cli)
+                with self.assertRaises(network.NetworkException):
+                    pool.acquire(self.lh4, self.port, timeout=0.1)
+                pool.release(cli0)
+            self.assertEqual(pool.statistics()["idle"], 2)
+            self.assertEqual(pool.statistics()["created"], 2)
+            self.assertEqual(pool.statistics()["reused"], 1)
+            # Peer closes an idle connection: stale (not reused)
+            with pool.connection(self.lh4, self.port) as cli:
+                cli.sendall(b"close")
+                time.sleep(0.2)
+            self.assertEqual(pool.purge(), 1)
+            self.assertEqual(pool.stale, 1)
+            self.assertEqual(pool.prewarm(self.lh4, self.port, count=5), 1)
+            self.assertEqual(pool.statistics()["idle"], 2)
+            self.assertEqual(pool.statistics()["reused"], 2)  # Not by prewarm
+            # Total limit reached: oldest idle connection (other endpoint) evicted
+            with pool.connection(self.lh, self.port):
+                self.assertEqual(pool.statistics()["idle"], 1)
+            pool.idle_timeout = 0.1
+            time.sleep(0.2)
+            self.assertEqual(pool.purge(), 2)
+            self.assertEqual(pool.expired, 2)
+            with self.assertRaises(network.NetworkException):
+                pool.acquire(self.lh4, self.port + 1, timeout=0.1)
+            self.assertEqual(pool.statistics()["in_use"], 0)
+        self.assertTrue(pool.closed)
+        self.assertRaises(network.NetworkException, pool.acquire, self.lh4, self.port)
+        self.assertEqual(srv.handled_total, srv.handled_ok)
+
+    @unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT needed")
+    def test_multi_process_server(self):
+        count = 12
+        with network.MultiProcessTCPServer(
+            self.lh4, self.port, silent=True, backlog=count * 2, workers=2
+        ) as srv:
+            self.assertTrue(srv.running)
+            self.assertEqual(len(srv.processes), 2)
+            for _ in range(count):
+                network.connect_to_server(self.lh4, self.port, attempt_timeout=0.5)
+            for _ in range(50):
+                if srv.handled_total >= count:
+                    break
+                time.sleep(0.1)
+            self.assertEqual((srv.handled_total, srv.handled_ok), (count, count))
+            srv.stop()
+            self.assertFalse(srv.running)
+            self.assertEqual(srv.handled_total, count)
+            self.assertTrue(srv.start())
+            network.connect_to_server(self.lh4, self.port, attempt_timeout=0.5)
+            for _ in range(50):
+                if srv.handled_total > count:
+                    break
+                time.sleep(0.1)
+            self.assertEqual(srv.handled_ok, count + 1)
+        self.assertFalse(srv.running)
+        self.assertFalse(srv.start())
+
+
+class NetworkUDPServerTestCase(NetworkBaseTestCase):
+    def test_udp_server(self):
+        with self.assertRaises(network.NetworkException):
+            network.UDPServer(self.lh4, self.port, family=network.SOCKET_FAMILY_IPV6)
+        received = []
+
+        def handler(data, peer):
+            received.append(bytes(data))
+            return data != b"fail"
+
+        datagrams = (b"data0", b"fail", b"", b"data1" * 4)
+        with network.UDPServer(
+            self.lh4, self.port, silent=True, handler=handler, buffer_size=16
+        ) as srv:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as cli:
+                for data in datagrams:
+                    cli.sendto(data, (self.lh4, self.port))
+                for _ in range(50):
+                    if srv.handled_total >= len(datagrams):
+                        break
+                    time.sleep(0.1)
+        self.assertEqual(received, [e[:16] for e in datagrams])
+        self.assertEqual((srv.handled_total, srv.handled_ok), (4, 3))
+        self.assertEqual(srv.received_packets, 4)
+        self.assertEqual(srv.received_bytes, sum(len(e[:16]) for e in datagrams))
+
+
+class NetworkAsyncTCPServerTestCase(NetworkBaseTestCase):
+    def test_async_server(self):
+        async def echo(reader, writer):
+            data = await reader.read(16)
+            writer.write(data)
+            await writer.drain()
+            return data != b"fail"
+
+        async def run():
+            with self.assertRaises(network.NetworkException):
+                network.AsyncTCPServer(
+                    self.lh4, self.port, family=network.SOCKET_FAMILY_IPV6
+                )
+            async with network.AsyncTCPServer(
+                self.lh4, self.port, handler=echo, silent=True
+            ) as srv:
+                for data in (b"data0", b"fail", b"data1"):
+                    reader, writer = await asyncio.open_connection(self.lh4, self.port)
+                    writer.write(data)
+                    self.assertEqual(await reader.read(16), data)
+                    writer.close()
+                for _ in range(50):
+                    if srv.handled_total >= 3:
+                        break
+                    await asyncio.sleep(0.02)
+                self.assertEqual((srv.handled_total, srv.handled_ok), (3, 2))
+                loop = asyncio.get_running_loop()
+                self.assertEqual(
+                    (
+                        await loop.run_in_executor(
+                            None, network.connect_to_server, self.lh4, self.port
+                        )
+                    )[0],
+                    self.lh4,
+                )
+            self.assertIsNone(srv.socket)
+            self.assertFalse(await srv.start())
+
+        asyncio.run(run())
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "AF_UNIX needed")
+class NetworkUnixTestCase(NetworkBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "srv.sock")
+        self.unix = network.SOCKET_FAMILY_UNIX
+        self.linux = sys.platform.startswith("linux")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_parse_address(self):
+        self.assertRaises(
+            network.NetworkException, network.parse_address, "", family=self.unix
+        )
+        self.assertEqual(
+            network.parse_address(
+                self.path, family=self.unix, type_=network.SOCKET_TYPE_TCP
+            ),
+            ((self.path, 0, socket.AF_UNIX, socket.SOCK_STREAM),),
+        )
+        self.assertEqual(
+            len(network.parse_address(self.path, family=self.unix, exact_matches=2)),
+            2,
+        )
+        if self.linux:
+            self.assertEqual(
+                network.parse_address("@srv", family=self.unix)[0][0], "\0srv"
+            )
+
+    def test_server_client(self):
+        # Stale socket file (e.g. left by a crashed server) gets replaced
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(self.path)
+        addresses = (self.path,) + (("@pycfutils-test",) if self.linux else ())
+        for address in addresses:
+            with network.TCPServer(
+                address, 0, family=self.unix, silent=True, handler=_echo_handler
+            ) as srv:
+                for data in (b"data0", b"fail"):
+                    cli = network.connect_to_server(
+                        address, 0, family=self.unix, _return_client_socket=True
+                    )
+                    cli.sendall(data)
+                    self.assertEqual(cli.recv(16), data)
+                    network._close_socket(cli)
+                for _ in range(50):
+                    if srv.handled_total >= 2:
+                        break
+                    time.sleep(0.1)
+                self.assertEqual((srv.handled_total, srv.handled_ok), (2, 1))
+                results = tuple(
+                    network.connect_many(((address, 0),) * 3, family=self.unix)
+                )
+                self.assertTrue(all(isinstance(e[1], str) for e in results))
+                for _ in range(50):
+                    if srv.handled_total >= 5:
+                        break
+                    time.sleep(0.1)
+                self.assertEqual(srv.handled_total, 5)
+                self.assertEqual(srv.metrics()["address"], address)
+                if address == self.path:
+                    # Owned by a running server: not replaced
+                    with self.assertRaises(network.NetworkException):
+                        network.TCPServer(address, 0, family=self.unix, silent=True)
+                    self.assertTrue(os.path.exists(self.path))
+                    network._close_socket(
+                        network.connect_to_server(
+                            address, 0, family=self.unix, _return_client_socket=True
+                        )
+                    )
+        self.assertFalse(os.path.exists(self.path))
+        self.assertRaises(
+            network.NetworkException,
+            network.connect_to_server,
+            self.path,
+            0,
+            family=self.unix,
+        )
+        with self.assertRaises(network.NetworkException):
+            network.MultiProcessTCPServer(self.path, 0, family=self.unix)
+
+    def test_udp_server(self):
+        received = []
+
+        def handler(data, peer):
+            received.append(bytes(data))
+            return True
+
+        with network.UDPServer(
+            self.path, 0, family=self.unix, silent=True, handler=handler
+        ) as srv:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as cli:
+                for data in (b"data0", b"data1"):
+                    cli.sendto(data, self.path)
+                for _ in range(50):
+                    if srv.handled_total >= 2:
+                        break
+                    time.sleep(0.1)
+        self.assertEqual(received, [b"data0", b"data1"])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_async_server(self):
+        async def run():
+            async with network.AsyncTCPServer(
+                self.path, 0, family=self.unix, silent=True
+            ) as srv:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                writer.close()
+                for _ in range(50):
+                    if srv.handled_total >= 1:
+                        break
+                    await asyncio.sleep(0.02)
+                self.assertEqual(srv.handled_total, 1)
+            self.assertFalse(os.path.exists(self.path))
+
+        asyncio.run(run())
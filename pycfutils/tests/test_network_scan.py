@@ -0,0 +1,155 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pycfutils import network
+from pycfutils.tools import network_scan
+
+
+class NetworkScanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.dir.name, "scan.json")
+        self.lh4 = "127.0.0.1"
+        self.port = network._PORT_DEFAULT
+        self.last_port = self.port + 11
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _scan(self, *argv, output="out.jsonl"):
+        return network_scan.main(
+            "-a",
+            self.lh4,
+            "-p",
+            str(self.port),
+            "-r",
+            str(self.last_port),
+            "-c",
+            "4",
+            "-v",
+            "-k",
+            self.checkpoint,
+            "-o",
+            os.path.join(self.dir.name, output),
+            *argv,
+        )
+
+    def _output_targets(self, file_name="out.jsonl"):
+        with open(os.path.join(self.dir.name, file_name)) as f:
+            return [(e["address"], e["port"]) for e in map(json.loads, f)]
+
+    def test__progress(self):
+        progress = network_scan._Progress(10)
+        positions = progress.positions()
+        taken = [next(positions) for _ in range(5)]
+        for position in (0, 2, 3):
+            progress.done(position)
+        self.assertEqual(progress.state(), {"cursor": 5, "pending": [1, 4]})
+        self.assertFalse(progress.finished())
+        network_scan._save_checkpoint(
+            self.checkpoint,
+            {"version": network_scan._CHECKPOINT_VERSION, **progress.state()},
+        )
+        self.assertFalse(os.path.exists(self.checkpoint + ".tmp"))
+        checkpoint = network_scan._load_checkpoint(self.checkpoint)
+        resumed = network_scan._Progress(
+            10, checkpoint["cursor"], checkpoint["pending"]
+        )
+        self.assertEqual(resumed.state(), progress.state())
+        positions = resumed.positions()
+        retaken = [next(positions) for _ in range(3)]
+        self.assertEqual(retaken, [1, 4, 5])  # Pending ones first
+        self.assertEqual(resumed.state(), {"cursor": 6, "pending": [1, 4, 5]})
+        retaken.extend(positions)
+        for position in retaken:
+            resumed.done(position)
+        self.assertTrue(resumed.finished())
+        self.assertEqual(
+            sorted([e for e in taken if e not in (1, 4)] + retaken),
+            list(range(10)),
+        )
+        with open(self.checkpoint, "w") as f:
+            json.dump({"version": network_scan._CHECKPOINT_VERSION + 1}, f)
+        self.assertRaises(ValueError, network_scan._load_checkpoint, self.checkpoint)
+
+    def test__result_writer(self):
+        records = (
+            (self.lh4, self.port, (self.lh4, 40000), 0.25, 1000.5),
+            ("::1", self.port + 1, ConnectionRefusedError(), 0.001, 1001),
+        )
+        for format_ in network_scan._OUTPUT_FORMATS:
+            file_name = os.path.join(self.dir.name, f"out.{format_}")
+            for append in (False, True):
+                writer = network_scan._ResultWriter(file_name, format_, append=append)
+                for record in records:
+                    writer.write(*record)
+                writer.close()
+            with open(file_name, newline="") as f:
+                if format_ == "csv":
+                    rows = list(csv.reader(f))
+                    self.assertEqual(rows[0], list(writer._FIELDS))  # Header once
+                    rows = [dict(zip(rows[0], e)) for e in rows[1:]]
+                    success = [e["success"] == "True" for e in rows]
+                else:
+                    rows = [json.loads(e) for e in f]
+                    success = [e["success"] for e in rows]
+            self.assertEqual(len(rows), 4)
+            self.assertEqual(success, [True, False] * 2)
+            self.assertEqual(
+                [(e["address"], int(e["port"])) for e in rows[:2]],
+                [(self.lh4, self.port), ("::1", self.port + 1)],
+            )
+            self.assertFalse(rows[0]["error"])
+            self.assertEqual(rows[1]["error"], "ConnectionRefusedError")
+            self.assertEqual(float(rows[0]["elapsed"]), 0.25)
+            self.assertEqual(float(rows[1]["timestamp"]), 1001)
+
+    def test_resume(self):
+        targets = [(self.lh4, e) for e in range(self.port, self.last_port + 1)]
+        connect_many = network_scan.connect_many
+
+        def interrupted_connect_many(*args, **kwargs):
+            # Interrupt after a few results (other attempts still in flight)
+            results = connect_many(*args, **kwargs)
+            try:
+                for idx, result in enumerate(results):
+                    if idx == 5:
+                        raise KeyboardInterrupt
+                    yield result
+            finally:
+                results.close()
+
+        with network.TCPServer(self.lh4, self.port, silent=True):
+            with mock.patch.object(
+                network_scan, "connect_many", interrupted_connect_many
+            ):
+                self.assertEqual(self._scan("-s", "7"), 0)
+            with open(self.checkpoint) as f:
+                checkpoint = json.load(f)
+            self.assertEqual(checkpoint["total"], 5)
+            self.assertGreater(len(checkpoint["pending"]), 0)
+            self.assertEqual(
+                checkpoint["cursor"], checkpoint["total"] + len(checkpoint["pending"])
+            )
+            self.assertEqual(len(self._output_targets()), 5)
+            # A different scan can't use the checkpoint
+            self.assertEqual(self._scan("-s", "8", "-u"), -1)
+            self.assertEqual(
+                network_scan.main(
+                    "-a", self.lh4, "-p", str(self.port), "-k", self.checkpoint, "-u"
+                ),
+                -1,
+            )
+            # Resuming (seed taken from the checkpoint) scans the rest
+            self.assertEqual(self._scan("-u"), 0)
+            with open(self.checkpoint) as f:
+                checkpoint = json.load(f)
+            self.assertEqual(checkpoint["total"], len(targets))
+            self.assertEqual(checkpoint["pending"], [])
+        scanned = self._output_targets()
+        self.assertEqual(len(scanned), len(targets))  # No duplicates
+        self.assertEqual(sorted(scanned), targets)  # None missing
@@ -34,6 +34,13 @@ class SystemTestCase(unittest.TestCase):
             level += 1
             idx = self.cd.rfind(os.path.sep, 0, idx)
 
+    def test_cpu_count(self):
+        self.assertGreater(system.cpu_count(), 0)
+        self.assertLessEqual(
+            system.cpu_count(usable=True), system.cpu_count(usable=False)
+        )
+        self.assertEqual(system.cpu_count(usable=False), os.cpu_count() or 1)
+
     @staticmethod
     def _cpu_data(duration=1, intervals=5):
         reads = []
@@ -10,21 +10,42 @@ from typing import List, Optional, Sequence, Tuple
 from pycfutils.exceptions import NetworkException
 from pycfutils.network import (
     SOCKET_FAMILIES,
+    SOCKET_FAMILY_UNIX,
+    SOCKET_PROFILES,
     SOCKET_TYPE_TCP,
+    Backoff,
+    LatencyHistogram,
+    RTTEstimator,
     connect_to_server,
     parse_address,
+    socket_options,
 )
 
+_PHASES = ("resolve", "connect", "close", "total")
+
 
 def parse_args(
     argv: Optional[Sequence[str]] = None,
 ) -> Tuple[argparse.Namespace, List[str]]:
     parser = argparse.ArgumentParser(description="Test listening server")
+    parser.add_argument(
+        "--adaptive_timeout",
+        "-A",
+        action="store_true",
+        help=(
+            "derive the attempt timeout from the measured connection times"
+            " (at most --attempt_timeout, doubled after each timed out attempt)"
+        ),
+    )
     parser.add_argument(
         "--address",
         "-a",
         default="",
-        help="address to connect to (must resolve to exactly one IP)",
+        help=(
+            "address to connect to (must resolve to exactly one IP,"
+            " unless --happy_eyeballs is used)."
+            " For the unix family: a path, or @name for the Linux abstract namespace"
+        ),
     )
     parser.add_argument(
         "--attempt_timeout",
@@ -36,6 +57,35 @@ def parse_args(
     parser.add_argument(
         "--attempts", "-c", default=1, type=int, help="number of connection attempts"
     )
+    parser.add_argument(
+        "--backoff",
+        "-b",
+        default=0,
+        type=float,
+        help="initial delay between failed attempts (0 to retry immediately)",
+    )
+    parser.add_argument(
+        "--backoff_factor",
+        default=2,
+        type=float,
+        help="growth factor of the delay between failed attempts",
+    )
+    parser.add_argument(
+        "--backoff_max",
+        default=10,
+        type=float,
+        help="maximum delay between failed attempts",
+    )
+    parser.add_argument(
+        "--deadline",
+        "-d",
+        default=0,
+        type=float,
+        help=(
+            "maximum total time for all the attempts (0 for no limit). If set,"
+            " a non positive attempt count means attempting until it expires"
+        ),
+    )
     parser.add_argument(
         "--family",
         "-f",
@@ -43,39 +93,232 @@ def parse_args(
         default=None,
         help="address family",
     )
-    parser.add_argument("--port", "-p", default=0, type=int, help="port to connect to")
+    parser.add_argument(
+        "--happy_eyeballs",
+        "-e",
+        action="store_true",
+        help="race all the resolved addresses (RFC 8305)",
+    )
+    parser.add_argument(
+        "--interval",
+        "-i",
+        default=1,
+        type=float,
+        help="seconds between the starts of two pings",
+    )
+    parser.add_argument(
+        "--jitter",
+        "-j",
+        default=100,
+        type=int,
+        help="maximum random decrease (percent) of the delay between failed attempts",
+    )
+    parser.add_argument(
+        "--ping",
+        "-P",
+        nargs="?",
+        const=0,
+        type=int,
+        help=(
+            "ping mode: connect (and disconnect) COUNT times (until interrupted"
+            " if omitted or 0) and display per phase timings and their statistics"
+        ),
+    )
+    parser.add_argument(
+        "--port",
+        "-p",
+        default=0,
+        type=int,
+        help="port to connect to (ignored for the unix family)",
+    )
+    parser.add_argument(
+        "--profile",
+        "-O",
+        choices=SOCKET_PROFILES,
+        default=None,
+        help="socket options profile (unsupported options are skipped)",
+    )
 
     args, unk = parser.parse_known_args(argv)
     if unk:
         print(f"Warning: Ignoring unknown arguments: {unk}")
 
-    if args.port <= 0:
+    if args.family == SOCKET_FAMILY_UNIX:
+        args.port = 0
+    elif args.port <= 0:
         parser.exit(status=-1, message="Invalid port\n")
+    if args.ping is not None and args.ping < 0:
+        parser.exit(status=-1, message="Invalid ping count\n")
+    if args.interval < 0:
+        parser.exit(status=-1, message="Interval can't be negative\n")
+    if args.backoff:
+        try:
+            args.backoff = Backoff(
+                initial=args.backoff,
+                factor=args.backoff_factor,
+                maximum=max(args.backoff_max, args.backoff),
+                jitter_percent=args.jitter,
+            )
+        except NetworkException as e:
+            parser.exit(status=-1, message=f"{e}\n")
+    else:
+        args.backoff = None
+    args.host = args.address or ""
+    args.options = (
+        socket_options(args.profile, family=args.family, type_=SOCKET_TYPE_TCP)
+        if args.profile
+        else None
+    )
+    if args.adaptive_timeout and args.attempt_timeout <= 0:
+        parser.exit(status=-1, message="Adaptive timeout requires a positive one\n")
 
     try:
-        record = parse_address(
+        records = parse_address(
             args.address or "",
             args.port,
             family=args.family,
             type_=SOCKET_TYPE_TCP,
-            exact_matches=1,
-        )[0]
+            exact_matches=0 if args.happy_eyeballs else 1,
+        )
     except NetworkException as e:
         parser.exit(status=-1, message=f"Invalid address: {e}\n")
-    args.address = record[0], record[2]
+    if args.happy_eyeballs:
+        args.records = records
+        args.address = args.address or "", None
+    else:
+        args.address = records[0][0], records[0][2]
 
     return args, unk
 
 
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value / 1000000:.3f}"
+
+
+def _ping(args: argparse.Namespace, rtt_estimator: Optional[RTTEstimator]) -> int:
+    histograms = {e: LatencyHistogram() for e in _PHASES}
+    attempts = 0
+    next_time = time.perf_counter()
+    try:
+        while not args.ping or attempts < args.ping:
+            if attempts:
+                next_time += args.interval
+                time.sleep(max(next_time - time.perf_counter(), 0))
+            attempts += 1
+            report = {}
+            start_time = time.perf_counter_ns()
+            try:
+                client = connect_to_server(
+                    args.host,
+                    args.port,
+                    family=args.family,
+                    attempts=args.attempts,
+                    attempt_timeout=args.attempt_timeout,
+                    happy_eyeballs=args.happy_eyeballs,
+                    rtt_estimator=rtt_estimator,
+                    backoff=args.backoff,
+                    deadline=args.deadline,
+                    options=args.options,
+                    report=report,
+                    _return_client_socket=True,
+                )
+                connect_time = time.perf_counter_ns()
+                try:
+                    peer = client.getpeername()
+                finally:
+                    try:
+                        client.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    client.close()
+                close_time = time.perf_counter_ns()
+            except (NetworkException, OSError) as e:
+                elapsed = time.perf_counter_ns() - start_time
+                print(f"  #{attempts}: FAILURE: {e} (took {_ms(elapsed)} ms)")
+                continue
+            peer = peer[0] if isinstance(peer, tuple) else args.host
+            # The address is resolved once, by connect_to_server (which times it)
+            resolve_time = min(start_time + int(report["resolve"] * 1e9), connect_time)
+            timings = (
+                resolve_time - start_time,
+                connect_time - resolve_time,
+                close_time - connect_time,
+                close_time - start_time,
+            )
+            for phase, timing in zip(_PHASES, timings):
+                histograms[phase].record(timing)
+            print(
+                f"  #{attempts}: {peer}: "
+                + ", ".join(f"{p}={_ms(t)} ms" for p, t in zip(_PHASES, timings))
+            )
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+    ok = histograms[_PHASES[-1]].count
+    print(
+        f"\n{attempts} attempt(s), {ok} successful, {attempts - ok} failed"
+        f" ({(attempts - ok) * 100 / max(attempts, 1):.1f}% failures)"
+    )
+    if ok:
+        stats = {e: histograms[e].statistics() for e in _PHASES}
+        columns = tuple(stats[_PHASES[0]])[1:]
+        print("  (ms)    " + "".join(f"{e:>10s}" for e in columns))
+        for phase in _PHASES:
+            print(
+                f"  {phase:8s}"
+                + "".join(f"{_ms(stats[phase][e]):>10s}" for e in columns)
+            )
+    return 0 if ok else 1
+
+
 def main(*argv) -> int:
     args, _ = parse_args(argv or None)
+    if args.happy_eyeballs:
+        ips = (
+            e[0].join("[]") if e[2] == socket.AF_INET6 else e[0] for e in args.records
+        )
+        target = f"{args.address[0]}:{args.port} (racing: {', '.join(ips)})"
+    elif args.family == SOCKET_FAMILY_UNIX:
+        target = f"{args.host} (family: {str(args.address[-1])})"
+    else:
+        address, family = args.address[0], args.address[-1]
+        target = (
+            f"{address.join('[]') if family == socket.AF_INET6 else address}"
+            f":{args.port} (family: {str(family)})"
+        )
+    rtt_estimator = (
+        RTTEstimator(
+            floor=min(0.05, args.attempt_timeout),
+            ceiling=args.attempt_timeout,
+        )
+        if args.adaptive_timeout
+        else None
+    )
+    if args.ping is not None:
+        count_text = f"{args.ping} times" if args.ping else "continuously"
+        print(
+            f"Pinging {target} {count_text}, every {args.interval:.2f}s"
+            f" ({args.attempts} attempt(s) with a {args.attempt_timeout:.2f}s timeout)"
+            " - <Ctrl + C> to stop..."
+        )
+        return _ping(args, rtt_estimator)
+    attempts_text = (
+        f"{args.attempts} times"
+        if args.attempts > 0 or args.deadline <= 0
+        else "repeatedly"
+    )
+    if args.deadline > 0:
+        attempts_text += f" for at most {args.deadline:.2f}s"
+    if args.backoff:
+        attempts_text += (
+            f", backing off from {args.backoff.initial:.2f}s"
+            f" to {args.backoff.maximum:.2f}s"
+        )
     print(
-        "Attempting to connect to"
-        f" {args.address[0].join('[]') if args.address[-1] == socket.AF_INET6 else args.address[0]}"
-        f":{args.port} (family: {str(args.address[-1])})"
-        f" {args.attempts} times (with a {args.attempt_timeout:.2f}s timeout)..."
+        f"Attempting to connect to {target}"
+        f" {attempts_text} (with a {args.attempt_timeout:.2f}s timeout)..."
     )
-    start_time = time.time()
+    start_time = time.perf_counter()
+    report = {}
     try:
         connect_to_server(
             args.address[0],
@@ -83,13 +326,24 @@ def main(*argv) -> int:
             family=args.family,
             attempts=args.attempts,
             attempt_timeout=args.attempt_timeout,
+            happy_eyeballs=args.happy_eyeballs,
+            rtt_estimator=rtt_estimator,
+            backoff=args.backoff,
+            deadline=args.deadline,
+            options=args.options,
+            report=report,
         )
     except NetworkException as e:
-        print(f"  FAILURE: {e} (took {time.time() - start_time:.3f} seconds)")
+        print(
+            f"  FAILURE: {e} (took {time.perf_counter() - start_time:.3f} seconds,"
+            f" {report.get('delay', 0):.3f} of them waiting between attempts)"
+        )
         return 1
     else:
         print(
-            f"  --- !!! SUCCESS !!! --- (took {time.time() - start_time:.3f} seconds)"
+            "  --- !!! SUCCESS !!! ---"
+            f" (took {time.perf_counter() - start_time:.3f} seconds,"
+            f" attempt {report['attempts']})"
         )
         return 0
 
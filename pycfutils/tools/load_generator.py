@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+"""CLI tool for generating TCP connection load against a server."""
+
+import argparse
+import collections
+import itertools
+import multiprocessing
+import queue
+import socket
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from pycfutils.exceptions import NetworkException
+from pycfutils.network import (
+    SOCKET_FAMILIES,
+    SOCKET_FAMILY_UNIX,
+    SOCKET_PROFILES,
+    SOCKET_TYPE_TCP,
+    LatencyHistogram,
+    SockOpts,
+    connect_many,
+    parse_address,
+    socket_options,
+)
+from pycfutils.system import cpu_count
+
+_REPORT_INTERVAL = 1  # Seconds
+_JOIN_TIMEOUT = 2  # Seconds to wait for a worker to exit before terminating it
+
+
+def _error_name(error: Exception) -> str:
+    if isinstance(error, OSError) and error.errno:
+        return f"{error.__class__.__name__} ({error.strerror})"
+    return str(error) or error.__class__.__name__
+
+
+def _generate_load(
+    index: int,
+    address: str,
+    port: int,
+    family: Optional[str],
+    rate: float,
+    concurrency: int,
+    timeout: float,
+    options: SockOpts,
+    reports: multiprocessing.Queue,
+    stop: multiprocessing.Event,
+) -> None:
+    ok = 0
+    errors = collections.Counter()
+    histogram = LatencyHistogram()
+
+    def _report() -> None:
+        nonlocal ok, errors, histogram
+        reports.put((index, ok, errors, histogram))
+        ok = 0
+        errors = collections.Counter()
+        histogram = LatencyHistogram()
+
+    results = connect_many(
+        itertools.repeat((address, port)),
+        concurrency=concurrency,
+        timeout=timeout,
+        family=family,
+        rate=rate,
+        options=options,
+    )
+    report_time = time.monotonic() + _REPORT_INTERVAL
+    try:
+        for _, result, elapsed in results:
+            if not isinstance(result, Exception):
+                ok += 1
+                histogram.record(elapsed * 1000000000)
+            else:
+                errors[_error_name(result)] += 1
+            if time.monotonic() >= report_time:
+                _report()
+                report_time += _REPORT_INTERVAL
+            if stop.is_set():
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        results.close()
+        _report()
+        reports.put((index, None, None, None))  # Done
+
+
+def _statistics_text(ok: int, errors: int, histogram: LatencyHistogram) -> str:
+    attempts = ok + errors
+    stats = histogram.statistics()
+    latency = " ".join(
+        f"{name}: {'-' if value is None else f'{value / 1000000:.3f}'}"
+        for name, value in tuple(stats.items())[1:]
+    )
+    return (
+        f"ok: {ok}, errors: {errors}"
+        f" ({errors * 100 / max(attempts, 1):.2f}%) - latency (ms) {latency}"
+    )
+
+
+def parse_args(
+    argv: Optional[Sequence[str]] = None,
+) -> Tuple[argparse.Namespace, List[str]]:
+    parser = argparse.ArgumentParser(
+        description="TCP connection load generator",
+        epilog=(
+            "Repeatedly connects to (and disconnects from) a server, from multiple"
+            " processes, and displays the achieved rate, the error rate and the"
+            " connection latency every second"
+        ),
+    )
+    parser.add_argument(
+        "--address",
+        "-a",
+        default="",
+        help=(
+            "address to connect to (must resolve to exactly one IP)."
+            " For the unix family: a path, or @name for the Linux abstract namespace"
+        ),
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        default=64,
+        type=int,
+        help="maximum number of connection attempts in flight (per worker)",
+    )
+    parser.add_argument(
+        "--family",
+        "-f",
+        choices=SOCKET_FAMILIES,
+        default=None,
+        help="address family",
+    )
+    parser.add_argument(
+        "--port",
+        "-p",
+        default=0,
+        type=int,
+        help="port to connect to (ignored for the unix family)",
+    )
+    parser.add_argument(
+        "--profile",
+        "-O",
+        choices=SOCKET_PROFILES,
+        default=None,
+        help="socket options profile (unsupported options are skipped)",
+    )
+    parser.add_argument(
+        "--rate",
+        "-r",
+        default=1000,
+        type=float,
+        help="connections per second (all workers together, 0 for no limit)",
+    )
+    parser.add_argument(
+        "--time", "-t", default=10, type=float, help="time (seconds) to run (0 forever)"
+    )
+    parser.add_argument(
+        "--timeout",
+        "-o",
+        default=1,
+        type=float,
+        help=(
+            "connection timeout (bounds how long a worker may wait for a result,"
+            " so it must be positive)"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        default=1,
+        type=int,
+        help="number of worker processes (0 for the number of usable CPUs)",
+    )
+
+    args, unk = parser.parse_known_args(argv)
+    if unk:
+        print(f"Warning: Ignoring unknown arguments: {unk}")
+
+    if args.family == SOCKET_FAMILY_UNIX:
+        args.port = 0
+    elif args.port <= 0 or args.port > 0xFFFF:
+        parser.exit(status=-1, message="Invalid port\n")
+    if args.concurrency <= 0:
+        parser.exit(status=-1, message="Concurrency must be positive\n")
+    if args.rate < 0:
+        parser.exit(status=-1, message="Rate can't be negative\n")
+    if args.timeout <= 0:
+        parser.exit(status=-1, message="Timeout must be positive\n")
+    if args.workers < 0:
+        parser.exit(status=-1, message="Invalid workers number\n")
+    args.workers = args.workers or cpu_count()
+    args.time = max(0, args.time)
+    try:
+        record = parse_address(
+            args.address,
+            args.port,
+            family=args.family,
+            type_=SOCKET_TYPE_TCP,
+            exact_matches=1,
+        )[0]
+    except NetworkException as e:
+        parser.exit(status=-1, message=f"Invalid address: {e}\n")
+    args.host = args.address
+    args.options = (
+        socket_options(args.profile, family=args.family, type_=SOCKET_TYPE_TCP)
+        if args.profile
+        else None
+    )
+    args.address = record[0], record[2]
+
+    return args, unk
+
+
+def main(*argv) -> int:
+    args, _ = parse_args(argv or None)
+    if args.family == SOCKET_FAMILY_UNIX:
+        addr = args.host
+    else:
+        addr = (
+            args.address[0].join("[]")
+            if args.address[1] == socket.AF_INET6
+            else args.address[0]
+        ) + f":{args.port}"
+    rate_text = f"{args.rate:.0f} connections per second" if args.rate else "full speed"
+    print(
+        f"Connecting to {addr} at {rate_text}"
+        f" from {args.workers} process(es) ({args.concurrency} concurrent attempts each)"
+        f" for{f' {args.time} seconds' if args.time else 'ever'}.\n"
+        "Press <Ctrl + C> to interrupt...\n"
+    )
+    reports = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    procs = []
+    for idx in range(args.workers):
+        procs.append(
+            multiprocessing.Process(
+                target=_generate_load,
+                args=(
+                    idx,
+                    args.address[0],
+                    args.port,
+                    args.family,
+                    args.rate / args.workers,
+                    args.concurrency,
+                    args.timeout,
+                    args.options,
+                    reports,
+                    stop,
+                ),
+            )
+        )
+    for p in procs:
+        p.start()
+    running = len(procs)
+    ok_total = 0
+    errors_total = collections.Counter()
+    histogram_total = LatencyHistogram()
+    start_time = time.monotonic()
+    report_time = start_time + _REPORT_INTERVAL
+    interval_ok, interval_errors = 0, 0
+    interval_histogram = LatencyHistogram()
+
+    def _print_interval(now: float, duration: float) -> None:
+        nonlocal interval_ok, interval_errors, interval_histogram
+        attempts = interval_ok + interval_errors
+        print(
+            f"  [{now - start_time:7.1f}s] {attempts / duration:9.1f} conn/s - "
+            + _statistics_text(interval_ok, interval_errors, interval_histogram)
+        )
+        interval_ok, interval_errors = 0, 0
+        interval_histogram = LatencyHistogram()
+
+    try:
+        while running:
+            if args.time and not stop.is_set():
+                if time.monotonic() - start_time >= args.time:
+                    stop.set()
+            try:
+                _, ok, errors, histogram = reports.get(
+                    timeout=max(report_time - time.monotonic(), 0.01)
+                )
+            except queue.Empty:
+                pass
+            else:
+                if ok is None:
+                    running -= 1
+                else:
+                    interval_ok += ok
+                    interval_errors += sum(errors.values())
+                    interval_histogram.merge(histogram)
+                    ok_total += ok
+                    errors_total.update(errors)
+                    histogram_total.merge(histogram)
+            now = time.monotonic()
+            if now >= report_time:
+                _print_interval(now, _REPORT_INTERVAL + now - report_time)
+                report_time = now + _REPORT_INTERVAL
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+        stop.set()
+        while running:
+            try:
+                _, ok, errors, histogram = reports.get(timeout=args.timeout + 1)
+            except (queue.Empty, KeyboardInterrupt):
+                break
+            if ok is None:
+                running -= 1
+            else:
+                ok_total += ok
+                errors_total.update(errors)
+                histogram_total.merge(histogram)
+    for p in procs:
+        # A worker with unread reports can't exit (its queue feeder blocks)
+        p.join(_JOIN_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+            p.join()
+    duration = time.monotonic() - start_time
+    attempts = ok_total + sum(errors_total.values())
+    print(
+        f"\nAttempted {attempts} connection(s) in {duration:.3f} seconds"
+        f" ({attempts / duration:.1f} conn/s)\n  "
+        + _statistics_text(ok_total, sum(errors_total.values()), histogram_total)
+    )
+    for error, count in errors_total.most_common():
+        print(f"  {count:9d} x {error}")
+    return 0 if ok_total else 1
+
+
+if __name__ == "__main__":
+    print(
+        "Python {:s} {:03d}bit on {:s}\n".format(
+            " ".join(elem.strip() for elem in sys.version.split("\n")),
+            64 if sys.maxsize > 0x100000000 else 32,
+            sys.platform,
+        )
+    )
+    rc = main(*sys.argv[1:])
+    print("\nDone.\n")
+    sys.exit(rc)
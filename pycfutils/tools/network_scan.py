@@ -2,21 +2,193 @@
 """CLI tool for scanning network address and port ranges."""
 
 import argparse
+import bisect
+import csv
+import ipaddress
+import json
+import os
+import random
 import socket
 import sys
+import threading
 import time
-from typing import List, Optional, Sequence, Tuple
+from typing import Any, Dict, Generator, Iterable, List, Optional, Sequence, Tuple
 
 from pycfutils.exceptions import NetworkException
 from pycfutils.io import read_key
-from pycfutils.miscellaneous import uniques
-from pycfutils.network import SOCKET_TYPE_TCP, connect_to_server, parse_address
+from pycfutils.miscellaneous import Permutation, uniques
+from pycfutils.network import (
+    SOCKET_PROFILES,
+    SOCKET_TYPE_TCP,
+    RTTEstimator,
+    connect_many,
+    parse_address,
+    socket_options,
+)
 
+_CHECKPOINT_VERSION = 1
+_CHECKPOINT_INTERVAL = 5  # Seconds
+_OUTPUT_BUFFER = 0x10000
+_OUTPUT_FORMATS = ("csv", "jsonl")
 
-def _ip_string(ip: int, family: socket.AddressFamily) -> str:
+
+def _ip_string(ip: int, family: socket.AddressFamily, brackets: bool = True) -> str:
     size = 16 if family == socket.AF_INET6 else 4
     addr = socket.inet_ntop(family, ip.to_bytes(length=size, byteorder="big"))
-    return addr.join("[]") if family == socket.AF_INET6 else addr
+    return addr.join("[]") if brackets and family == socket.AF_INET6 else addr
+
+
+class _TargetSpace:
+    """Indexable (IP, port) combinations (index = IP index * port count + port index).
+
+    IPs are (first, last, family) ranges, so memory doesn't depend on their size.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.ranges = args.ranges
+        self.offsets = []  # Index of each range's first IP
+        self.ip_count = 0
+        for first, last, _ in self.ranges:
+            self.offsets.append(self.ip_count)
+            self.ip_count += last - first + 1
+        self.ports = (
+            args.ports
+            if len(args.ports) > 1
+            else range(args.ports[0], args.last_port + 1)
+        )
+
+    @property
+    def size(self) -> int:
+        return self.ip_count * len(self.ports)
+
+    def __getitem__(self, index: int) -> Tuple[str, int]:
+        ip_index, port_index = divmod(index, len(self.ports))
+        idx = bisect.bisect_right(self.offsets, ip_index) - 1
+        first, _, family = self.ranges[idx]
+        ip = first + ip_index - self.offsets[idx]
+        return _ip_string(ip, family, brackets=False), self.ports[port_index]
+
+    def signature(self) -> Dict[str, Any]:
+        ranges = [
+            [_ip_string(e[0], e[2], brackets=False)]
+            + ([_ip_string(e[1], e[2], brackets=False)] if e[1] != e[0] else [])
+            for e in self.ranges
+        ]
+        ports = (
+            list(self.ports)
+            if not isinstance(self.ports, range)
+            else [self.ports.start, self.ports.stop - 1]
+        )
+        return {"ranges": ranges, "ports": ports}
+
+
+class _Progress:
+    """Scan cursor and attempts in flight (positions in the scan order)."""
+
+    def __init__(self, size: int, cursor: int = 0, pending: Iterable[int] = ()):
+        self.size = size
+        self.cursor = cursor
+        self.resumed = sorted(pending, reverse=True)
+        self.pending = set()
+
+    def positions(self) -> Generator[int, None, None]:
+        while self.resumed:
+            position = self.resumed.pop()
+            self.pending.add(position)
+            yield position
+        while self.cursor < self.size:
+            position = self.cursor
+            self.cursor += 1
+            self.pending.add(position)
+            yield position
+
+    def done(self, position: int) -> None:
+        self.pending.discard(position)
+
+    def finished(self) -> bool:
+        return self.cursor >= self.size and not self.pending and not self.resumed
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "cursor": self.cursor,
+            "pending": sorted(self.pending.union(self.resumed)),
+        }
+
+
+def _targets(
+    space: _TargetSpace, order: Permutation, progress: _Progress
+) -> Generator[Tuple[str, int, int], None, None]:
+    for position in progress.positions():
+        yield (*space[order[position]], position)
+
+
+def _load_checkpoint(file_name: str) -> Dict[str, Any]:
+    with open(file_name) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("version") != _CHECKPOINT_VERSION:
+        raise ValueError("unsupported checkpoint version")
+    return checkpoint
+
+
+def _save_checkpoint(file_name: str, checkpoint: Dict[str, Any]) -> None:
+    tmp_file_name = file_name + ".tmp"
+    with open(tmp_file_name, "w") as f:
+        json.dump(checkpoint, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file_name, file_name)  # Atomic: never leave a partial checkpoint
+
+
+class _ResultWriter:
+    """Buffered JSONL / CSV result records (flushed explicitly, before checkpoints)."""
+
+    _FIELDS = ("address", "port", "success", "error", "elapsed", "timestamp")
+
+    def __init__(self, file_name: str, format_: str, append: bool = False):
+        self.format = format_
+        self.file = open(
+            file_name, "a" if append else "w", newline="", buffering=_OUTPUT_BUFFER
+        )
+        if format_ == "csv":
+            self.writer = csv.writer(self.file)
+            if self.file.tell() == 0:
+                self.writer.writerow(self._FIELDS)
+
+    def write(
+        self, addr: str, port: int, result: Any, elapsed: float, timestamp: float
+    ) -> None:
+        success = isinstance(result, tuple)
+        values = (
+            addr,
+            port,
+            success,
+            None if success else str(result) or result.__class__.__name__,
+            round(elapsed, 6),
+            round(timestamp, 6),
+        )
+        if self.format == "csv":
+            self.writer.writerow(values)
+        else:
+            self.file.write(
+                json.dumps(dict(zip(self._FIELDS, values)), separators=(",", ":"))
+                + "\n"
+            )
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _listen_for_key(interrupted: threading.Event, done: threading.Event) -> None:
+    try:
+        while not done.is_set():
+            if read_key(timeout=0.5, poll_interval=0.1) is not None:
+                interrupted.set()
+                break
+    except Exception:  # No terminal (only <Ctrl + C> works)
+        pass
 
 
 def parse_args(
@@ -26,6 +198,15 @@ def parse_args(
         description="IP:Port scanner (TCP)",
         epilog="Scans IP:port combinations in the given specified values or ranges",
     )
+    parser.add_argument(
+        "--adaptive_timeout",
+        "-A",
+        action="store_true",
+        help=(
+            "derive each attempt's timeout from the connection times measured"
+            " in its subnet (bounded by --min_timeout and --timeout)"
+        ),
+    )
     parser.add_argument(
         "--address",
         "-a",
@@ -33,17 +214,39 @@ def parse_args(
         dest="addresses",
         default=[],
         help=(
-            "address (first) to scan. Can be specified multiple times"
-            " (in that case only the specified addresses (resolved IPs) will be attempted)"
+            "address (first) or network (CIDR notation) to scan. Can be specified"
+            " multiple times (in that case only the specified addresses (resolved IPs)"
+            " and networks will be attempted)"
         ),
     )
+    parser.add_argument(
+        "--checkpoint",
+        "-k",
+        help=(
+            "file to periodically save the scan progress to (and to resume from)."
+            " It must not be shared by different scans"
+        ),
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        default=256,
+        type=int,
+        help="maximum number of connection attempts in flight",
+    )
+    parser.add_argument(
+        "--format",
+        "-F",
+        choices=_OUTPUT_FORMATS,
+        help="output file format (defaults to the output file extension, or jsonl)",
+    )
     parser.add_argument(
         "--last_ip",
         "-i",
         help=(
             "last IP to scan (defaults to first). Must be the same family with first."
             " If more than one first address is specified (or it resolves to multiple IPs),"
-            " this is ignored"
+            " or a network is specified, this is ignored"
         ),
     )
     parser.add_argument(
@@ -56,6 +259,27 @@ def parse_args(
             " If more than one first port is specified, this is ignored"
         ),
     )
+    parser.add_argument(
+        "--linear",
+        "-l",
+        action="store_true",
+        help="scan targets in order (by default the order is pseudo-random)",
+    )
+    parser.add_argument(
+        "--min_timeout",
+        "-m",
+        default=0.05,
+        type=float,
+        help="minimum (adaptive) connection timeout",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        help=(
+            "file to write results to as they come (only successful attempts,"
+            " unless verbose). Appended to when resuming"
+        ),
+    )
     parser.add_argument(
         "--port",
         "-p",
@@ -69,7 +293,51 @@ def parse_args(
         ),
     )
     parser.add_argument(
-        "--timeout", "-t", default=0.5, type=float, help="connection timeout"
+        "--profile",
+        "-O",
+        choices=SOCKET_PROFILES,
+        default=None,
+        help="socket options profile (unsupported options are skipped)",
+    )
+    parser.add_argument(
+        "--rate",
+        "-R",
+        default=0,
+        type=float,
+        help="maximum number of connection attempts per second (0 for no limit)",
+    )
+    parser.add_argument(
+        "--resume",
+        "-u",
+        action="store_true",
+        help="continue the scan from the checkpoint file (if it exists)",
+    )
+    parser.add_argument(
+        "--seed",
+        "-s",
+        type=int,
+        help=(
+            "seed of the pseudo-random scan order (the same seed yields the same order)."
+            " Randomly chosen (and displayed) if not specified"
+        ),
+    )
+    parser.add_argument(
+        "--shard",
+        "-S",
+        help=(
+            "scan only a slice of the targets: INDEX/COUNT (0 <= INDEX < COUNT)."
+            " Slices (with the same seed) are disjoint and cover all the targets"
+        ),
+    )
+    parser.add_argument(
+        "--timeout",
+        "-t",
+        default=0.5,
+        type=float,
+        help="connection timeout (0 for the OS default)",
+    )
+    parser.add_argument(
+        "--verbose", "-v", action="store_true", help="display failed attempts too"
     )
 
     args, unk = parser.parse_known_args(argv)
@@ -78,6 +346,17 @@ def parse_args(
 
     if args.timeout < 0:
         parser.exit(status=-1, message="Timeout can't be negative\n")
+    if args.adaptive_timeout and not 0 < args.min_timeout <= args.timeout:
+        parser.exit(status=-1, message="Invalid adaptive timeout bounds\n")
+    if args.concurrency <= 0:
+        parser.exit(status=-1, message="Concurrency must be positive\n")
+    if args.rate < 0:
+        parser.exit(status=-1, message="Rate can't be negative\n")
+    if args.resume and not args.checkpoint:
+        parser.exit(status=-1, message="Resuming requires a checkpoint file\n")
+    if args.output and not args.format:
+        ext = os.path.splitext(args.output)[1][1:].lower()
+        args.format = ext if ext in _OUTPUT_FORMATS else "jsonl"
     args.ports = tuple(uniques(args.ports))
     if not args.ports:
         parser.exit(status=-1, message="At least one first port must be specified\n")
@@ -94,8 +373,22 @@ def parse_args(
     else:
         if args.last_port != 0:
             print("Last port passed with multiple first ports. Ignoring")
-    addrs = []
+    ranges = []  # (first IP, last IP, family)
     for addr_str in args.addresses:
+        if "/" in addr_str:
+            try:
+                network = ipaddress.ip_network(addr_str, strict=False)
+            except ValueError as e:
+                print(f"Invalid network {addr_str} ({e}). Ignoring")
+                continue
+            ip_range = (
+                int(network.network_address),
+                int(network.broadcast_address),
+                socket.AF_INET6 if network.version == 6 else socket.AF_INET,
+            )
+            if ip_range not in ranges:
+                ranges.append(ip_range)
+            continue
         try:
             records = parse_address(addr_str, 0, type_=SOCKET_TYPE_TCP)
         except NetworkException as e:
@@ -105,95 +398,189 @@ def parse_args(
             ipn = int.from_bytes(
                 socket.inet_pton(record[2], record[0]), byteorder="big"
             )
-            ip = (ipn, record[2])
-            if ip not in addrs:
-                addrs.append(ip)
-    if not addrs:
+            ip_range = (ipn, ipn, record[2])
+            if ip_range not in ranges:
+                ranges.append(ip_range)
+    if not ranges:
         parser.exit(status=-1, message="No valid (first) address passed\n")
-    args.addresses = addrs
-    if len(args.addresses) == 1:
-        if args.last_ip:
+    if args.last_ip:
+        if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
             try:
                 record = parse_address(
-                    args.last_ip or "", 0, type_=SOCKET_TYPE_TCP, exact_matches=1
+                    args.last_ip, 0, type_=SOCKET_TYPE_TCP, exact_matches=1
                 )[0]
             except NetworkException as e:
                 parser.exit(status=-1, message=f"Invalid last IP: {e}\n")
             ipn = int.from_bytes(
                 socket.inet_pton(record[2], record[0]), byteorder="big"
             )
-            args.last_ip = ipn, record[2]
+            if ranges[0][2] != record[2]:
+                parser.exit(status=-1, message="IP families don't match\n")
+            if ipn < ranges[0][0]:
+                parser.exit(status=-1, message="Last IP < first IP\n")
+            ranges[0] = ranges[0][0], ipn, ranges[0][2]
         else:
-            args.last_ip = args.addresses[0]
-        if args.addresses[0][-1] != args.last_ip[-1]:
-            parser.exit(status=-1, message="IP families don't match\n")
-        if not args.last_ip[0] >= args.addresses[0][0]:
-            parser.exit(status=-1, message="Last IP < first IP\n")
+            print(
+                "Last ip passed with multiple first addresses (or networks). Ignoring"
+            )
+    args.ranges = ranges
+    if args.shard:
+        try:
+            shard, shards = (int(e) for e in args.shard.split("/"))
+        except ValueError:
+            shard, shards = -1, 0
+        if not 0 <= shard < shards:
+            parser.exit(status=-1, message=f"Invalid shard: {args.shard}\n")
+        args.shard = shard, shards
     else:
-        if args.last_ip:
-            print("Last ip passed with multiple first addresses. Ignoring")
+        args.shard = 0, 1
+    if args.linear and args.seed is not None:
+        print("Seed passed with linear order. Ignoring")
+        args.seed = None
 
     return args, unk
 
 
 def main(*argv) -> int:
     args, _ = parse_args(argv or None)
-    ips = len(args.addresses) > 1
     ports = len(args.ports) > 1
-    addr_text = (
-        f"{', ' .join(_ip_string(*e) for e in args.addresses)}"
-        if ips
-        else f"from {_ip_string(*args.addresses[0])} to {_ip_string(*args.last_ip)}"
+    addr_text = ", ".join(
+        _ip_string(e[0], e[2])
+        + (f" - {_ip_string(e[1], e[2])}" if e[1] != e[0] else "")
+        for e in args.ranges
     )
     port_text = (
         f"{', ' .join(str(e) for e in args.ports)}"
         if ports
         else f"from {args.ports[0]} to {args.last_port}"
     )
+    total, ok = 0, 0
+    checkpoint = None
+    if args.resume and os.path.isfile(args.checkpoint):
+        try:
+            checkpoint = _load_checkpoint(args.checkpoint)
+        except (OSError, ValueError) as e:
+            print(f"Invalid checkpoint {args.checkpoint}: {e}")
+            return -1
+        if args.seed is None and not args.linear:
+            args.seed = checkpoint["scan"].get("seed")
+    if args.seed is None and not args.linear:
+        args.seed = random.getrandbits(32)
+    space = _TargetSpace(args)
+    order = Permutation(space.size, args.seed, *args.shard)
+    signature = {**space.signature(), "seed": args.seed, "shard": list(args.shard)}
+    shard_text = (
+        f", slice {args.shard[0]} of {args.shard[1]}" if args.shard[1] > 1 else ""
+    )
+    timeout_text = (
+        f"{args.min_timeout:.2f}s - {args.timeout:.2f}s adaptive"
+        if args.adaptive_timeout
+        else f"{args.timeout:.2f}s"
+    )
     print(
         f"Scanning network addresses {addr_text} on ports {port_text}"
-        f" with a {args.timeout:.2f}s connection timeout.\n"
-        "Press any to interrupt...\n"
+        f" ({order.count} targets{shard_text},"
+        f" {'linear order' if args.seed is None else f'order seed {args.seed}'})"
+        f" with a {timeout_text} connection timeout"
+        f" ({args.concurrency} concurrent attempts"
+        f"{f', at most {args.rate:.0f} per second' if args.rate else ''}).\n"
+        "Press any key to interrupt...\n"
     )
-    total, ok = 0, 0
-    start_time = time.time()
-    brk = False
-    for ip in (
-        args.addresses
-        if ips
-        else (
-            (e, args.addresses[0][-1])
-            for e in range(args.addresses[0][0], args.last_ip[0] + 1)
+    progress = _Progress(order.count)
+    if checkpoint is not None:
+        if checkpoint["scan"] != signature:
+            print(f"Invalid checkpoint {args.checkpoint}: belongs to a different scan")
+            return -1
+        progress = _Progress(order.count, checkpoint["cursor"], checkpoint["pending"])
+        total, ok = checkpoint["total"], checkpoint["ok"]
+        print(
+            f"Resuming from {args.checkpoint}: {total} ({ok} successful) attempts"
+            f" done, {order.count - total} remaining\n"
         )
-    ):
-        display_addr = _ip_string(*ip)
-        addr = display_addr.lstrip("[").rstrip("]")
-        for port in args.ports if ports else range(args.ports[0], args.last_port + 1):
-            print(
-                "Probing {:s}:{:d} (for {:.2f} seconds)...".format(
-                    display_addr, port, args.timeout
-                )
+    writer = (
+        _ResultWriter(args.output, args.format, append=checkpoint is not None)
+        if args.output
+        else None
+    )
+
+    def _checkpoint() -> None:
+        if writer:
+            writer.flush()  # Results must hit the file before the progress does
+        if args.checkpoint:
+            _save_checkpoint(
+                args.checkpoint,
+                {
+                    "version": _CHECKPOINT_VERSION,
+                    "scan": signature,
+                    "total": total,
+                    "ok": ok,
+                    **progress.state(),
+                },
             )
-            try:
-                total += 1
-                cur_start_time = time.time()
-                connect_to_server(addr, port, attempts=1, attempt_timeout=args.timeout)
+
+    interrupted = threading.Event()
+    done = threading.Event()
+    listener = threading.Thread(
+        target=_listen_for_key, args=(interrupted, done), daemon=True
+    )
+    listener.start()
+    start_time = time.time()
+    checkpoint_time = time.monotonic() + _CHECKPOINT_INTERVAL
+    results = connect_many(
+        _targets(space, order, progress),
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+        rate=args.rate,
+        rtt_estimator=(
+            RTTEstimator(floor=args.min_timeout, ceiling=args.timeout)
+            if args.adaptive_timeout
+            else None
+        ),
+        options=(
+            socket_options(args.profile, type_=SOCKET_TYPE_TCP)
+            if args.profile
+            else None
+        ),
+    )
+    try:
+        for (addr, port, position), result, elapsed in results:
+            total += 1
+            progress.done(position)
+            display_addr = addr.join("[]") if ":" in addr else addr
+            success = isinstance(result, tuple)
+            if success:
+                ok += 1
                 print(
-                    f"  --- !!! SUCCESS !!! --- (took {time.time() - cur_start_time:.3f} seconds)"
+                    f"{display_addr}:{port} --- !!! SUCCESS !!! ---"
+                    f" (took {elapsed:.3f} seconds)"
                 )
-            except NetworkException:
-                pass
-            else:
-                ok += 1
-            if read_key(timeout=0.5, poll_interval=0.1) is not None:
+            elif args.verbose:
+                print(
+                    f"{display_addr}:{port} failed: {result} (took {elapsed:.3f} seconds)"
+                )
+            if writer and (success or args.verbose):
+                writer.write(addr, port, result, elapsed, time.time())
+            if time.monotonic() >= checkpoint_time:
+                _checkpoint()
+                checkpoint_time = time.monotonic() + _CHECKPOINT_INTERVAL
+            if interrupted.is_set():
                 print("\nInterrupted by user")
-                brk = True
                 break
-        if brk:
-            break
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+    finally:
+        results.close()  # Attempts still in flight stay pending (retried on resume)
+        done.set()
+        listener.join()
+        _checkpoint()
+        if writer:
+            writer.close()
     print(
-        f"\nAttempted {total} ({ok} successful) connection(s) in {time.time() - start_time:.3f} seconds"
+        f"\nAttempted {total} ({ok} successful) connection(s)"
+        f" in {time.time() - start_time:.3f} seconds"
     )
+    if args.checkpoint and not progress.finished():
+        print(f"Progress saved to {args.checkpoint} (use --resume to continue)")
     return 0
 
 
@@ -2,6 +2,7 @@
 """CLI tool for starting a listening server."""
 
 import argparse
+import contextlib
 import socket
 import sys
 import time
@@ -9,18 +10,52 @@ from typing import List, Optional, Sequence, Tuple
 
 from pycfutils.exceptions import NetworkException
 from pycfutils.io import read_key
-from pycfutils.network import SOCKET_FAMILIES, SOCKET_TYPE_TCP, TCPServer, parse_address
+from pycfutils.network import (
+    BACKPRESSURE_RESET,
+    BACKPRESSURES,
+    SOCKET_FAMILIES,
+    SOCKET_FAMILY_IPV4,
+    SOCKET_FAMILY_IPV6,
+    SOCKET_FAMILY_UNIX,
+    SOCKET_PROFILE_SERVER,
+    SOCKET_PROFILES,
+    SOCKET_TYPE_TCP,
+    AdmissionControl,
+    MetricsServer,
+    MultiProcessTCPServer,
+    ServerGroup,
+    TCPServer,
+    backlog_max,
+    parse_address,
+    socket_options,
+)
+from pycfutils.system import cpu_count
+
+_METRICS_FAMILIES = {
+    socket.AF_INET: SOCKET_FAMILY_IPV4,
+    socket.AF_INET6: SOCKET_FAMILY_IPV6,
+}
 
 
 def parse_args(
     argv: Optional[Sequence[str]] = None,
 ) -> Tuple[argparse.Namespace, List[str]]:
     parser = argparse.ArgumentParser(description="Start listening server")
+    parser.add_argument(
+        "--accept_rate",
+        default=0,
+        type=float,
+        help="maximum accepted connections per second (0 for no limit)",
+    )
     parser.add_argument(
         "--address",
         "-a",
         default="",
-        help="address to listen on (must resolve to exactly one IP)",
+        help=(
+            "address to listen on (if it resolves to more IPs, e.g. IPv4 and IPv6,"
+            " all of them are listened on). For the unix family: a path, or @name"
+            " for the Linux abstract namespace"
+        ),
     )
     parser.add_argument(
         "--family",
@@ -29,6 +64,36 @@ def parse_args(
         default=None,
         help="address family",
     )
+    parser.add_argument(
+        "--handoff",
+        "-H",
+        default=None,
+        help=(
+            "on interrupt, pass the listening socket to the instance waiting"
+            " (--takeover) on this Unix socket path (or @name) and drain,"
+            " so no connection is refused during restarts"
+        ),
+    )
+    parser.add_argument(
+        "--last_port",
+        "-l",
+        default=None,
+        type=int,
+        help=(
+            "last port to listen on (defaults to port). All the ports are served"
+            " by a single thread"
+        ),
+    )
+    parser.add_argument(
+        "--metrics_port",
+        "-m",
+        default=0,
+        type=int,
+        help=(
+            "port (on the same address) to serve the server metrics on, over HTTP"
+            " in Prometheus text format (0 to disable)"
+        ),
+    )
     parser.add_argument(
         "--poll_timeout",
         "-t",
@@ -36,69 +101,229 @@ def parse_args(
         type=float,
         help="time the server polls for incoming connections",
     )
-    parser.add_argument("--port", "-p", default=0, type=int, help="port to listen on")
+    parser.add_argument(
+        "--port",
+        "-p",
+        default=0,
+        type=int,
+        help="port to listen on (ignored for the unix family)",
+    )
+    parser.add_argument(
+        "--profile",
+        "-O",
+        choices=SOCKET_PROFILES,
+        default=None,
+        help="socket options profile (unsupported options are skipped)",
+    )
     parser.add_argument(
         "--reuse_port",
         "-r",
         action="store_true",
         help="reuse address/port (other sockets may bind to it)",
     )
+    parser.add_argument(
+        "--shed",
+        choices=BACKPRESSURES,
+        default=BACKPRESSURE_RESET,
+        help=(
+            "action over the accept rate: reset (RST) connections, or pause"
+            " accepting (leave them in the backlog). Sources over their rate are"
+            " always reset"
+        ),
+    )
+    parser.add_argument(
+        "--source_rate",
+        default=0,
+        type=float,
+        help=(
+            "maximum accepted connections per second from a source"
+            " (IPv4 address or IPv6 /64), 0 for no limit"
+        ),
+    )
+    parser.add_argument(
+        "--takeover",
+        "-T",
+        default=None,
+        help=(
+            "instead of binding, wait on this Unix socket path (or @name) for"
+            " the listening socket of a running instance (--handoff)"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        nargs="?",
+        const=0,
+        default=None,
+        type=int,
+        help=(
+            "run the server in multiple processes sharing the port (SO_REUSEPORT)."
+            " Without a value (or 0), the usable CPU count is used"
+        ),
+    )
 
     args, unk = parser.parse_known_args(argv)
     if unk:
         print(f"Warning: Ignoring unknown arguments: {unk}")
 
-    if args.port <= 0:
+    if args.workers is not None and (args.handoff or args.takeover):
+        parser.exit(status=-1, message="Handoff not supported with workers\n")
+    if args.accept_rate < 0 or args.source_rate < 0:
+        parser.exit(status=-1, message="Rates can't be negative\n")
+    if args.workers is not None and (args.accept_rate or args.source_rate):
+        parser.exit(status=-1, message="Rate limits not supported with workers\n")
+    if args.takeover:
+        args.host = args.takeover
+        args.address = None
+        args.group = False
+        if args.metrics_port < 0:
+            parser.exit(status=-1, message="Invalid metrics port\n")
+        return args, unk
+    if args.family == SOCKET_FAMILY_UNIX:
+        args.port = 0
+        if args.metrics_port or args.last_port is not None:
+            parser.exit(status=-1, message="Ports require an IP family\n")
+    elif args.port <= 0:
         parser.exit(status=-1, message="Invalid port\n")
+    if args.last_port is None:
+        args.last_port = args.port
+    elif args.last_port < args.port or args.last_port > 0xFFFF:
+        parser.exit(status=-1, message="Invalid last port\n")
+    if args.metrics_port < 0 or (
+        args.metrics_port and args.port <= args.metrics_port <= args.last_port
+    ):
+        parser.exit(status=-1, message="Invalid metrics port\n")
 
     try:
-        record = parse_address(
+        records = parse_address(
             args.address or "",
             args.port,
             family=args.family,
             type_=SOCKET_TYPE_TCP,
-            exact_matches=1,
-        )[0]
+        )
     except NetworkException as e:
         parser.exit(status=-1, message=f"Invalid address: {e}\n")
-    args.address = record[0], record[2]
+    args.host = args.address or ""
+    args.address = records[0][0], records[0][2]
+    args.group = len(records) > 1 or args.last_port > args.port
+    if args.group and (args.workers is not None or args.handoff):
+        parser.exit(
+            status=-1, message="Workers and handoff require a single listener\n"
+        )
+    if args.workers is not None:
+        if args.workers < 0:
+            parser.exit(status=-1, message="Invalid worker count\n")
+        args.workers = args.workers or cpu_count()
 
     return args, unk
 
 
 def main(*argv) -> int:
     args, _ = parse_args(argv or None)
+    if args.takeover:
+        target = f"the socket handed off on {args.host}"
+    elif args.family == SOCKET_FAMILY_UNIX:
+        target = f"{args.host} (family: {str(args.address[-1])})"
+    elif args.group:
+        target = (
+            f"{args.host or 'all addresses'}"
+            f" (family: {args.family or 'any'}) on ports {args.port}-{args.last_port}"
+        )
+    else:
+        address, family = args.address[0], args.address[-1]
+        target = (
+            f"{address.join('[]') if family == socket.AF_INET6 else address}"
+            f":{args.port} (family: {str(family)})"
+        )
     print(
-        f"Attempting to start a TCP server listening on"
-        f" {args.address[0].join('[]') if args.address[-1] == socket.AF_INET6 else args.address[0]}"
-        f":{args.port} (family: {str(args.address[-1])})"
-        f" (with a {args.poll_timeout:.2f}s connection check timeout).\n"
+        f"Attempting to start a TCP server listening on {target}"
+        f" (with a {args.poll_timeout:.2f}s connection check timeout)"
+        f"{'' if args.workers is None else f' in {args.workers} worker process(es)'}"
+        f"{f' (metrics on port {args.metrics_port})' if args.metrics_port else ''}.\n"
         "Press any key to interrupt...\n"
     )
     total, ok = 0, 0
     fail = False
     options = (
-        {socket.SOL_SOCKET: {getattr(socket, "SO_REUSEPORT", socket.SO_REUSEADDR): 1}}
-        if args.reuse_port
-        else None
+        socket_options(args.profile, family=args.family, type_=SOCKET_TYPE_TCP)
+        if args.profile
+        else {}
     )
+    if args.reuse_port:
+        options.setdefault(socket.SOL_SOCKET, {})[
+            getattr(socket, "SO_REUSEPORT", socket.SO_REUSEADDR)
+        ] = 1
+    server_kwargs = {
+        "family": args.family,
+        "poll_timeout": args.poll_timeout,
+        "silent": False,
+        "options": options or None,
+    }
+    if args.profile == SOCKET_PROFILE_SERVER:
+        server_kwargs["backlog"] = backlog_max()
+    admission = None
+    if args.accept_rate or args.source_rate:
+        admission = AdmissionControl(
+            rate=args.accept_rate, source_rate=args.source_rate, shed=args.shed
+        )
+        server_kwargs["admission"] = admission
+    if args.group:
+        server_class = ServerGroup
+        args.port = range(args.port, args.last_port + 1)
+        args.address = args.host, None
+    elif args.workers is None:
+        server_class = TCPServer
+    else:
+        server_class = MultiProcessTCPServer
+        server_kwargs["workers"] = args.workers
     start_time = time.time()
     try:
-        with TCPServer(
-            args.address[0],
-            args.port,
-            family=args.family,
-            poll_timeout=args.poll_timeout,
-            silent=False,
-            options=options,
-        ) as srv:
+        with contextlib.ExitStack() as stack:
+            if args.takeover:
+                srv = stack.enter_context(
+                    TCPServer.receive_handoff(args.takeover, **server_kwargs)
+                )
+                print(f"Took over {srv.socket.getsockname()}")
+            else:
+                srv = stack.enter_context(
+                    server_class(args.address[0], args.port, **server_kwargs)
+                )
+            metrics_family = _METRICS_FAMILIES.get(srv.socket.family)
+            if args.metrics_port and metrics_family is None:
+                # E.g. an adopted unix socket: keep serving, without metrics
+                print("  Metrics require an IP listening socket. Ignoring")
+            elif args.metrics_port:
+                stack.enter_context(
+                    MetricsServer(
+                        (srv,),
+                        srv.socket.getsockname()[0],
+                        args.metrics_port,
+                        family=metrics_family,
+                    )
+                )
             while True:
                 if read_key(timeout=0.5, poll_interval=0.1) is not None:
                     print("Interrupted by user")
                     break
+            if args.handoff:
+                try:
+                    srv.handoff(args.handoff, timeout=10)
+                    print(f"Handed the listening socket off to {args.handoff}")
+                except NetworkException as e:
+                    print(f"  Handoff FAILURE: {e}\n")
             srv.stop()
             total = srv.handled_total
             ok = srv.handled_ok
+            if args.group:
+                for port, (port_total, port_ok) in srv.counters().items():
+                    if port_total:
+                        print(f"  Port {port}: {port_total} (successfully {port_ok})")
+            if admission is not None:
+                rejected = admission.statistics()["rejected"]
+                print(
+                    "  Rejected by admission control: "
+                    + ", ".join(f"{k}: {v}" for k, v in rejected.items())
+                )
     except NetworkException as e:
         print(f"  FAILURE: {e}\n")
         fail = True
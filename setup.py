@@ -185,6 +185,7 @@ setup_args = dict(
     packages=find_packages(
         include=(
             _NAME,
+            f"{_NAME}.benchmarks",
             f"{_NAME}.gui",
             f"{_NAME}.gui._win",
             f"{_NAME}.gui.effects",